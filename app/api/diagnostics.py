@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
+from typing import Optional
+import hmac
+import logging
+import time
+from app.core import config
+from app.services import diagnostics
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Debug endpoints are hidden unless ADMIN_TOKEN is set, and require it in X-Admin-Token."""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        logger.warning("Rejected debug request with missing or invalid admin token")
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile")
+async def capture_profile(
+    seconds: Optional[float] = Query(None, gt=0, le=300),
+    requests: Optional[int] = Query(None, ge=1, le=100000),
+    timeout: float = Query(60, gt=0, le=600),
+    format: str = Query("speedscope", pattern="^(speedscope|pstats)$"),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    include_idle: bool = False
+):
+    """
+    Sample CPU stacks for the given seconds, or over the next N requests (bounded by timeout),
+    and return a speedscope JSON file or a marshalled pstats table. Covers this worker process only.
+    """
+    if not seconds and not requests:
+        return JSONResponse({"status": "error", "message": "Provide seconds or requests"}, status_code=400)
+
+    logger.info(f"POST /debug/profile endpoint accessed (seconds: {seconds}, requests: {requests}, format: {format})")
+    try:
+        profiler = await diagnostics.capture_profile(seconds, requests, timeout, interval_ms / 1000, include_idle)
+    except RuntimeError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=409)
+
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    headers = {
+        "X-Profile-Samples": str(profiler.sample_count),
+        "X-Profile-Requests": str(profiler.requests),
+        "X-Profile-Duration": f"{profiler.duration:.2f}"
+    }
+    if format == "pstats":
+        headers["Content-Disposition"] = f'attachment; filename="profile-{stamp}.pstats"'
+        return Response(profiler.to_pstats(), media_type="application/octet-stream", headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="profile-{stamp}.speedscope.json"'
+    return JSONResponse(profiler.to_speedscope(f"face-recognition {stamp}"), headers=headers)
+
+
+@router.get("/memory")
+def memory_report(top: int = Query(20, ge=1, le=200)):
+    """Process, model, embedding index and cache memory, plus top allocation sites when tracemalloc runs"""
+    logger.info("GET /debug/memory endpoint accessed")
+    return diagnostics.memory_report(top)
+
+
+@router.post("/memory/tracemalloc")
+def toggle_tracemalloc(action: str = Query(..., pattern="^(start|stop)$"), frames: int = Query(1, ge=1, le=50)):
+    """Start or stop allocation tracing (adds overhead to every allocation while running)"""
+    logger.info(f"POST /debug/memory/tracemalloc endpoint accessed (action: {action})")
+    if action == "start":
+        diagnostics.start_tracemalloc(frames)
+    else:
+        diagnostics.stop_tracemalloc()
+    return {"status": "success", "tracing": action == "start"}
@@ -1,16 +1,18 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, File, UploadFile, Form
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Optional
 import logging
-from app.services import event_service
+from app.services import event_service, event_transfer
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
 @router.get("/events")
-def get_events():
-    """Get all events with user counts"""
+def get_events(limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None):
+    """Get all events with user counts (paginate with limit + next_cursor)"""
     logger.info("GET /events endpoint accessed")
-    result = event_service.get_all_events()
+    result = event_service.get_all_events(limit, cursor)
     logger.info(f"Returning {len(result.get('events', []))} events")
     return result
 
@@ -24,20 +26,86 @@ def delete_event(event_name: str):
     return result
 
 
+@router.get("/events/{event_name}/export")
+def export_event(event_name: str, format: str = Query("ndjson", pattern="^(ndjson|npz)$")):
+    """Stream an event's users and embeddings as NDJSON or a chunked NPZ archive"""
+    logger.info(f"GET /events/{event_name}/export endpoint accessed (format: {format})")
+    event_index = event_transfer.get_export_index(event_name)
+    if event_index is None:
+        return JSONResponse({"status": "error", "message": f"Event '{event_name}' not found"}, status_code=404)
+
+    if format == "npz":
+        body, media_type = event_transfer.iter_export_npz(event_index), "application/octet-stream"
+    else:
+        body, media_type = event_transfer.iter_export_ndjson(event_index), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{event_name}.{format}"'}
+    )
+
+
+@router.post("/events/{event_name}/import")
+def import_event(
+    event_name: str,
+    file: UploadFile = File(...),
+    format: str = Form("ndjson", pattern="^(ndjson|npz)$"),
+    mode: str = Form("merge", pattern="^(merge|replace)$")
+):
+    """Import users and embeddings into an event in one bulk commit"""
+    logger.info(f"POST /events/{event_name}/import endpoint accessed (format: {format}, mode: {mode})")
+    try:
+        if format == "npz":
+            result = event_transfer.import_event(event_name, event_transfer.iter_import_npz(file.file), mode)
+        else:
+            result = event_transfer.import_event(event_name, event_transfer.iter_import_ndjson(file.file), mode)
+    except Exception as e:
+        # Malformed archives surface while records are read
+        logger.warning(f"Import into event '{event_name}' failed: {e}")
+        result = {"status": "error", "message": f"Invalid {format} file: {e}"}
+    logger.info(f"Import event result: {result.get('status')}")
+    return result
+
+
+@router.get("/changes")
+def get_changes(since: int = Query(0, ge=0), limit: int = Query(500, ge=0, le=10000)):
+    """Store changes newer than version since (change feed for replicas)"""
+    from app.services import change_feed
+    logger.info(f"GET /changes endpoint accessed (since: {since})")
+    return change_feed.changes_since(since, limit)
+
+
+@router.post("/events/tiering/run")
+def run_tiering():
+    """Flush access times and move inactive events to cold storage now"""
+    logger.info("POST /events/tiering/run endpoint accessed")
+    from app.services import event_tiering
+    try:
+        demoted = event_tiering.run_maintenance()
+        return {"status": "success", "demoted_events": demoted}
+    except Exception as e:
+        logger.error(f"Event tiering run failed: {e}")
+        return {"status": "error", "message": "Failed to run event tiering"}
+
+
 @router.get("/debug/cloudinary-data")
 def get_cloudinary_data():
-    """Debug endpoint to check actual Cloudinary data"""
-    logger.info("DEBUG: Fetching raw Cloudinary data")
-    from app.services.event_service import _load_embeddings_from_cloudinary
-    data = _load_embeddings_from_cloudinary()
-    # logger.info(f"DEBUG: Raw data from Cloudinary: {data}")
-    return {"raw_data": data}
+    """Debug endpoint to check actual Cloudinary data (streamed, never buffered in memory)"""
+    logger.info("DEBUG: Streaming raw Cloudinary data")
+    from app.services.embedding_store import iter_raw_embeddings
+
+    def stream():
+        yield b'{"raw_data": '
+        yield from iter_raw_embeddings()
+        yield b'}'
+
+    return StreamingResponse(stream(), media_type="application/json")
 
 @router.get("/all_user")
-def get_all_users(event_name: str):
-    """Get all users across all events"""
+def get_all_users(event_name: str, limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None):
+    """Get all users in an event (paginate with limit + next_cursor)"""
     logger.info("GET /all_user endpoint accessed")
-    result = event_service.get_all_users(event_name)
+    result = event_service.get_all_users(event_name, limit, cursor)
     logger.info(f"Returning {len(result.get('users', []))} users")
     return result
 
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+import logging
+from app.core import thread_budget
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/metrics")
+def get_metrics(format: str = Query("json", pattern="^(json|prometheus)$")):
+    """Detection counters and thread budget of this worker process"""
+    if format == "prometheus":
+        return PlainTextResponse(metrics.prometheus_text())
+    return {"detection": metrics.detection_summary(), "threads": thread_budget.report()}
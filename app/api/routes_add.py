@@ -1,10 +1,10 @@
 from fastapi import APIRouter, File, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from app.services import face_service_insightface as face_service
-from app.services.spoofing_detection import detect_spoofing
-import numpy as np
-from PIL import Image
-import io
+from app.services.storage_client import StorageUnavailable
+from app.services.analysis import analyze_crop_upload_async, analyze_upload_async
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,27 +23,89 @@ async def add_user(event_name: str = Form(...), username: str = Form(...), file:
 
     try:
         logger.info(f"Processing image upload for user: {username}")
-        # Load image and convert to numpy array
-        image = np.array(Image.open(io.BytesIO(file.file.read())))
-        logger.info(f"Image loaded successfully, shape: {image.shape}")
-
-        # Detect phone in image
-        spoofing_detect = detect_spoofing(image)
-        
-        # Extract face embedding using DeepFace
-        embedding = face_service.extract_face_embedding(image)
-        if embedding is None:
-            logger.warning(f"No face detected in uploaded image for user: {username}")
-            return JSONResponse({"status": "error", "message": "No face detected in image"})
-        
-        logger.info(f"Face encoding generated successfully for user: {username}")
-
-        # Add user
-        result = face_service.add_user_face(event_name, username, embedding)
-        result["spoofing_detect"] = spoofing_detect
+        # Detect phone and extract face embedding (cached for identical uploads)
+        analysis = await analyze_upload_async(file.file.read())
+        return await _add_analysis(event_name, username, analysis)
+
+    except StorageUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding user {username} to event {event_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/crop")
+async def add_user_crop(event_name: str = Form(...), username: str = Form(...), file: UploadFile = File(...)):
+    """
+    Enroll a user from an aligned 112x112 face crop produced by the client; detection and spoofing checks are skipped.
+    """
+    logger.info(f"POST /addUser/crop endpoint accessed for event: {event_name}, user: {username}")
+
+    if not event_name:
+        logger.warning("Add user crop request with empty event name")
+        return JSONResponse({"status": "error", "message": "No event was provided"})
+
+    try:
+        analysis = await analyze_crop_upload_async(file.file.read())
+        return await _add_analysis(event_name, username, analysis)
+
+    except ValueError as e:
+        logger.warning(f"Invalid face crop for user {username}: {e}")
+        return JSONResponse({"status": "error", "message": str(e)})
+    except StorageUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding user {username} to event {event_name} from crop: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/embedding")
+async def add_user_embedding(event_name: str = Form(...), username: str = Form(...), embedding: str = Form(...), model_version: str = Form(...)):
+    """
+    Enroll a user from a precomputed embedding (JSON array) tagged with the model pack that produced it.
+    No model inference runs on the server.
+    """
+    logger.info(f"POST /addUser/embedding endpoint accessed for event: {event_name}, user: {username}")
+
+    if not event_name:
+        logger.warning("Add user embedding request with empty event name")
+        return JSONResponse({"status": "error", "message": "No event was provided"})
+
+    try:
+        vector = json.loads(embedding)
+    except json.JSONDecodeError:
+        return JSONResponse({"status": "error", "message": "Embedding must be a JSON array"})
+
+    error = face_service.check_embedding(vector, model_version)
+    if error:
+        logger.warning(f"Rejected embedding for user {username}: {error}")
+        return JSONResponse({"status": "error", "message": error})
+
+    try:
+        result = await run_in_threadpool(face_service.add_user_face, event_name, username, [float(v) for v in vector])
+        result["spoofing_detect"] = None
         logger.info(f"Add user result: {result} \n for {username}")
         return JSONResponse(result)
 
+    except StorageUnavailable:
+        raise
     except Exception as e:
-        logger.error(f"Error adding user {username} to event {event_name}: {e}")
+        logger.error(f"Error adding user {username} to event {event_name} from embedding: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+async def _add_analysis(event_name: str, username: str, analysis: dict):
+    """Enroll the embedding from an image or crop analysis."""
+    spoofing_detect = analysis["spoofing_detect"]
+    embedding = analysis["embedding"]
+    if analysis.get("rejected"):
+        logger.warning(f"Low quality face rejected for user: {username} ({analysis['rejected']['code']})")
+        return JSONResponse({"status": "error", "message": analysis["rejected"]["message"], "quality": analysis["rejected"]})
+    if embedding is None:
+        logger.warning(f"No face detected in uploaded image for user: {username}")
+        return JSONResponse({"status": "error", "message": "No face detected in image"})
+    
+    logger.info(f"Face encoding generated successfully for user: {username}")
+
+    # Store writes may wait on storage: keep them off the event loop
+    result = await run_in_threadpool(face_service.add_user_face, event_name, username, embedding)
+    result["spoofing_detect"] = spoofing_detect
+    logger.info(f"Add user result: {result} \n for {username}")
+    return JSONResponse(result)
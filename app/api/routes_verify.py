@@ -1,17 +1,20 @@
 from fastapi import APIRouter, File, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse
-from app.services import face_service_insightface as face_service
-from app.services.spoofing_detection import detect_spoofing
-import numpy as np
-from PIL import Image
-import io
+from starlette.concurrency import run_in_threadpool
+from app.services import face_service_insightface as face_service, sharding
+from app.services.storage_client import StorageUnavailable
+from app.services.analysis import analyze_crop_upload_async, analyze_group_upload_async, analyze_upload_async
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Event used by POST /verify when the form has no event_name
+DEFAULT_EVENT = "B"
+
 @router.post("/")
-async def verify_user(event_name: str = Form("B"), file: UploadFile = File(...)):
+async def verify_user(event_name: str = Form(DEFAULT_EVENT), file: UploadFile = File(...)):
     """
     Verify if a given face image belongs to a registered user in the event.
     """
@@ -23,39 +26,173 @@ async def verify_user(event_name: str = Form("B"), file: UploadFile = File(...))
 
     try:
         logger.info(f"Processing verification image for event: {event_name}")
-        # Load image and convert to numpy array
-        image = np.array(Image.open(io.BytesIO(file.file.read())))
-        logger.info(f"Verification image loaded successfully, shape: {image.shape}")
-
-        # Detect phone in image
-        logger.info(f"Phone detecting")
-        spoofing_detect = detect_spoofing(image)
-        
-        # Extract face embedding using DeepFace
-        embedding = face_service.extract_face_embedding(image)
-        if embedding is None:
-            logger.warning(f"No face detected in verification image for event: {event_name}")
-            return JSONResponse({"verified": False, "username": None, "message": "No face detected in image"})
-        
-        logger.info(f"Face encoding generated for verification in event: {event_name}")
-
-        # Call face_service
-        result = face_service.verify_face(event_name, embedding)
-        
-        # Convert result format for compatibility
+        # Detect phone and extract face embedding (cached for identical uploads)
+        analysis = await analyze_upload_async(file.file.read())
+        return await _verify_analysis(event_name, analysis)
+
+    except StorageUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Error verifying face in event {event_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/group")
+async def verify_group(event_name: str = Form(...), file: UploadFile = File(...), one_to_one: bool = Form(True)):
+    """
+    Identify every face in a group photo against the event in one detection and recognition pass.
+    With one_to_one (default), two faces can't both be matched to the same user.
+    """
+    logger.info(f"POST /verify/group endpoint accessed for event: {event_name}")
+
+    if not event_name:
+        logger.warning("Verify group request with empty event name")
+        return JSONResponse({"status": "error", "message": "No event was provided"})
+
+    try:
+        analysis = await analyze_group_upload_async(file.file.read())
+        faces = analysis["faces"]
+        if not faces:
+            logger.warning(f"No face detected in group image for event: {event_name}")
+            return JSONResponse({"status": "error", "message": "No face detected in image", "faces": []})
+
+        result = await run_in_threadpool(face_service.verify_group, event_name, faces, one_to_one=one_to_one)
+        if result["status"] != "success":
+            return JSONResponse(result)
+
         response = {
-            "flag": result.get('flag', False),
-            "username": result.get('username'),
-            "message": result.get('message', ''),
-            "user_in_system": result.get('user_in_system', False),
-            "confidence": float(result.get('confidence', 0)),
-            "face_detected": result.get('face_detected', False),
-            "spoofing_detect": spoofing_detect
+            "status": "success",
+            "face_count": len(faces),
+            "matched": result["matched"],
+            "spoofing_detect": analysis["spoofing_detect"],
+            "faces": [
+                dict(match, bbox=face["bbox"], quality=face["rejected"])
+                for face, match in zip(faces, result["faces"])
+            ]
         }
-        
-        logger.info(f"Verification result: {response} \n for event: {event_name}")
+        logger.info(f"Group verification result for event {event_name}: {result['matched']}/{len(faces)} matched")
         return JSONResponse(response)
 
+    except StorageUnavailable:
+        raise
     except Exception as e:
-        logger.error(f"Error verifying face in event {event_name}: {e}")
+        logger.error(f"Error verifying group in event {event_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/identify")
+async def identify_user(file: UploadFile = File(...), top_k: int = Form(5), events: str = Form("")):
+    """
+    Find which events a face is registered in, with one search across all events.
+    events optionally restricts the search to a comma separated list of event names.
+    """
+    event_filter = [e.strip() for e in events.split(",") if e.strip()] or None
+    logger.info(f"POST /verify/identify endpoint accessed (top_k: {top_k}, events: {event_filter or 'all'})")
+
+    if not 1 <= top_k <= 100:
+        return JSONResponse({"status": "error", "message": "top_k must be between 1 and 100"})
+
+    try:
+        analysis = await analyze_upload_async(file.file.read())
+        if analysis.get("rejected"):
+            logger.warning(f"Low quality face rejected for identification ({analysis['rejected']['code']})")
+            return JSONResponse({"status": "error", "message": analysis["rejected"]["message"], "face_detected": True, "quality": analysis["rejected"]})
+        if analysis["embedding"] is None:
+            logger.warning("No face detected in identification image")
+            return JSONResponse({"status": "error", "message": "No face detected in image", "face_detected": False})
+
+        identify = sharding.identify if sharding.enabled() else face_service.identify_face
+        result = await run_in_threadpool(identify, analysis["embedding"], top_k=top_k, events=event_filter)
+        if result["status"] == "success":
+            result["spoofing_detect"] = analysis["spoofing_detect"]
+        return JSONResponse(result)
+
+    except StorageUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Error identifying face: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/crop")
+async def verify_crop(event_name: str = Form(...), file: UploadFile = File(...)):
+    """
+    Verify an aligned 112x112 face crop produced by the client; detection and spoofing checks are skipped.
+    """
+    logger.info(f"POST /verify/crop endpoint accessed for event: {event_name}")
+
+    if not event_name:
+        logger.warning("Verify crop request with empty event name")
+        return JSONResponse({"verified": False, "username": None, "info": "No event was provided"})
+
+    try:
+        analysis = await analyze_crop_upload_async(file.file.read())
+        return await _verify_analysis(event_name, analysis)
+
+    except ValueError as e:
+        logger.warning(f"Invalid face crop for event {event_name}: {e}")
+        return JSONResponse({"verified": False, "username": None, "message": str(e)})
+    except StorageUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Error verifying face crop in event {event_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/embedding")
+async def verify_embedding(event_name: str = Form(...), embedding: str = Form(...), model_version: str = Form(...)):
+    """
+    Verify a precomputed embedding (JSON array) tagged with the model pack that produced it.
+    No model inference runs on the server.
+    """
+    logger.info(f"POST /verify/embedding endpoint accessed for event: {event_name}")
+
+    if not event_name:
+        logger.warning("Verify embedding request with empty event name")
+        return JSONResponse({"verified": False, "username": None, "info": "No event was provided"})
+
+    try:
+        vector = json.loads(embedding)
+    except json.JSONDecodeError:
+        return JSONResponse({"verified": False, "username": None, "message": "Embedding must be a JSON array"})
+
+    error = face_service.check_embedding(vector, model_version)
+    if error:
+        logger.warning(f"Rejected embedding for event {event_name}: {error}")
+        return JSONResponse({"verified": False, "username": None, "message": error})
+
+    try:
+        return await _verification_response(event_name, [float(v) for v in vector], None)
+
+    except StorageUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Error verifying embedding in event {event_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _verify_analysis(event_name: str, analysis: dict):
+    """Turn an image or crop analysis into the verification response."""
+    embedding = analysis["embedding"]
+    if analysis.get("rejected"):
+        logger.warning(f"Low quality face rejected for event: {event_name} ({analysis['rejected']['code']})")
+        return JSONResponse({"verified": False, "username": None, "message": analysis["rejected"]["message"], "face_detected": True, "quality": analysis["rejected"]})
+    if embedding is None:
+        logger.warning(f"No face detected in verification image for event: {event_name}")
+        return JSONResponse({"verified": False, "username": None, "message": "No face detected in image"})
+
+    logger.info(f"Face encoding generated for verification in event: {event_name}")
+    return await _verification_response(event_name, embedding, analysis["spoofing_detect"])
+
+async def _verification_response(event_name: str, embedding: list, spoofing_detect):
+    # Index refreshes may wait on storage: keep them off the event loop
+    result = await run_in_threadpool(face_service.verify_face, event_name, embedding)
+    
+    # Convert result format for compatibility
+    response = {
+        "flag": result.get('flag', False),
+        "username": result.get('username'),
+        "message": result.get('message', ''),
+        "user_in_system": result.get('user_in_system', False),
+        "confidence": float(result.get('confidence', 0)),
+        "face_detected": result.get('face_detected', False),
+        "spoofing_detect": spoofing_detect
+    }
+    
+    logger.info(f"Verification result: {response} \n for event: {event_name}")
+    return JSONResponse(response)
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Form, HTTPException, Request
+from typing import Optional
+import json
+import logging
+from app.api import routes_verify
+from app.services import face_service_insightface as face_service, sharding
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+async def require_owner(request: Request, event_name: Optional[str] = Form(None)):
+    """
+    Router dependency for /verify and /addUser: requests for an event owned by another node
+    get a 307 redirect there (the client resends the same form to the owner).
+    """
+    if event_name is None and request.url.path.rstrip("/") == "/verify":
+        # POST /verify without an event_name verifies against the default event
+        event_name = routes_verify.DEFAULT_EVENT
+    if not event_name or sharding.is_local(event_name):
+        return
+    target = sharding.owner_url(event_name)
+    if target is None:
+        logger.error(f"No node owns event '{event_name}'")
+        raise HTTPException(status_code=503, detail="No node available for this event")
+    location = target + request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    logger.info(f"Redirecting {request.url.path} for event '{event_name}' to node '{sharding.owner(event_name)}'")
+    raise HTTPException(status_code=307, detail=f"Event '{event_name}' is served by {target}", headers={"Location": location})
+
+
+@router.get("/shards")
+def get_shards():
+    """Ring configuration of this node"""
+    logger.info("GET /shards endpoint accessed")
+    return sharding.status()
+
+
+@router.get("/shards/owner")
+def get_shard_owner(event_name: str):
+    """Node owning an event"""
+    node = sharding.owner(event_name)
+    return {"event_name": event_name, "node": node, "url": sharding.owner_url(event_name) if node else None, "local": sharding.is_local(event_name)}
+
+
+@router.post("/shards/identify")
+def identify_local(embedding: str = Form(...), top_k: int = Form(5), events: str = Form("")):
+    """Identification over this node's events only (the per-node step of /verify/identify)"""
+    event_filter = [e.strip() for e in events.split(",") if e.strip()] or None
+    logger.info(f"POST /shards/identify endpoint accessed (top_k: {top_k}, events: {event_filter or 'all'})")
+    return face_service.identify_face(json.loads(embedding), top_k=top_k, events=event_filter)
+
+
+@router.post("/shards/rebalance")
+def run_rebalance():
+    """Move events stored here but owned by another node to their owners"""
+    logger.info("POST /shards/rebalance endpoint accessed")
+    return sharding.rebalance()
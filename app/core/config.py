@@ -1,4 +1,5 @@
 import os
+import tempfile
 import logging
 from dotenv import load_dotenv
 
@@ -15,3 +16,116 @@ if not all([CLOUD_NAME, API_KEY, API_SECRET]):
     logger.error("Missing required Cloudinary environment variables")
 else:
     logger.info("Cloudinary configuration loaded successfully")
+
+# Content-addressed cache for repeated identical uploads
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+
+# Serverless cold-start mode (e.g. AWS Lambda, where only /tmp is writable)
+SERVERLESS_MODE = os.getenv("SERVERLESS_MODE", "false").lower() == "true"
+# Writable directory models are read from; empty keeps the bundled locations
+MODEL_DIR = os.getenv("MODEL_DIR", "/tmp/models" if SERVERLESS_MODE else "")
+# Log directory; empty disables the rotating file handler (stdout only)
+LOG_DIR = os.getenv("LOG_DIR", "" if SERVERLESS_MODE else "logs")
+# Load models during startup instead of on the first request that needs them
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() == "true"
+
+# Spoofing detection engine: "ultralytics" (PyTorch) or "onnx" (onnxruntime, no torch on the request path)
+SPOOFING_ENGINE = os.getenv("SPOOFING_ENGINE", "ultralytics").lower()
+SPOOFING_ONNX_MODEL = os.getenv("SPOOFING_ONNX_MODEL", "yolov8n.onnx")
+SPOOFING_IMGSZ = int(os.getenv("SPOOFING_IMGSZ", "320"))
+SPOOFING_CONF = float(os.getenv("SPOOFING_CONF", "0.3"))
+
+# Event sharding across nodes: "name=url" pairs, e.g. "a=http://10.0.0.1:8000,b=http://10.0.0.2:8000".
+# Empty disables sharding. SHARD_SELF is this node's name; a node missing from SHARD_NODES owns no events.
+SHARD_NODES = dict(
+    (name.strip(), url.strip().rstrip("/"))
+    for name, _, url in (pair.partition("=") for pair in os.getenv("SHARD_NODES", "").split(",") if pair.strip())
+)
+SHARD_SELF = os.getenv("SHARD_SELF", "")
+# Points per node on the hash ring; more points spread events more evenly
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+# Push events this node no longer owns to their owners at startup
+SHARD_REBALANCE_ON_START = os.getenv("SHARD_REBALANCE_ON_START", "true").lower() == "true"
+
+# Shared embedding index: memory-mapped files all uvicorn workers map read-only.
+# /dev/shm keeps the pages in shared memory on Linux. Shard nodes get their own directory.
+_index_name = f"face_recognition_index_{SHARD_SELF}" if SHARD_SELF else "face_recognition_index"
+INDEX_DIR = os.getenv(
+    "INDEX_DIR",
+    os.path.join("/dev/shm", _index_name) if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), _index_name)
+)
+# An index older than this (seconds) is checked against the store's metadata summary version
+# and rebuilt in the background when another host wrote to the store (0 = never check).
+# Each check reads the summary only; replicas follow the change feed instead (see REPLICA_OF).
+INDEX_MAX_AGE = float(os.getenv("INDEX_MAX_AGE", "10"))
+
+# Dedicated inference processes (0 = run models inside the API process)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+
+# Hot/cold event tiering
+# Events not accessed for this long move to compressed cold storage (seconds, 0 = never)
+COLD_AFTER = float(os.getenv("COLD_AFTER", str(7 * 24 * 3600)))
+# How often access times are flushed and inactive events demoted (seconds, 0 = disabled)
+TIERING_INTERVAL = float(os.getenv("TIERING_INTERVAL", "300"))
+# Memory budget for resident per-event indices (MB, 0 = unlimited)
+INDEX_MEMORY_BUDGET_MB = float(os.getenv("INDEX_MEMORY_BUDGET_MB", "0"))
+
+# Face quality gate, applied after detection and before recognition (opt-in: it rejects
+# frames that earlier versions accepted)
+QUALITY_GATE = os.getenv("QUALITY_GATE", "false").lower() == "true"
+QUALITY_MIN_DET_SCORE = float(os.getenv("QUALITY_MIN_DET_SCORE", "0.6"))
+QUALITY_MIN_FACE_SIZE = float(os.getenv("QUALITY_MIN_FACE_SIZE", "48"))      # pixels, shorter bbox side
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", "20"))      # Laplacian variance of the 112x112 face crop
+QUALITY_MAX_YAW = float(os.getenv("QUALITY_MAX_YAW", "40"))                  # degrees, estimated from landmarks
+QUALITY_MAX_PITCH = float(os.getenv("QUALITY_MAX_PITCH", "35"))              # degrees, estimated from landmarks
+
+# InsightFace model pack (buffalo_l, buffalo_s, ...) and the modules loaded from it
+FACE_MODEL_PACK = os.getenv("FACE_MODEL_PACK", "buffalo_l")
+# Comma separated; empty loads every model in the pack (landmarks, gender/age, ...)
+FACE_MODULES = [m.strip() for m in os.getenv("FACE_MODULES", "detection,recognition").split(",") if m.strip()]
+# Length of the recognition model's embedding (512 for the buffalo packs)
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))
+# Maximum number of faces identified in one group check-in frame
+GROUP_MAX_FACES = int(os.getenv("GROUP_MAX_FACES", "20"))
+# Imports are validated into float32 arrays, but applying them rewrites the whole store
+# document in memory; larger imports are rejected (0 = unlimited)
+IMPORT_MAX_EMBEDDINGS = int(os.getenv("IMPORT_MAX_EMBEDDINGS", "100000"))
+
+# Token for the /debug diagnostics endpoints (sent as X-Admin-Token); empty disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Cloudinary reads: per-call deadline (all attempts), retries with jittered exponential backoff,
+# pooled connections and a circuit breaker
+STORAGE_DEADLINE = float(os.getenv("STORAGE_DEADLINE", "8"))
+STORAGE_RETRIES = int(os.getenv("STORAGE_RETRIES", "3"))
+STORAGE_BACKOFF_BASE = float(os.getenv("STORAGE_BACKOFF_BASE", "0.2"))
+STORAGE_BACKOFF_MAX = float(os.getenv("STORAGE_BACKOFF_MAX", "2"))
+STORAGE_MAX_CONNECTIONS = int(os.getenv("STORAGE_MAX_CONNECTIONS", "20"))
+STORAGE_BREAKER_FAILURES = int(os.getenv("STORAGE_BREAKER_FAILURES", "5"))
+STORAGE_BREAKER_RESET = float(os.getenv("STORAGE_BREAKER_RESET", "30"))
+
+# Detector input sizes tried smallest first; larger sizes run only when no face, or only a face
+# smaller than DETECTION_MIN_FACE_PX at that input size, was found. One size = fixed detection.
+DETECTION_SIZES = sorted({int(s) for s in os.getenv("DETECTION_SIZES", "320,480,640").split(",") if s.strip()})
+if not DETECTION_SIZES or DETECTION_SIZES[0] <= 0:
+    # With no size the detector would never run and every frame would report "no face"
+    raise ValueError(f"DETECTION_SIZES must list positive detector input sizes, got '{os.getenv('DETECTION_SIZES')}'")
+DETECTION_MIN_FACE_PX = float(os.getenv("DETECTION_MIN_FACE_PX", "24"))
+
+# Thread budget per model-running process: "auto" splits the available CPUs across the
+# processes on this host, a number fixes it, "0" leaves every runtime at its own default
+THREAD_BUDGET = os.getenv("THREAD_BUDGET", "auto").lower()
+# uvicorn worker processes on this host (uvicorn reads the same variable for --workers)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Per-runtime overrides (0 = derived from the budget)
+ORT_THREADS = int(os.getenv("ORT_THREADS", "0"))
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))
+BLAS_THREADS = int(os.getenv("BLAS_THREADS", "0"))
+OPENCV_THREADS = int(os.getenv("OPENCV_THREADS", "0"))
+
+# Change feed: the last CHANGE_LOG_SIZE store changes are kept for GET /api/changes
+CHANGE_LOG_SIZE = int(os.getenv("CHANGE_LOG_SIZE", "256"))
+# Replica mode: base URL of the node whose change feed this node applies to its index
+REPLICA_OF = os.getenv("REPLICA_OF", "").rstrip("/")
+REPLICA_POLL_INTERVAL = float(os.getenv("REPLICA_POLL_INTERVAL", "2"))
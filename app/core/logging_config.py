@@ -3,12 +3,9 @@ import sys
 from logging.handlers import RotatingFileHandler
 import os
 
-def setup_logging():
+def setup_logging(log_dir: str = "logs"):
     """Configure logging for the entire application"""
     
-    # Create logs directory if it doesn't exist
-    os.makedirs("logs", exist_ok=True)
-    
     # Simple logging configuration
     logging.basicConfig(
         level=logging.INFO,
@@ -16,14 +13,17 @@ def setup_logging():
         force=True  # Override existing configuration
     )
     
-    # Add file handler
-    file_handler = RotatingFileHandler(
-        "logs/app.log",
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    logging.getLogger().addHandler(file_handler)
+    # Add file handler (skipped when no log directory is configured, e.g. serverless)
+    if log_dir:
+        # Create logs directory if it doesn't exist
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            os.path.join(log_dir, "app.log"),
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5
+        )
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        logging.getLogger().addHandler(file_handler)
     
     # Set specific log levels for external libraries
     logging.getLogger("cloudinary").setLevel(logging.WARNING)
@@ -0,0 +1,128 @@
+"""
+Process-wide thread budget for the native runtimes a request fans out to.
+
+InsightFace (onnxruntime), YOLO (torch), OpenCV and NumPy's BLAS each size their own thread
+pool to every core of the machine, so several uvicorn workers or inference processes on one
+host oversubscribe the CPU many times over. The budget splits the available CPUs (affinity
+mask and cgroup quota) evenly across the processes that run models and gives each runtime an
+explicit thread count:
+
+- BLAS / OpenMP and OpenCV read their limits from environment variables when first imported,
+  so apply_env() must run before numpy and cv2 are imported (top of app.main);
+- onnxruntime sessions are created with session_options();
+- torch is configured by configure_torch() when the YOLO model loads.
+
+Variables already set in the environment are left untouched.
+"""
+import logging
+import math
+import os
+import sys
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+BLAS_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+OPENCV_ENV_VAR = "OPENCV_FOR_THREADS_NUM"
+
+_budget = None
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: the affinity mask, capped by a cgroup v2 CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def model_processes() -> int:
+    """Processes on this host that run models (each uvicorn worker starts its own inference pool)."""
+    return config.WEB_CONCURRENCY * max(1, config.INFERENCE_WORKERS)
+
+
+def _compute():
+    if config.THREAD_BUDGET == "0":
+        return None
+    cpus = available_cpus()
+    processes = model_processes()
+    if config.THREAD_BUDGET == "auto":
+        threads = max(1, cpus // processes)
+    else:
+        threads = max(1, int(config.THREAD_BUDGET))
+    return {
+        "cpus": cpus,
+        "processes": processes,
+        "threads": threads,
+        # Models run one after another within a request, so each runtime may use the whole share
+        "onnxruntime": config.ORT_THREADS or threads,
+        "torch": config.TORCH_THREADS or threads,
+        "blas": config.BLAS_THREADS or threads,
+        # OpenCV only does small resizes and colour conversions here; pool wake-ups cost more than they save
+        "opencv": config.OPENCV_THREADS or 1
+    }
+
+
+def budget():
+    """The thread budget of this process, or None when THREAD_BUDGET is 0 (runtime defaults)."""
+    global _budget
+    if _budget is None:
+        _budget = _compute() or {}
+    return _budget or None
+
+
+def apply_env():
+    """Export BLAS/OpenMP and OpenCV thread counts; must run before numpy and cv2 are imported."""
+    current = budget()
+    if current is None:
+        return
+    for var in BLAS_ENV_VARS:
+        os.environ.setdefault(var, str(current["blas"]))
+    os.environ.setdefault(OPENCV_ENV_VAR, str(current["opencv"]))
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(int(os.environ[OPENCV_ENV_VAR]))
+
+
+def session_options():
+    """onnxruntime SessionOptions for the budget (None keeps the onnxruntime defaults)."""
+    current = budget()
+    if current is None:
+        return None
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = current["onnxruntime"]
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    return options
+
+
+def configure_torch():
+    """Apply the budget to torch (call after torch is imported)."""
+    current = budget()
+    if current is None or "torch" not in sys.modules:
+        return
+    torch = sys.modules["torch"]
+    torch.set_num_threads(current["torch"])
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before torch starts any parallel work
+        pass
+
+
+def report():
+    """Configured budget plus the thread counts the runtimes actually use."""
+    effective = {var: os.environ.get(var) for var in BLAS_ENV_VARS + (OPENCV_ENV_VAR,)}
+    if "cv2" in sys.modules:
+        effective["cv2.getNumThreads"] = sys.modules["cv2"].getNumThreads()
+    if "torch" in sys.modules:
+        effective["torch.get_num_threads"] = sys.modules["torch"].get_num_threads()
+    return {"budget": budget(), "effective": effective}
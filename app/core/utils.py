@@ -1,4 +1,8 @@
+import base64
+import bisect
 import logging
+import os
+import shutil
 import time
 from functools import wraps
 
@@ -34,4 +38,58 @@ def validate_image_format(filename: str) -> bool:
     else:
         logger.warning(f"Unsupported image format: {file_ext}")
     
-    return is_valid
\ No newline at end of file
+    return is_valid
+
+def resolve_model_dir(model_dir: str, bundled_dir: str) -> str:
+    """
+    Ensure a writable model directory exists and seed it with bundled model files.
+    Used in cold-start mode where the package is read-only and models live in e.g. /tmp.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    if os.path.abspath(model_dir) == os.path.abspath(bundled_dir) or not os.path.isdir(bundled_dir):
+        return model_dir
+
+    for name in os.listdir(bundled_dir):
+        src = os.path.join(bundled_dir, name)
+        dst = os.path.join(model_dir, name)
+        if os.path.exists(dst):
+            continue
+        logger.info(f"Seeding model directory with bundled file: {name}")
+        if os.path.isdir(src):
+            shutil.copytree(src, dst)
+        else:
+            shutil.copy2(src, dst)
+    return model_dir
+
+
+def resolve_model_file(filename: str, model_dir: str, bundled_dir: str) -> str:
+    """Return the path of a model file inside the configured model directory."""
+    if not model_dir:
+        return os.path.join(bundled_dir, filename)
+    resolve_model_dir(model_dir, bundled_dir)
+    return os.path.join(model_dir, filename)
+
+
+def encode_cursor(key: str) -> str:
+    """Encode the last returned key as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def paginate(sorted_keys: list, limit=None, cursor=None):
+    """
+    Return (page, next_cursor) for keys sorted ascending.
+    The cursor is the last key of the previous page, so pages stay stable under inserts.
+    """
+    start = bisect.bisect_right(sorted_keys, decode_cursor(cursor)) if cursor else 0
+    if limit is None:
+        return sorted_keys[start:], None
+    page = sorted_keys[start:start + limit]
+    next_cursor = encode_cursor(page[-1]) if page and start + limit < len(sorted_keys) else None
+    return page, next_cursor
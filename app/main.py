@@ -1,16 +1,23 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 import logging
 import os
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core import config, thread_budget
+# Thread limits of BLAS/OpenMP and OpenCV are read at import time: set them before the routers import numpy
+thread_budget.apply_env()
+
 from app.core.logging_config import setup_logging
-from app.api import routes_add, routes_verify, events
+# Routers only import lightweight modules; models and heavy ML libraries load on first use
+from app.api import routes_add, routes_verify, events, shards, metrics as metrics_routes, diagnostics as diagnostics_routes
+from app.services import change_feed, diagnostics, event_tiering, inference_pool, sharding, storage_client
 
 # Database configuration flag
 USE_CLOUDINARY = os.getenv("USE_CLOUDINARY", "true").lower() == "true"
 
 # Initialize logging
-setup_logging()
+setup_logging(config.LOG_DIR)
 logger = logging.getLogger(__name__)
 logger.info(f"Database mode: {'Cloudinary' if USE_CLOUDINARY else 'Local data/embeddings.json'}")
 
@@ -30,26 +37,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 # Include routers
-app.include_router(routes_verify.router, prefix="/verify", tags=["Verify"])
+# With sharding, requests for events owned by another node are redirected there
+app.include_router(routes_verify.router, prefix="/verify", tags=["Verify"], dependencies=[Depends(shards.require_owner)])
 
-app.include_router(routes_add.router, prefix="/addUser", tags=["Add User"])
+app.include_router(routes_add.router, prefix="/addUser", tags=["Add User"], dependencies=[Depends(shards.require_owner)])
 
 app.include_router(events.router, prefix="/api", tags=["Events"])
 
+app.include_router(shards.router, prefix="/api", tags=["Shards"])
+
+app.include_router(metrics_routes.router, tags=["Metrics"])
+
+app.include_router(diagnostics_routes.router, prefix="/debug", tags=["Diagnostics"])
+
+@app.exception_handler(storage_client.StorageUnavailable)
+async def storage_unavailable(request: Request, exc: Exception):
+    """Storage outages (e.g. no index published yet and Cloudinary unreachable) are retryable."""
+    logger.warning(f"Storage unavailable for {request.url.path}: {exc}")
+    return JSONResponse(
+        {"status": "error", "message": "Storage temporarily unavailable, retry later"},
+        status_code=503,
+        headers={"Retry-After": str(int(config.STORAGE_BREAKER_RESET))}
+    )
+
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    """Feed completed requests to a running profile capture (/debug calls excluded)."""
+    response = await call_next(request)
+    if not request.url.path.startswith("/debug"):
+        diagnostics.request_finished()
+    return response
+
 logger.info(f"FastAPI application initialized with all routers (Storage: {'Cloudinary' if USE_CLOUDINARY else 'data/embeddings.json'})")
 
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Face Recognition API starting up")
+    logger.info(f"Face Recognition API starting up (serverless mode: {config.SERVERLESS_MODE})")
+    logger.info(f"Thread budget: {thread_budget.budget() or 'runtime defaults'}")
+    if config.PRELOAD_MODELS:
+        from app.services.face_service_insightface import get_face_app
+        from app.services.spoofing_detection import load_model
+        logger.info("Preloading models")
+        get_face_app()
+        load_model()
+    if inference_pool.enabled():
+        inference_pool.start()
+    event_tiering.start()
+    # Before serving: a new shard node's events may still be in the unsharded folder
+    sharding.import_unsharded()
+    if sharding.enabled():
+        logger.info(f"Sharding enabled: node '{config.SHARD_SELF}' of {sorted(config.SHARD_NODES)}")
+        if config.SHARD_REBALANCE_ON_START:
+            sharding.start_rebalance()
+    change_feed.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Face Recognition API shutting down")
+    inference_pool.shutdown()
+    event_tiering.stop()
+    change_feed.stop()
+    storage_client.close()
 
 @app.get("/")
 def root():
     logger.info("Root endpoint accessed")
     return {
         "message": "Face Recognition API is running!",
-        "storage": "Cloudinary" if USE_CLOUDINARY else "data/embeddings.json"
+        "storage": "Cloudinary" if USE_CLOUDINARY else "data/embeddings.json",
+        "storage_status": storage_client.status() if USE_CLOUDINARY else None,
+        "shard": config.SHARD_SELF or None,
+        "replica": change_feed.status() if config.REPLICA_OF else None
     }
@@ -0,0 +1,174 @@
+import io
+import logging
+import numpy as np
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+from app.services import face_service_insightface as face_service
+from app.services import inference_pool, metrics
+from app.services.spoofing_detection import detect_spoofing
+from app.services.result_cache import analysis_cache, content_key
+
+logger = logging.getLogger(__name__)
+
+
+def analyze_image(image: np.ndarray):
+    """
+    Run face extraction and spoofing detection on a decoded image.
+    Spoofing detection is skipped when no usable face was found, so rejected frames exit early.
+    """
+    trace = []
+    details = face_service.extract_face_details(image, trace=trace) or {}
+    embedding = details.get("embedding")
+    return {
+        "embedding": embedding,
+        "bbox": details.get("bbox"),
+        "quality": details.get("quality"),
+        "rejected": details.get("rejected"),
+        "spoofing_detect": detect_spoofing(image) if embedding is not None else False,
+        "detection": trace
+    }
+
+
+def analyze_group_image(image: np.ndarray):
+    """Embed every face of a group frame; spoofing detection runs once for the frame."""
+    trace = []
+    faces = face_service.extract_group_details(image, trace=trace) or []
+    embedded = any(face["embedding"] is not None for face in faces)
+    return {
+        "faces": faces,
+        "spoofing_detect": detect_spoofing(image) if embedded else False,
+        "detection": trace
+    }
+
+
+def analyze_upload(contents: bytes):
+    """
+    Analyze raw uploaded image bytes, reusing the cached result for byte-identical uploads.
+    Only per-image work is cached; matching always runs against the current event data.
+    """
+    key = content_key(contents)
+    cached = _cached_result(key)
+    if cached is not None:
+        return cached
+
+    result = analyze_image(_decode(contents))
+    metrics.record_detection(result["detection"])
+    analysis_cache.put(key, result)
+    return dict(result, cached=False)
+
+
+async def analyze_upload_async(contents: bytes):
+    """
+    Same as analyze_upload, but keeps the models off the event loop so it keeps serving other
+    requests: on the inference worker pool when enabled, otherwise in the thread pool.
+    """
+    if not inference_pool.enabled():
+        return await run_in_threadpool(analyze_upload, contents)
+
+    key = content_key(contents)
+    cached = _cached_result(key)
+    if cached is not None:
+        return cached
+
+    result = await inference_pool.analyze_async(_decode(contents))
+    metrics.record_detection(result["detection"])
+    analysis_cache.put(key, result)
+    return dict(result, cached=False)
+
+
+def analyze_group_upload(contents: bytes):
+    """Group counterpart of analyze_upload."""
+    key = "group:" + content_key(contents)
+    cached = _cached_result(key)
+    if cached is not None:
+        return cached
+
+    result = analyze_group_image(_decode(contents))
+    metrics.record_detection(result["detection"])
+    analysis_cache.put(key, result)
+    return dict(result, cached=False)
+
+
+async def analyze_group_upload_async(contents: bytes):
+    """Group counterpart of analyze_upload_async."""
+    if not inference_pool.enabled():
+        return await run_in_threadpool(analyze_group_upload, contents)
+
+    key = "group:" + content_key(contents)
+    cached = _cached_result(key)
+    if cached is not None:
+        return cached
+
+    result = await inference_pool.analyze_async(_decode(contents), kind="group")
+    metrics.record_detection(result["detection"])
+    analysis_cache.put(key, result)
+    return dict(result, cached=False)
+
+
+def analyze_crop_image(image: np.ndarray):
+    """Recognition only for an aligned face crop (see _crop_image); no detection or spoofing check."""
+    details = face_service.extract_crop_details(image) or {}
+    return {
+        "embedding": details.get("embedding"),
+        "bbox": None,
+        "quality": details.get("quality"),
+        "rejected": details.get("rejected"),
+        "spoofing_detect": None
+    }
+
+
+def analyze_crop_upload(contents: bytes):
+    """
+    Analyze an uploaded aligned face crop: recognition only, no detection or spoofing check.
+    Raises ValueError when the image is not a CROP_SIZE x CROP_SIZE crop.
+    """
+    key = "crop:" + content_key(contents)
+    cached = _cached_result(key)
+    if cached is not None:
+        return cached
+
+    result = analyze_crop_image(_crop_image(contents))
+    analysis_cache.put(key, result)
+    return dict(result, cached=False)
+
+
+async def analyze_crop_upload_async(contents: bytes):
+    """Crop counterpart of analyze_upload_async: the recognition model runs on the inference worker pool or in the thread pool."""
+    if not inference_pool.enabled():
+        return await run_in_threadpool(analyze_crop_upload, contents)
+
+    key = "crop:" + content_key(contents)
+    cached = _cached_result(key)
+    if cached is not None:
+        return cached
+
+    result = await inference_pool.analyze_async(_crop_image(contents), kind="crop")
+    analysis_cache.put(key, result)
+    return dict(result, cached=False)
+
+
+def _cached_result(key: str):
+    cached = analysis_cache.get(key)
+    if cached is None:
+        return None
+    logger.info(f"Result cache hit for upload {key[:12]}, skipping detection")
+    return dict(cached, cached=True)
+
+
+def _crop_image(contents: bytes) -> np.ndarray:
+    """Decode an uploaded face crop as RGB; raises ValueError unless it is CROP_SIZE x CROP_SIZE."""
+    image = _decode(contents)
+    size = face_service.CROP_SIZE
+    if image.shape[:2] != (size, size):
+        raise ValueError(f"Face crop must be an aligned {size}x{size} image, got {image.shape[1]}x{image.shape[0]}")
+    if image.ndim == 2:
+        image = np.stack([image] * 3, axis=-1)
+    elif image.shape[2] == 4:
+        image = image[:, :, :3]
+    return image
+
+
+def _decode(contents: bytes) -> np.ndarray:
+    image = np.array(Image.open(io.BytesIO(contents)))
+    logger.info(f"Image loaded successfully, shape: {image.shape}")
+    return image
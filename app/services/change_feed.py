@@ -0,0 +1,226 @@
+"""
+Versioned change feed for incremental replica updates.
+
+Every store write appends its changes to a small log (see embedding_store._record_changes)
+under a new, monotonically increasing version:
+
+- add: {"event_name", "username", "embedding"} (add_user_face)
+- delete_user: {"event_name", "username"}
+- delete_event: {"event_name"}
+- sync_event: {"event_name"} (bulk writes such as imports: re-fetch the whole event)
+- demote_event: {"event_name"} (moved to cold storage)
+- reset: rebuild from the store (full-store writes, or a change that could not be logged)
+
+GET /api/changes?since=<version> serves the entries newer than since. A node started with
+REPLICA_OF=<primary url> polls that feed and applies the deltas to its own embedding index with
+partial publishes, so propagation costs scale with churn instead of with the store size. The
+index manifest records the feed version it reflects; a replica without one, or one that fell
+behind the retained log, rebuilds once from the store and continues from there.
+"""
+import io
+import logging
+import os
+import threading
+import numpy as np
+from app.core import config
+from app.services import embedding_index, embedding_store
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = os.path.join(config.INDEX_DIR, "replica.lock")
+# Changes requested per poll
+BATCH_SIZE = 500
+
+_poll_thread = None
+_stop = threading.Event()
+_status = {"version": None, "applied": 0, "rebuilds": 0, "error": None}
+
+
+def changes_since(since: int, limit: int = BATCH_SIZE):
+    """
+    Changes newer than version since, at most limit entries (never splitting a version).
+    Returns {"version": head, "next": version after applying the changes, "changes", "reset", "more"};
+    reset means since is no longer covered by the log and the reader must rebuild from the store.
+    """
+    log = embedding_store.load_change_log()
+    head = log["version"]
+    if since < log.get("floor", 0) or since > head:
+        return {"version": head, "next": head, "changes": [], "reset": True, "more": False}
+
+    pending = [entry for entry in log["changes"] if entry["version"] > since]
+    changes = pending[:limit]
+    if len(changes) < len(pending):
+        last = pending[len(changes)]["version"]
+        complete = [entry for entry in changes if entry["version"] < last]
+        # A single version larger than limit is returned whole
+        changes = complete or [entry for entry in pending if entry["version"] == pending[0]["version"]]
+    more = len(changes) < len(pending)
+    return {
+        "version": head,
+        "next": changes[-1]["version"] if more else head,
+        "changes": changes,
+        "reset": False,
+        "more": more
+    }
+
+
+def _try_lock():
+    """Non-blocking cross-process lock so only one worker per host applies the feed."""
+    if fcntl is None:
+        return True, None
+    os.makedirs(config.INDEX_DIR, exist_ok=True)
+    lock = open(LOCK_FILE, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True, lock
+    except OSError:
+        lock.close()
+        return False, None
+
+
+def _fetch_changes(client, since: int, limit: int = BATCH_SIZE):
+    response = client.get(f"{config.REPLICA_OF}/api/changes", params={"since": since, "limit": limit})
+    response.raise_for_status()
+    return response.json()
+
+
+def _fetch_event(client, event_name: str):
+    """Current users of an event on the primary ({username: [embedding]}), or None if it is gone."""
+    from app.services import event_transfer
+
+    response = client.get(f"{config.REPLICA_OF}/api/events/{event_name}/export", params={"format": "npz"})
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    users = {}
+    for username, embeddings in event_transfer.iter_import_npz(io.BytesIO(response.content)):
+        users.setdefault(username, []).extend(embeddings)
+    return users
+
+
+def _local_users(event_name: str):
+    """Users of an event in this node's index as {username: [embedding]}."""
+    from app.services import event_transfer
+
+    event_index = embedding_index.get_event_index(event_name)
+    if event_index is None:
+        return {}
+    return {
+        username: list(event_transfer._raw_rows(event_index, start, end))
+        for username, start, end in event_transfer._iter_user_rows(event_index)
+    }
+
+
+def _apply(client, changes: list, manifest: dict):
+    """Fold changes into per-event updates; returns (updates, demoted)."""
+    updates, demoted = {}, set()
+    for change in changes:
+        op, event_name = change["op"], change.get("event_name")
+        if op in ("add", "delete_user") and event_name not in updates and event_name in manifest.get("cold_events", []):
+            # The write promoted a cold event on the primary: take the event as a whole
+            op = "sync_event"
+
+        if op == "demote_event":
+            updates.pop(event_name, None)
+            demoted.add(event_name)
+            continue
+        demoted.discard(event_name)
+        if op == "delete_event":
+            updates[event_name] = None
+        elif op == "sync_event":
+            updates[event_name] = _fetch_event(client, event_name)
+        elif op in ("add", "delete_user"):
+            if event_name not in updates:
+                updates[event_name] = _local_users(event_name) if event_name in manifest["events"] else {}
+            users = updates[event_name] = updates[event_name] or {}
+            if op == "delete_user":
+                users.pop(change["username"], None)
+                continue
+            embeddings = users.setdefault(change["username"], [])
+            # Changes may be replayed over a store snapshot that already holds them
+            if not any(np.allclose(existing, change["embedding"], atol=1e-5) for existing in embeddings):
+                embeddings.append(np.asarray(change["embedding"], dtype=np.float32))
+        else:
+            raise ValueError(f"Unknown change operation '{op}'")
+
+    return {name: users or None for name, users in updates.items()}, demoted
+
+
+def _rebuild(version: int):
+    embedding_index.rebuild(feed_version=version)
+    _status["rebuilds"] += 1
+    logger.info(f"Replica index rebuilt from store at change feed v{version}")
+
+
+def poll_once():
+    """Bring this node's index up to the primary's change feed; returns the applied feed version."""
+    import httpx
+
+    acquired, lock = _try_lock()
+    if not acquired:
+        return None
+    try:
+        with httpx.Client(timeout=config.STORAGE_DEADLINE * 10) as client:
+            applied = embedding_index.feed_version()
+            if applied is None:
+                # Read the head first: changes written during the rebuild are replayed afterwards
+                _rebuild(_fetch_changes(client, 0, 0)["version"])
+                applied = embedding_index.feed_version()
+
+            more = True
+            while more and not _stop.is_set():
+                feed = _fetch_changes(client, applied)
+                more = feed["more"]
+                if feed["reset"] or any(change["op"] == "reset" for change in feed["changes"]):
+                    _rebuild(feed["version"])
+                    applied = feed["version"]
+                    more = True
+                    continue
+                if feed["next"] == applied:
+                    break
+                version = embedding_index.current_version()
+                updates, demoted = _apply(client, feed["changes"], embedding_index._read_manifest(version))
+                embedding_index.publish_events(updates, demoted=demoted, feed_version=feed["next"])
+                _status["applied"] += len(feed["changes"])
+                logger.info(f"Applied {len(feed['changes'])} changes (v{applied} -> v{feed['next']}) to {len(updates) + len(demoted)} events")
+                applied = feed["next"]
+        _status.update(version=applied, error=None)
+        return applied
+    finally:
+        if lock is not None:
+            lock.close()
+
+
+def _poll_loop():
+    while not _stop.wait(config.REPLICA_POLL_INTERVAL):
+        try:
+            poll_once()
+        except Exception as e:
+            _status["error"] = str(e)
+            logger.error(f"Applying change feed of {config.REPLICA_OF} failed: {e}")
+
+
+def status():
+    return {"replica_of": config.REPLICA_OF or None, **_status}
+
+
+def start():
+    """Start polling the primary's change feed (no-op unless REPLICA_OF is set)."""
+    global _poll_thread
+    if config.REPLICA_OF and _poll_thread is None:
+        _stop.clear()
+        _poll_thread = threading.Thread(target=_poll_loop, name="change-feed", daemon=True)
+        _poll_thread.start()
+        logger.info(f"Replica of {config.REPLICA_OF} (poll interval: {config.REPLICA_POLL_INTERVAL}s)")
+
+
+def stop():
+    global _poll_thread
+    if _poll_thread is not None:
+        _stop.set()
+        _poll_thread = None
@@ -1,37 +1,106 @@
-import cloudinary
-import cloudinary.uploader
 import logging
 from app.core import config
+from app.services.storage_client import StorageUnavailable, breaker
 
 logger = logging.getLogger(__name__)
 
-cloudinary.config(
-    cloud_name=config.CLOUD_NAME,
-    api_key=config.API_KEY,
-    api_secret=config.API_SECRET
-)
+# Shard nodes keep their events under their own folder and import their share of the
+# unsharded folder once (see sharding.import_unsharded)
+UNSHARDED_FOLDER = "face_recognition"
+ROOT_FOLDER = f"{UNSHARDED_FOLDER}/shards/{config.SHARD_SELF}" if config.SHARD_SELF else UNSHARDED_FOLDER
+EMBEDDINGS_PUBLIC_ID = f"{ROOT_FOLDER}/embeddings"  # folder + filename in Cloudinary
+METADATA_PUBLIC_ID = f"{ROOT_FOLDER}/metadata"  # event summary index (counts, usernames)
+COLD_PREFIX = f"{ROOT_FOLDER}/cold/"  # gzip-compressed copies of inactive events
+CHANGES_PUBLIC_ID = f"{ROOT_FOLDER}/changes"  # versioned log of recent changes (change feed)
+ACCESS_PUBLIC_ID = f"{ROOT_FOLDER}/access"  # last access time per event (tiering)
 
-EMBEDDINGS_PUBLIC_ID = "face_recognition/embeddings"  # folder + filename in Cloudinary
+_configured = False
 
 
-def upload_embeddings(file_path: str):
-    """Upload local embeddings.json to Cloudinary"""
+def _get_uploader():
+    """Import and configure the Cloudinary SDK on first use."""
+    global _configured
+    import cloudinary
+    import cloudinary.uploader
+    if not _configured:
+        cloudinary.config(
+            cloud_name=config.CLOUD_NAME,
+            api_key=config.API_KEY,
+            api_secret=config.API_SECRET
+        )
+        _configured = True
+    return cloudinary.uploader
+
+
+def _check_breaker(public_id: str):
+    """Fail writes immediately while the storage circuit breaker is open."""
+    if not breaker.allow():
+        logger.error(f"Skipping Cloudinary write of {public_id}: circuit breaker is open")
+        raise StorageUnavailable("storage circuit breaker is open")
+
+
+def raw_url(public_id: str, extension: str = ".json") -> str:
+    """Cache-busted delivery URL of a raw resource"""
+    import time
+    cache_buster = int(time.time())
+    return f"https://res.cloudinary.com/{config.CLOUD_NAME}/raw/upload/{public_id}{extension}?cb={cache_buster}"
+
+
+def upload_raw(file_path: str, public_id: str):
+    """Upload a local file to Cloudinary as a raw resource"""
+    _check_breaker(public_id)
     try:
-        logger.info(f"Uploading embeddings file: {file_path}")
-        res = cloudinary.uploader.upload(
+        logger.info(f"Uploading file: {file_path} -> {public_id}")
+        res = _get_uploader().upload(
             file_path,
-            public_id=EMBEDDINGS_PUBLIC_ID,
+            public_id=public_id,
             resource_type="raw",
             overwrite=True,
             invalidate=True  # Force cache invalidation
         )
-        logger.info(f"Successfully uploaded embeddings to Cloudinary: {res.get('public_id')}")
+        breaker.record_success()
+        logger.info(f"Successfully uploaded to Cloudinary: {res.get('public_id')}")
         return res
     except Exception as e:
-        logger.error(f"Failed to upload embeddings to Cloudinary: {e}")
+        breaker.record_failure()
+        logger.error(f"Failed to upload {public_id} to Cloudinary: {e}")
         raise
 
 
+def delete_raw(public_id: str):
+    """Delete a raw resource from Cloudinary"""
+    _check_breaker(public_id)
+    try:
+        logger.info(f"Deleting raw resource: {public_id}")
+        res = _get_uploader().destroy(public_id, resource_type="raw", invalidate=True)
+        breaker.record_success()
+        return res
+    except Exception as e:
+        breaker.record_failure()
+        logger.error(f"Failed to delete {public_id} from Cloudinary: {e}")
+        raise
+
+
+def upload_embeddings(file_path: str):
+    """Upload local embeddings.json to Cloudinary"""
+    return upload_raw(file_path, EMBEDDINGS_PUBLIC_ID)
+
+
+def upload_metadata(file_path: str):
+    """Upload local metadata.json (event summary index) to Cloudinary"""
+    return upload_raw(file_path, METADATA_PUBLIC_ID)
+
+
+def upload_changes(file_path: str):
+    """Upload local changes.json (change feed log) to Cloudinary"""
+    return upload_raw(file_path, CHANGES_PUBLIC_ID)
+
+
+def upload_access(file_path: str):
+    """Upload local access.json (event access times) to Cloudinary"""
+    return upload_raw(file_path, ACCESS_PUBLIC_ID)
+
+
 def download_embeddings(local_path: str):
     """Download embeddings.json from Cloudinary if exists"""
     import time
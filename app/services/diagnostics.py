@@ -0,0 +1,318 @@
+"""
+On-demand CPU profiling and memory accounting for the admin debug endpoints.
+
+The profiler is a sampling profiler: a background thread snapshots the Python stacks of
+every thread (sys._current_frames) at a fixed interval, so the request path pays nothing
+while no capture is running. Captures end after a number of seconds or after the next N
+requests (counted by the HTTP middleware), and can be exported as a speedscope JSON
+document or as a marshalled pstats table (``pstats.Stats(path)``, snakeviz, ...).
+"""
+import asyncio
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FORMATS = ("speedscope", "pstats")
+
+# Leaf frames of threads parked in the event loop, a lock or a queue
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+_active = None
+_active_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """Collects Python stacks of all threads every interval seconds."""
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()  # (thread name, frame, ..., leaf) -> sample count
+        self.started = None
+        self.duration = 0.0
+        self.requests = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                if not self.include_idle and (os.path.basename(stack[0][0]), stack[0][2]) in _IDLE_LEAVES:
+                    continue
+                stack.reverse()
+                self.stacks[(f"thread {names.get(thread_id, thread_id)}", *stack)] += 1
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.stacks.values())
+
+    def to_speedscope(self, name: str = "face-recognition") -> dict:
+        """Speedscope "sampled" profile, one profile per thread (weights in seconds)."""
+        frames, frame_ids = [], {}
+
+        def frame_id(frame):
+            if frame not in frame_ids:
+                filename, line, func = frame
+                frame_ids[frame] = len(frames)
+                frames.append({"name": func, "file": filename, "line": line})
+            return frame_ids[frame]
+
+        per_thread = {}
+        for (thread, *stack), count in self.stacks.items():
+            samples, weights = per_thread.setdefault(thread, ([], []))
+            samples.append([frame_id(frame) for frame in stack])
+            weights.append(count * self.interval)
+
+        profiles = [{
+            "type": "sampled",
+            "name": thread,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        } for thread, (samples, weights) in sorted(per_thread.items())]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "face-recognition sampling profiler",
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+    def to_pstats(self) -> bytes:
+        """
+        Marshalled pstats table. Call counts are sample counts and times are sampled
+        wall-clock estimates, so ratios are meaningful while absolute counts are not.
+        """
+        stats = {}
+
+        def entry(frame):
+            return stats.setdefault(frame, [0, 0, 0.0, 0.0, {}])
+
+        for (_, *stack), count in self.stacks.items():
+            seconds = count * self.interval
+            seen = set()
+            for i, frame in enumerate(stack):
+                func = entry(frame)
+                if frame not in seen:
+                    # Recursive frames count once towards cumulative time
+                    seen.add(frame)
+                    func[0] += count
+                    func[3] += seconds
+                func[1] += count
+                if i > 0:
+                    caller = func[4].setdefault(stack[i - 1], [0, 0, 0.0, 0.0])
+                    caller[0] += count
+                    caller[1] += count
+                    caller[3] += seconds
+            leaf = entry(stack[-1])
+            leaf[2] += seconds
+            if len(stack) > 1:
+                leaf[4][stack[-2]][2] += seconds
+
+        table = {
+            frame: (cc, nc, tt, ct, {caller: tuple(v) for caller, v in callers.items()})
+            for frame, (cc, nc, tt, ct, callers) in stats.items()
+        }
+        return marshal.dumps(table)
+
+
+def request_finished():
+    """Called by the HTTP middleware after every non-debug request."""
+    profiler = _active
+    if profiler is not None:
+        profiler.requests += 1
+
+
+async def capture_profile(seconds: float = None, requests: int = None, timeout: float = 60, interval: float = 0.005, include_idle: bool = False):
+    """
+    Sample for the given number of seconds, or until the given number of requests completed
+    (bounded by timeout). Only one capture runs at a time; raises RuntimeError otherwise.
+    """
+    global _active
+    profiler = SamplingProfiler(interval=interval, include_idle=include_idle)
+    with _active_lock:
+        if _active is not None:
+            raise RuntimeError("A profile capture is already running")
+        _active = profiler
+
+    logger.info(f"Profile capture started (seconds: {seconds}, requests: {requests}, interval: {interval}s)")
+    profiler.start()
+    try:
+        deadline = time.monotonic() + (seconds if seconds else timeout)
+        while time.monotonic() < deadline:
+            if requests and profiler.requests >= requests:
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        profiler.stop()
+        with _active_lock:
+            _active = None
+    logger.info(f"Profile capture finished: {profiler.sample_count} samples over {profiler.duration:.1f}s, {profiler.requests} requests")
+    return profiler
+
+
+def process_memory():
+    """Resident and peak memory of this process in MB (Linux /proc, 0 elsewhere)."""
+    values = {"VmRSS": 0.0, "VmHWM": 0.0}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key = line.split(":")[0]
+                if key in values:
+                    values[key] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return {"rss_mb": round(values["VmRSS"], 1), "peak_rss_mb": round(values["VmHWM"], 1)}
+
+
+def _file_mb(path):
+    try:
+        return round(os.path.getsize(path) / 1024 / 1024, 1)
+    except (OSError, TypeError):
+        return None
+
+
+def model_memory():
+    """
+    Loaded models with the size of their weight files. ONNX Runtime does not expose
+    per-session allocations, so the weight size is the usual lower bound of a session.
+    """
+    from app.services import face_service_insightface as face_service
+    from app.services import spoofing_detection
+
+    models = {}
+    face_app = face_service._face_app
+    if face_app is None:
+        models["insightface"] = {"loaded": False}
+    else:
+        models["insightface"] = {
+            "loaded": True,
+            "pack": config.FACE_MODEL_PACK,
+            "modules": {
+                name: {"file": getattr(model, "model_file", None), "weights_mb": _file_mb(getattr(model, "model_file", None))}
+                for name, model in face_app.models.items()
+            }
+        }
+
+    if spoofing_detection._onnx_session is not None:
+        path = spoofing_detection.resolve_model_file(config.SPOOFING_ONNX_MODEL, config.MODEL_DIR, spoofing_detection.BUNDLED_MODEL_DIR)
+        models["spoofing"] = {"loaded": True, "engine": "onnx", "file": path, "weights_mb": _file_mb(path)}
+    elif spoofing_detection.model is not None:
+        path = spoofing_detection.resolve_model_file(spoofing_detection.YOLO_WEIGHTS, config.MODEL_DIR, spoofing_detection.BUNDLED_MODEL_DIR)
+        models["spoofing"] = {"loaded": True, "engine": "ultralytics", "file": path, "weights_mb": _file_mb(path)}
+    else:
+        models["spoofing"] = {"loaded": False, "engine": config.SPOOFING_ENGINE}
+    return models
+
+
+def index_memory():
+    """Per-event bytes of the embedding index mapped by this process (page cache shared across workers)."""
+    from app.services import embedding_index
+
+    events = embedding_index.resident_events()
+    return {
+        "resident_events": len(events),
+        "resident_mb": round(sum(events.values()) / 1024 / 1024, 2),
+        "budget_mb": config.INDEX_MEMORY_BUDGET_MB,
+        "global_mb": round(embedding_index.global_index_bytes() / 1024 / 1024, 2),
+        "events": dict(sorted(((name, round(size / 1024, 1)) for name, size in events.items()), key=lambda item: -item[1]))
+    }
+
+
+def cache_memory():
+    """Entry counts, hit rates and an estimate of the result cache's payload size."""
+    from app.services.result_cache import analysis_cache
+
+    with analysis_cache._lock:
+        values = [value for _, value in analysis_cache._entries.values()]
+    # A cached embedding is a list of Python floats: ~24 bytes per float object plus the list slot
+    floats = sum(len(v.get("embedding") or []) for v in values)
+    floats += sum(len(f.get("embedding") or []) for v in values for f in v.get("faces", []))
+    return {
+        "analysis_cache": {
+            "entries": len(values),
+            "max_size": analysis_cache.max_size,
+            "hits": analysis_cache.hits,
+            "misses": analysis_cache.misses,
+            "approx_mb": round(floats * 32 / 1024 / 1024, 2)
+        }
+    }
+
+
+def start_tracemalloc(frames: int = 1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        logger.info(f"tracemalloc started ({frames} frames)")
+
+
+def stop_tracemalloc():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        logger.info("tracemalloc stopped")
+
+
+def allocation_sites(top: int = 20):
+    """Top allocation sites since tracemalloc was started, or None when it is not tracing."""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "traced_mb": round(current / 1024 / 1024, 2),
+        "traced_peak_mb": round(peak / 1024 / 1024, 2),
+        "top": [
+            {"site": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:top]
+        ]
+    }
+
+
+def memory_report(top: int = 20):
+    return {
+        "process": process_memory(),
+        "models": model_memory(),
+        "index": index_memory(),
+        "caches": cache_memory(),
+        "allocations": allocation_sites(top)
+    }
@@ -0,0 +1,717 @@
+"""
+Shared-memory embedding index.
+
+Each published version lives in its own directory under INDEX_DIR and holds, per event,
+a float32 matrix of L2-normalised embeddings, their original norms and the row labels
+(usernames), saved as .npy files. Workers map these files read-only (np.load mmap_mode="r"),
+so with /dev/shm all uvicorn workers share one copy of the pages.
+
+A version counter in INDEX_DIR/CURRENT is swapped atomically (os.replace) after a new
+version is fully written; readers check it on every lookup and re-map when it changes.
+
+A global index over all events (for cross-event identification) is built into the current
+version's directory by a background thread the first time it is needed: every event's rows
+concatenated, grouped by event and then by user, so event filters are row ranges. Per-event files
+are untouched. It counts against INDEX_MEMORY_BUDGET_MB and is not built when it would not fit;
+until it exists, callers search event by event.
+
+Cold events (see event_tiering) are not part of the store document: the manifest only lists
+their names, and the first lookup loads the compressed cold copy into the index. Lazily loaded
+cold events are dropped again, least recently loaded first, when the index exceeds
+INDEX_MEMORY_BUDGET_MB; each process also unmaps its least recently used events beyond that budget.
+
+On replicas the manifest also records the change feed version the index reflects (see change_feed).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from app.core import config
+from app.services.storage_client import StorageUnavailable
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process locking unavailable, fall back to in-process lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = config.INDEX_DIR
+CURRENT_FILE = os.path.join(INDEX_DIR, "CURRENT")
+LOCK_FILE = os.path.join(INDEX_DIR, "lock")
+KEEP_VERSIONS = 2
+MEMORY_BUDGET = int(config.INDEX_MEMORY_BUDGET_MB * 1024 * 1024)
+
+_thread_lock = threading.RLock()
+# Publishers only; readers holding _thread_lock take it after, never before
+_publish_thread_lock = threading.Lock()
+_rebuild_thread = None
+_global_thread = None
+# Version whose global index was skipped because it would exceed the memory budget
+_global_skipped = None
+
+# Per-process view of the published index
+_state = {"version": None, "manifest": None, "events": OrderedDict(), "global": None, "rebuild_after": 0, "checked": (None, 0)}
+
+GLOBAL_META = "global.json"
+
+
+class EventIndex:
+    """Read-only view of one event's embeddings."""
+
+    def __init__(self, event_name: str, labels: np.ndarray, matrix: np.ndarray, norms: np.ndarray, user_count: int = None):
+        self.event_name = event_name
+        self.labels = labels
+        self.matrix = matrix
+        self.norms = norms
+        self._user_count = user_count
+
+    @property
+    def user_count(self) -> int:
+        """Taken from the manifest; counted once (rows are grouped by user) for versions without it."""
+        if self._user_count is None:
+            self._user_count = int(np.count_nonzero(self.labels[1:] != self.labels[:-1])) + 1 if len(self.labels) else 0
+        return self._user_count
+
+    @property
+    def nbytes(self) -> int:
+        return self.labels.nbytes + self.matrix.nbytes + self.norms.nbytes
+
+    def __len__(self):
+        return len(self.labels)
+
+    def best_match(self, embedding):
+        """Return (username, cosine similarity) of the closest stored embedding."""
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / np.linalg.norm(query)
+        sims = self.matrix @ query
+        best = int(np.argmax(sims))
+        return str(self.labels[best]), float(sims[best])
+
+    def user_scores(self, embeddings):
+        """
+        Score several query embeddings against every user in one matrix-matrix product.
+        Returns (usernames, scores) where scores[q, u] is the best cosine similarity of query q
+        over user u's stored embeddings (rows are grouped by user, see _build_event_arrays).
+        """
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        sims = queries @ self.matrix.T
+        starts = np.flatnonzero(np.r_[True, self.labels[1:] != self.labels[:-1]])
+        return self.labels[starts].astype(str), np.maximum.reduceat(sims, starts, axis=1)
+
+
+class GlobalIndex:
+    """Read-only view of every indexed event's embeddings; rows are grouped by event, then by user."""
+
+    def __init__(self, version: int, events: list, offsets: np.ndarray, labels: np.ndarray, matrix: np.ndarray, starts: np.ndarray, cold_events: list):
+        self.version = version
+        self.events = events
+        self.offsets = offsets  # rows of events[i] are offsets[i]:offsets[i + 1]
+        self.labels = labels
+        self.matrix = matrix
+        self.starts = starts  # first row of every (event, user) group
+        self.cold_events = cold_events
+        self._positions = {name: i for i, name in enumerate(events)}
+
+    @property
+    def nbytes(self) -> int:
+        return self.labels.nbytes + self.matrix.nbytes + self.starts.nbytes
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, event_name):
+        return event_name in self._positions
+
+    def search(self, embedding, top_k: int = 5, events=None):
+        """
+        Return the top_k (event, username, cosine similarity) hits, one per (event, user),
+        over every event or only the given ones.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / np.linalg.norm(query)
+        if events is None:
+            ranges = [(0, len(self.labels))]
+        else:
+            positions = sorted(self._positions[name] for name in set(events) if name in self._positions)
+            ranges = [(int(self.offsets[i]), int(self.offsets[i + 1])) for i in positions]
+
+        group_starts, group_scores = [], []
+        for begin, end in ranges:
+            if begin == end:
+                continue
+            starts = self.starts[np.searchsorted(self.starts, begin):np.searchsorted(self.starts, end)]
+            group_scores.append(np.maximum.reduceat(self.matrix[begin:end] @ query, starts - begin))
+            group_starts.append(starts)
+        if not group_scores:
+            return []
+
+        scores = np.concatenate(group_scores)
+        starts = np.concatenate(group_starts)
+        top = np.argpartition(-scores, top_k - 1)[:top_k] if len(scores) > top_k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        event_ids = np.searchsorted(self.offsets, starts[top], side="right") - 1
+        return [
+            (self.events[event_id], str(self.labels[start]), float(score))
+            for event_id, start, score in zip(event_ids, starts[top], scores[top])
+        ]
+
+
+def _event_key(event_name: str) -> str:
+    return hashlib.sha1(event_name.encode("utf-8")).hexdigest()
+
+
+def _version_dir(version: int) -> str:
+    return os.path.join(INDEX_DIR, f"v{version}")
+
+
+@contextmanager
+def _publish_lock():
+    """Serialise publishers across threads and worker processes."""
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    with _publish_thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(LOCK_FILE, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def current_version():
+    """Return the published index version, or None if nothing is published."""
+    try:
+        with open(CURRENT_FILE) as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _read_manifest(version: int):
+    with open(os.path.join(_version_dir(version), "manifest.json")) as f:
+        return json.load(f)
+
+
+def _build_event_arrays(users: dict):
+    """Convert {username: [embedding, ...]} into label, normalised matrix and norm arrays."""
+    labels, rows = [], []
+    dim = None
+    for username, embeddings in users.items():
+        for emb in embeddings:
+            if dim is None:
+                dim = len(emb)
+            if len(emb) != dim:
+                logger.warning(f"Skipping embedding of user '{username}' with dimension {len(emb)} (expected {dim})")
+                continue
+            labels.append(username)
+            rows.append(emb)
+
+    if not rows:
+        return None
+
+    matrix = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1)
+    matrix /= np.where(norms > 0, norms, 1)[:, np.newaxis]
+    return np.asarray(labels), matrix, norms.astype(np.float32)
+
+
+def publish(data: dict, changed_events=None, cold_events=None, store_version=None):
+    """
+    Publish a new index version for the full store data.
+    Events not in changed_events are hard-linked from the previous version instead of rebuilt.
+    cold_events lists events kept in cold storage, loaded lazily on first lookup.
+    store_version is the metadata summary version of data (see _check_store).
+    """
+    with _publish_lock():
+        return _publish_locked(data, changed_events, cold_events, store_version=store_version)
+
+
+def publish_events(updates: dict, cold: bool = False, demoted=(), feed_version=None):
+    """
+    Publish a new version changing only the given events ({event: users}, None removes it)
+    and keeping every other event of the current version.
+    demoted events are removed and listed as cold; feed_version records the change feed
+    version the index reflects (replicas, see change_feed).
+    """
+    with _publish_lock():
+        return _publish_locked(
+            dict(updates, **{name: None for name in demoted}), list(updates),
+            partial=True, cold=cold, demoted=demoted, feed_version=feed_version
+        )
+
+
+def _link_event(key: str, old_version: int, tmp_dir: str):
+    for suffix in ("labels", "matrix", "norms"):
+        src = os.path.join(_version_dir(old_version), f"{key}.{suffix}.npy")
+        dst = os.path.join(tmp_dir, f"{key}.{suffix}.npy")
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+
+def _enforce_budget(events: dict, keep: set):
+    """Drop lazily loaded cold events, least recently loaded first, until the index fits the budget."""
+    if not MEMORY_BUDGET:
+        return []
+    total = sum(entry.get("nbytes", 0) for entry in events.values())
+    evicted = []
+    for event_name, entry in sorted(events.items(), key=lambda item: item[1].get("loaded", 0)):
+        if total <= MEMORY_BUDGET:
+            break
+        if entry.get("cold") and event_name not in keep:
+            total -= entry.get("nbytes", 0)
+            evicted.append(event_name)
+    for event_name in evicted:
+        del events[event_name]
+    return evicted
+
+
+def _publish_locked(data: dict, changed_events=None, cold_events=None, partial=False, cold=False, demoted=(), feed_version=None, store_version=None):
+    """
+    Write and swap in a new version; the caller holds the publish lock.
+    With partial=True, data only holds the events to change and all others are kept
+    (including the feed and store versions unless new ones are given).
+    """
+    start = time.time()
+    old_version = current_version()
+    old_manifest = None
+    if old_version is not None and (changed_events is not None or partial):
+        try:
+            old_manifest = _read_manifest(old_version)
+        except (FileNotFoundError, json.JSONDecodeError):
+            old_manifest = None
+    if partial and old_manifest is None:
+        raise RuntimeError("Partial publish needs a published index version")
+
+    version = _next_version(old_version)
+    tmp_dir = _version_dir(version) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    if partial:
+        created = old_manifest["created"]
+        cold_events = old_manifest.get("cold_events", []) if cold_events is None else cold_events
+        if not cold:
+            # Hot updates and removals take events off the cold list
+            cold_events = [name for name in cold_events if name not in data]
+        cold_events = sorted(set(cold_events) | set(demoted))
+        if feed_version is None:
+            feed_version = old_manifest.get("feed_version")
+        if store_version is None:
+            store_version = old_manifest.get("store_version")
+        reusable = [name for name in old_manifest["events"] if name not in data]
+    else:
+        created = time.time()
+        reusable = [
+            name for name in data
+            if old_manifest is not None and name not in changed_events and name in old_manifest["events"]
+        ]
+
+    events = {}
+    for event_name in reusable:
+        events[event_name] = old_manifest["events"][event_name]
+
+    rebuilt = {}
+    for event_name, users in data.items():
+        if event_name in events or users is None:
+            continue
+        arrays = _build_event_arrays(users)
+        if arrays is None:
+            continue
+        rebuilt[event_name] = arrays
+        events[event_name] = {
+            "key": _event_key(event_name),
+            "rows": len(arrays[0]),
+            "user_count": int(np.count_nonzero(arrays[0][1:] != arrays[0][:-1])) + 1,
+            "dim": arrays[1].shape[1],
+            "nbytes": sum(a.nbytes for a in arrays),
+            "cold": cold,
+            "loaded": time.time()
+        }
+
+    evicted = _enforce_budget(events, keep=set(rebuilt))
+
+    for event_name, entry in events.items():
+        if event_name in rebuilt:
+            labels, matrix, norms = rebuilt[event_name]
+            base = os.path.join(tmp_dir, entry["key"])
+            np.save(f"{base}.labels.npy", labels)
+            np.save(f"{base}.matrix.npy", matrix)
+            np.save(f"{base}.norms.npy", norms)
+        else:
+            _link_event(entry["key"], old_version, tmp_dir)
+
+    manifest = {
+        "version": version, "created": created, "events": events,
+        "cold_events": sorted(cold_events or []), "feed_version": feed_version, "store_version": store_version
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_dir, _version_dir(version))
+
+    # Atomic version swap
+    tmp_current = CURRENT_FILE + ".tmp"
+    with open(tmp_current, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_current, CURRENT_FILE)
+
+    _remove_old_versions(version)
+
+    if evicted:
+        logger.info(f"Evicted cold events from index to stay within memory budget: {evicted}")
+    logger.info(f"Published embedding index v{version} ({len(events)} events, {len(rebuilt)} rebuilt) in {time.time() - start:.3f}s")
+    return version
+
+
+def _published_versions():
+    """Yield (version, directory name) for every version directory on disk."""
+    for name in os.listdir(INDEX_DIR):
+        if not name.startswith("v"):
+            continue
+        try:
+            yield int(name[1:].split(".")[0]), name
+        except ValueError:
+            continue
+
+
+def _next_version(current) -> int:
+    """Versions only ever increase, even after invalidate() dropped CURRENT."""
+    return max([current or 0] + [v for v, _ in _published_versions()]) + 1
+
+
+def _remove_old_versions(version: int):
+    """Delete versions no reader will map again (open mappings stay valid on POSIX)."""
+    for v, name in list(_published_versions()):
+        if v <= version - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(INDEX_DIR, name), ignore_errors=True)
+
+
+def invalidate():
+    """Drop the published version so the next lookup rebuilds the index from the store."""
+    with _publish_lock():
+        if os.path.exists(CURRENT_FILE):
+            os.unlink(CURRENT_FILE)
+    logger.info("Embedding index invalidated")
+
+
+def rebuild(feed_version=None):
+    """Rebuild the whole index from the embedding store (feed_version: see publish_events)."""
+    with _publish_lock():
+        return _rebuild_locked(feed_version)
+
+
+def _rebuild_locked(feed_version=None):
+    from app.services.embedding_store import _load_embeddings_from_cloudinary, _load_metadata, cold_event_names
+    logger.info("Rebuilding embedding index from store")
+    # Summary first: a write landing in between leaves an older store_version, so the next check rebuilds again
+    metadata = _load_metadata()
+    return _publish_locked(
+        _load_embeddings_from_cloudinary(), cold_events=cold_event_names(metadata), feed_version=feed_version,
+        store_version=_summary_version(metadata)
+    )
+
+
+def _summary_version(metadata):
+    """Version of a metadata summary (bumped by every store write, on any host); None if unknown."""
+    if not metadata or metadata.get("stale"):
+        return None
+    return metadata.get("version")
+
+
+def feed_version():
+    """Change feed version of the published index, or None."""
+    version = current_version()
+    if version is None:
+        return None
+    try:
+        return _read_manifest(version).get("feed_version")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _is_stale(version) -> bool:
+    """True when version is missing, or was neither published nor checked in the last INDEX_MAX_AGE seconds."""
+    if version is None:
+        return True
+    # Replicas are kept current by the change feed instead of store checks
+    if not config.INDEX_MAX_AGE or config.REPLICA_OF:
+        return False
+    created = _state["manifest"]["created"] if version == _state["version"] else _read_manifest(version)["created"]
+    checked_version, checked = _state["checked"]
+    if checked_version == version:
+        created = max(created, checked)
+    return time.time() - created > config.INDEX_MAX_AGE
+
+
+def _check_store_locked():
+    """
+    Rebuild the current version if the store changed since it was published (another host
+    wrote to it). Costs one metadata summary read when nothing changed. The caller holds the
+    publish lock.
+    """
+    from app.services.embedding_store import _load_metadata
+
+    version = current_version()
+    # Another worker may have rebuilt it while we waited for the lock
+    if not _is_stale(version):
+        return
+    store_version = _summary_version(_load_metadata())
+    if store_version is not None and store_version == _read_manifest(version).get("store_version"):
+        _state["checked"] = (version, time.time())
+        return
+    logger.info(f"Store changed since embedding index v{version} (summary v{store_version}), rebuilding")
+    _rebuild_locked()
+
+
+def _rebuild_in_background():
+    """Check an index older than INDEX_MAX_AGE against the store off the request path; readers keep the current version."""
+    global _rebuild_thread
+    if _rebuild_thread is not None and _rebuild_thread.is_alive():
+        return
+
+    def run():
+        try:
+            with _publish_lock():
+                _check_store_locked()
+        except Exception as e:
+            # Keep serving the last published index until the store is reachable again
+            logger.warning(f"Background index rebuild failed ({e}), serving embedding index v{_state['version']}")
+            _state["rebuild_after"] = time.time() + config.STORAGE_BREAKER_RESET
+
+    _rebuild_thread = threading.Thread(target=run, name="index-rebuild", daemon=True)
+    _rebuild_thread.start()
+
+
+def _refresh():
+    """
+    Re-map the published version if it changed, building it when missing. Aged versions are
+    checked against the store in the background, except on a process's first lookup: an index
+    left in INDEX_DIR by an earlier run is checked before it serves anything.
+    """
+    version = current_version()
+    if version is None:
+        with _publish_lock():
+            # Another worker may have built it while we waited for the lock
+            version = current_version()
+            if version is None:
+                version = _rebuild_locked()
+    elif _state["version"] is None and _is_stale(version):
+        try:
+            with _publish_lock():
+                _check_store_locked()
+        except StorageUnavailable as e:
+            logger.warning(f"Could not check embedding index v{version} against the store ({e}), serving it")
+            _state["rebuild_after"] = time.time() + config.STORAGE_BREAKER_RESET
+        version = current_version()
+    elif time.time() >= _state["rebuild_after"] and _is_stale(version):
+        _rebuild_in_background()
+
+    if version != _state["version"]:
+        _state["manifest"] = _read_manifest(version)
+        _state["events"] = OrderedDict()
+        _state["global"] = None
+        _state["version"] = version
+        logger.info(f"Mapped embedding index v{version}")
+
+
+def _load_cold_event(event_name: str):
+    """Load a cold event from its compressed copy into the shared index."""
+    from app.services.embedding_store import _load_cold_event
+    start = time.time()
+    users = _load_cold_event(event_name)
+    if users is None:
+        logger.warning(f"Cold copy of event '{event_name}' is missing")
+        return
+    publish_events({event_name: users}, cold=True)
+    logger.info(f"Loaded cold event '{event_name}' into index in {time.time() - start:.3f}s")
+
+
+def _map_event(event_name: str, entry: dict):
+    base = os.path.join(_version_dir(_state["version"]), entry["key"])
+    index = EventIndex(
+        event_name,
+        np.load(f"{base}.labels.npy", mmap_mode="r"),
+        np.load(f"{base}.matrix.npy", mmap_mode="r"),
+        np.load(f"{base}.norms.npy", mmap_mode="r"),
+        user_count=entry.get("user_count")
+    )
+
+    # Per-process LRU: unmap least recently used events beyond the memory budget (global index included)
+    resident = _state["events"]
+    resident[event_name] = index
+    if MEMORY_BUDGET:
+        total = sum(i.nbytes for i in resident.values()) + (_state["global"].nbytes if _state["global"] is not None else 0)
+        while total > MEMORY_BUDGET and len(resident) > 1:
+            evicted_name, evicted = resident.popitem(last=False)
+            total -= evicted.nbytes
+            logger.info(f"Unmapped event '{evicted_name}' index ({evicted.nbytes} bytes) to stay within memory budget")
+    return index
+
+
+def get_event_index(event_name: str):
+    """Return the EventIndex for an event, or None if it has no stored embeddings."""
+    with _thread_lock:
+        _refresh()
+        index = _state["events"].get(event_name)
+        if index is not None:
+            _state["events"].move_to_end(event_name)
+            return index
+
+        entry = _state["manifest"]["events"].get(event_name)
+        if entry is None and event_name in _state["manifest"].get("cold_events", []):
+            _load_cold_event(event_name)
+            _refresh()
+            entry = _state["manifest"]["events"].get(event_name)
+        if entry is None:
+            return None
+
+        return _map_event(event_name, entry)
+
+
+def _build_global_locked(version: int, manifest: dict):
+    """Concatenate every event of a version into the global index files; the caller holds the publish lock."""
+    start = time.time()
+    directory = _version_dir(version)
+    events, parts = [], []
+    for event_name in sorted(manifest["events"]):
+        entry = manifest["events"][event_name]
+        if entry["dim"] != config.EMBEDDING_DIM:
+            logger.warning(f"Event '{event_name}' has embedding dimension {entry['dim']}, left out of the global index")
+            continue
+        base = os.path.join(directory, entry["key"])
+        events.append(event_name)
+        parts.append((np.load(f"{base}.labels.npy", mmap_mode="r"), np.load(f"{base}.matrix.npy", mmap_mode="r")))
+
+    if parts:
+        _write_global_arrays(directory, parts)
+
+    # Written last: its presence marks the global index of this version as complete
+    tmp_meta = os.path.join(directory, GLOBAL_META + ".tmp")
+    with open(tmp_meta, "w") as f:
+        json.dump({"events": events}, f)
+    os.replace(tmp_meta, os.path.join(directory, GLOBAL_META))
+    logger.info(f"Built global index for v{version} ({len(events)} events) in {time.time() - start:.3f}s")
+
+
+def _write_global_arrays(directory: str, parts: list):
+    """Write the concatenated matrix, labels, user group starts and event offsets."""
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(labels) for labels, _ in parts])
+    # Written straight to the mapped file, so building never holds a second copy in memory
+    tmp_matrix = os.path.join(directory, "global.matrix.tmp.npy")
+    matrix = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32, shape=(int(offsets[-1]), config.EMBEDDING_DIM))
+    starts = []
+    for (labels, event_matrix), offset in zip(parts, offsets):
+        matrix[offset:offset + len(labels)] = event_matrix
+        starts.append(offset + np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]]))
+    matrix.flush()
+    del matrix
+    os.replace(tmp_matrix, os.path.join(directory, "global.matrix.npy"))
+
+    np.save(os.path.join(directory, "global.labels.npy"), np.concatenate([labels for labels, _ in parts]))
+    np.save(os.path.join(directory, "global.starts.npy"), np.concatenate(starts))
+    np.save(os.path.join(directory, "global.offsets.npy"), offsets)
+
+
+def _global_fits(manifest: dict) -> bool:
+    """Whether the event files plus a global copy of them stay within INDEX_MEMORY_BUDGET_MB."""
+    if not MEMORY_BUDGET:
+        return True
+    events_bytes = sum(entry.get("nbytes", 0) for entry in manifest["events"].values())
+    return 2 * events_bytes <= MEMORY_BUDGET
+
+
+def _build_global_in_background(version: int):
+    """Build the global index of version off the request path (one build at a time per process)."""
+    global _global_thread
+    if _global_skipped == version or (_global_thread is not None and _global_thread.is_alive()):
+        return
+
+    def run():
+        global _global_skipped
+        try:
+            with _publish_lock():
+                # Superseded, or another worker built it while we waited for the lock
+                if current_version() != version or os.path.exists(os.path.join(_version_dir(version), GLOBAL_META)):
+                    return
+                manifest = _read_manifest(version)
+                if not _global_fits(manifest):
+                    _global_skipped = version
+                    logger.warning(f"Global index of v{version} would exceed INDEX_MEMORY_BUDGET_MB, identification searches event by event")
+                    return
+                _build_global_locked(version, manifest)
+        except Exception as e:
+            logger.error(f"Failed to build global index of v{version}: {e}")
+
+    _global_thread = threading.Thread(target=run, name="global-index", daemon=True)
+    _global_thread.start()
+
+
+def indexed_events():
+    """Names of the events in the published index (cold events only while loaded)."""
+    with _thread_lock:
+        _refresh()
+        return list(_state["manifest"]["events"])
+
+
+def cold_events():
+    """Names of the cold events listed by the published index."""
+    with _thread_lock:
+        _refresh()
+        return list(_state["manifest"].get("cold_events", []))
+
+
+def get_global_index():
+    """
+    Return the GlobalIndex of the published version, or None while it is not available (not built
+    yet, over the memory budget, or no event indexed). A missing index is built in the background.
+    """
+    with _thread_lock:
+        _refresh()
+        if _state["global"] is not None:
+            return _state["global"]
+
+        version = _state["version"]
+        directory = _version_dir(version)
+        meta_path = os.path.join(directory, GLOBAL_META)
+        if not os.path.exists(meta_path):
+            _build_global_in_background(version)
+            return None
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if not meta["events"]:
+            return None
+        _state["global"] = GlobalIndex(
+            version,
+            meta["events"],
+            np.load(os.path.join(directory, "global.offsets.npy")),
+            np.load(os.path.join(directory, "global.labels.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "global.matrix.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "global.starts.npy")),
+            _state["manifest"].get("cold_events", [])
+        )
+        return _state["global"]
+
+
+def resident_events():
+    """Return {event: bytes} of the event indices mapped by this process."""
+    with _thread_lock:
+        return {name: index.nbytes for name, index in _state["events"].items()}
+
+
+def global_index_bytes() -> int:
+    """Bytes of the global index mapped by this process (0 if not built or not used)."""
+    with _thread_lock:
+        return _state["global"].nbytes if _state["global"] is not None else 0
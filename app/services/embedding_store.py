@@ -0,0 +1,495 @@
+import gzip
+import hashlib
+import json
+import logging
+import tempfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+from app.services import cloud_storage, storage_client
+from app.services.storage_client import StorageUnavailable
+from app.core import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process locking unavailable, fall back to in-process lock
+    fcntl = None
+
+# Check if using Cloudinary or local storage
+USE_CLOUDINARY = os.getenv("USE_CLOUDINARY", "true").lower() == "true"
+LOCAL_EMBEDDINGS_PATH = os.getenv("LOCAL_EMBEDDINGS_PATH", "data/embeddings.json")
+LOCAL_METADATA_PATH = os.getenv(
+    "LOCAL_METADATA_PATH",
+    os.path.join(os.path.dirname(LOCAL_EMBEDDINGS_PATH), "metadata.json")
+)
+LOCAL_COLD_DIR = os.getenv("LOCAL_COLD_DIR", os.path.join(os.path.dirname(LOCAL_EMBEDDINGS_PATH), "cold"))
+LOCAL_ACCESS_PATH = os.getenv("LOCAL_ACCESS_PATH", os.path.join(os.path.dirname(LOCAL_EMBEDDINGS_PATH), "access.json"))
+LOCAL_CHANGES_PATH = os.getenv("LOCAL_CHANGES_PATH", os.path.join(os.path.dirname(LOCAL_EMBEDDINGS_PATH), "changes.json"))
+
+logger = logging.getLogger(__name__)
+
+
+def _read_local_json(path: str, strict: bool = False):
+    """
+    Read a local JSON file, returning None if it is missing or unreadable.
+    With strict, an unreadable or corrupt file raises StorageUnavailable instead.
+    """
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                logger.info(f"Loading local file: {path}")
+                return json.load(f)
+        logger.info(f"Local file not found: {path}")
+        return None
+    except Exception as e:
+        logger.error(f"Error loading local file {path}: {e}")
+        if strict:
+            raise StorageUnavailable(f"local file {path} is unreadable: {e}")
+        return None
+
+
+# Last good copy of small documents (metadata), served while Cloudinary is unavailable
+_snapshots = {}
+# Metadata summary this process failed to save; listings rebuild it until a save succeeds
+_unsaved_metadata = None
+
+
+def _download_json(public_id: str, snapshot: bool = False):
+    """
+    Download a raw JSON resource from Cloudinary, returning None if it does not exist.
+    Raises StorageUnavailable when Cloudinary cannot be reached or the body is not valid JSON
+    (e.g. truncated), so it is never mistaken for a missing document; with snapshot, the last
+    good copy is returned instead while one exists.
+    """
+    try:
+        logger.info(f"Loading {public_id} from Cloudinary")
+        body = storage_client.get(cloud_storage.raw_url(public_id))
+        if body is None:
+            logger.warning(f"{public_id} not found on Cloudinary")
+            return None
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise StorageUnavailable(f"invalid JSON in {public_id}: {e}")
+    except StorageUnavailable as e:
+        if snapshot and public_id in _snapshots:
+            logger.warning(f"Cloudinary unavailable ({e}), serving last good snapshot of {public_id}")
+            return _snapshots[public_id]
+        logger.error(f"Failed to load {public_id} from Cloudinary: {e}")
+        raise
+
+    logger.info(f"Successfully loaded {public_id} from Cloudinary")
+    if snapshot:
+        _snapshots[public_id] = data
+    return data
+
+
+def _write_json(data, local_path: str, upload):
+    """Write JSON to the local file or upload it to Cloudinary based on USE_CLOUDINARY flag"""
+    if not USE_CLOUDINARY:
+        try:
+            os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+            with open(local_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            logger.info(f"Successfully saved local file: {local_path}")
+            return
+        except Exception as e:
+            logger.error(f"Failed to save local file {local_path}: {e}")
+            raise
+
+    try:
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(data, f)
+            temp_path = f.name
+        
+        upload(temp_path)
+    finally:
+        if 'temp_path' in locals() and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def _load_embeddings_from_cloudinary():
+    """
+    Load embeddings from Cloudinary or local file based on USE_CLOUDINARY flag.
+    Raises StorageUnavailable rather than returning an empty store, so an outage can't be
+    mistaken for "no users" (and written back). Readers keep serving the published index.
+    """
+    if not USE_CLOUDINARY:
+        return _read_local_json(LOCAL_EMBEDDINGS_PATH, strict=True) or {}
+    return _download_json(cloud_storage.EMBEDDINGS_PUBLIC_ID) or {}
+
+
+def _save_embeddings_to_cloudinary(data, changed_events=None, demoted_events=(), changes=None):
+    """
+    Save embeddings to Cloudinary or local file based on USE_CLOUDINARY flag,
+    then refresh the metadata summary, publish the shared embedding index and
+    append the change to the change feed log.
+    changed_events limits the refresh to those events (None = all).
+    demoted_events were moved to cold storage and stay listed in the metadata.
+    changes describes the write for replicas (see _record_changes); derived from
+    changed_events when not given.
+    """
+    try:
+        logger.info("Saving embeddings")
+        _write_json(data, LOCAL_EMBEDDINGS_PATH, cloud_storage.upload_embeddings)
+        logger.info("Successfully saved embeddings")
+    except Exception as e:
+        logger.error(f"Failed to save embeddings: {e}")
+        raise
+
+    global _unsaved_metadata
+    previous = _load_metadata()
+    metadata = _build_metadata(data, changed_events, previous, demoted_events)
+    try:
+        _save_metadata(metadata)
+        metadata_saved = True
+        _unsaved_metadata = None
+    except Exception as e:
+        # Listings rebuild the summary from the store until it is saved (see load_metadata)
+        logger.error(f"Failed to save metadata summary: {e}")
+        metadata_saved = False
+        _unsaved_metadata = metadata
+        try:
+            # Tell the other workers too; the next write or listing replaces it
+            _save_metadata(dict(metadata, stale=True))
+        except Exception as e:
+            logger.error(f"Failed to mark metadata summary as stale: {e}")
+
+    from app.services import embedding_index
+    try:
+        embedding_index.publish(
+            data, changed_events, cold_events=cold_event_names(metadata),
+            store_version=metadata["version"] if metadata_saved else None
+        )
+    except Exception as e:
+        # The store is the source of truth; force workers to rebuild from it
+        logger.error(f"Failed to publish embedding index: {e}")
+        embedding_index.invalidate()
+
+    if changes is None:
+        changes = _default_changes(changed_events, demoted_events)
+    _record_changes(changes)
+
+    # Cold copies of events that were promoted back to hot (or deleted) are obsolete now
+    if metadata_saved:
+        for event_name in cold_event_names(previous):
+            if metadata["events"].get(event_name, {}).get("tier") != "cold":
+                try:
+                    _delete_cold_event(event_name)
+                except Exception as e:
+                    logger.error(f"Failed to delete cold copy of event '{event_name}': {e}")
+
+
+def _build_metadata(data: dict, changed_events=None, previous=None, demoted_events=()):
+    """
+    Summarise the store as {event: {user_count, embedding_count, last_modified, last_access, tier, users}}.
+    Events outside changed_events keep their previous timestamps; cold events stay listed.
+    """
+    now = time.time()
+    previous = previous or {}
+    previous_events = previous.get("events", {})
+
+    events = {}
+    for event_name, users in data.items():
+        prev = previous_events.get(event_name) or {}
+        modified = not prev or changed_events is None or event_name in changed_events
+        last_modified = now if modified or "last_modified" not in prev else prev["last_modified"]
+        events[event_name] = {
+            "user_count": len(users),
+            "embedding_count": sum(len(embeddings) for embeddings in users.values()),
+            "last_modified": last_modified,
+            "last_access": max(prev.get("last_access", 0), last_modified),
+            "tier": "hot",
+            "users": sorted(users)
+        }
+
+    for event_name, prev in previous_events.items():
+        if event_name in events:
+            continue
+        if event_name in demoted_events:
+            events[event_name] = dict(prev, tier="cold")
+        elif prev.get("tier") == "cold" and (changed_events is None or event_name not in changed_events):
+            events[event_name] = prev
+
+    return {"version": previous.get("version", 0) + 1, "updated": now, "events": events}
+
+
+# Change feed log: {"version", "floor", "changes": [{"version", "op", "event_name", ...}]}.
+# Readers behind "floor" missed truncated entries and must rebuild from the store.
+_change_log_cache = {"log": None, "loaded": 0.0}
+# Set when a log write failed; the next entry tells replicas to rebuild
+_change_log_gap = False
+CHANGE_LOG_LOCK_FILE = os.path.join(config.INDEX_DIR, "changes.lock")
+_change_log_thread_lock = threading.Lock()
+STORE_LOCK_FILE = os.path.join(config.INDEX_DIR, "store.lock")
+_store_thread_lock = threading.Lock()
+# Log version seen when this thread read the store for a write (see begin_write)
+_write_base = threading.local()
+
+
+def _default_changes(changed_events, demoted_events=()):
+    """Changes of writes without per-user detail: replicas re-fetch (or rebuild) the events."""
+    if changed_events is None:
+        return [{"op": "reset"}]
+    return [
+        {"op": "demote_event" if event_name in demoted_events else "sync_event", "event_name": event_name}
+        for event_name in changed_events
+    ]
+
+
+def _load_change_log():
+    if not USE_CLOUDINARY:
+        return _read_local_json(LOCAL_CHANGES_PATH)
+    return _download_json(cloud_storage.CHANGES_PUBLIC_ID)
+
+
+def load_change_log(max_age: float = 1.0):
+    """The change log, re-read from the store when the cached copy is older than max_age seconds."""
+    if _change_log_cache["log"] is None or time.time() - _change_log_cache["loaded"] > max_age:
+        _change_log_cache["log"] = _load_change_log() or {"version": 0, "floor": 0, "changes": []}
+        _change_log_cache["loaded"] = time.time()
+    return _change_log_cache["log"]
+
+
+@contextmanager
+def _change_log_lock():
+    """Serialise log appends across threads and worker processes of this host."""
+    with _change_log_thread_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(config.INDEX_DIR, exist_ok=True)
+        with open(CHANGE_LOG_LOCK_FILE, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextmanager
+def store_write():
+    """
+    Hold for the whole read-modify-write of the store (load_for_update ... _save_embeddings_to_cloudinary).
+    Writers are serialised across threads and worker processes of this host, so concurrent
+    writes never overwrite each other; writes from other hosts are detected by the change log.
+    """
+    with _store_thread_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(config.INDEX_DIR, exist_ok=True)
+        with open(STORE_LOCK_FILE, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def begin_write():
+    """
+    Remember the change log version before reading the store for a write. If another write is
+    logged before this one (another host: writers of this host hold store_write), the two may
+    have overwritten each other in the store, so the entry becomes a reset (see _record_changes).
+    """
+    try:
+        log = _load_change_log()
+        _write_base.version = (log or {}).get("version", 0)
+    except Exception as e:
+        logger.warning(f"Could not read change log version before write: {e}")
+        _write_base.version = None
+
+
+def _record_changes(changes: list):
+    """
+    Append one version of changes to the log, keeping the last CHANGE_LOG_SIZE entries.
+    Appends are serialised per host; a write that raced another one is logged as a reset.
+    """
+    global _change_log_gap
+    base = getattr(_write_base, "version", None)
+    _write_base.version = None
+    try:
+        with _change_log_lock():
+            _append_changes(changes, base)
+        _change_log_gap = False
+    except Exception as e:
+        logger.error(f"Failed to record changes in the change feed log: {e}")
+        _change_log_gap = True
+
+
+def _append_changes(changes: list, base):
+    """Append under the change log lock; base is the log version the write started from."""
+    log = _load_change_log() or {"version": 0, "floor": 0, "changes": []}
+    version = log["version"] + 1
+    if _change_log_gap or (base is not None and base != log["version"]):
+        if not _change_log_gap:
+            logger.warning(f"Write based on change log v{base} raced v{log['version']}, logging a reset")
+        changes = [{"op": "reset"}]
+    entries = log["changes"] + [dict(change, version=version) for change in changes]
+    floor = log.get("floor", 0)
+    if len(entries) > config.CHANGE_LOG_SIZE:
+        dropped = entries[-config.CHANGE_LOG_SIZE - 1]["version"]
+        # Never keep part of a version: drop the rest of the one that was cut
+        entries = [entry for entry in entries[-config.CHANGE_LOG_SIZE:] if entry["version"] > dropped]
+        floor = dropped
+    log = {"version": version, "floor": floor, "changes": entries}
+    _write_json(log, LOCAL_CHANGES_PATH, cloud_storage.upload_changes)
+    _change_log_cache.update(log=log, loaded=time.time())
+    logger.info(f"Recorded change feed v{version} ({len(changes)} changes)")
+
+
+def cold_event_names(metadata) -> list:
+    """Names of events kept in cold storage according to the metadata summary"""
+    return sorted(
+        name for name, entry in (metadata or {}).get("events", {}).items()
+        if entry.get("tier") == "cold"
+    )
+
+
+def _cold_public_id(event_name: str, prefix: str = None) -> str:
+    return (prefix or cloud_storage.COLD_PREFIX) + hashlib.sha1(event_name.encode("utf-8")).hexdigest() + ".json.gz"
+
+
+def _local_cold_path(event_name: str) -> str:
+    return os.path.join(LOCAL_COLD_DIR, hashlib.sha1(event_name.encode("utf-8")).hexdigest() + ".json.gz")
+
+
+def _save_cold_event(event_name: str, users: dict):
+    """Write a gzip-compressed copy of one event to cold storage"""
+    payload = gzip.compress(json.dumps({"event_name": event_name, "users": users}).encode("utf-8"))
+    if not USE_CLOUDINARY:
+        os.makedirs(LOCAL_COLD_DIR, exist_ok=True)
+        with open(_local_cold_path(event_name), 'wb') as f:
+            f.write(payload)
+    else:
+        try:
+            with tempfile.NamedTemporaryFile(suffix='.gz', delete=False) as f:
+                f.write(payload)
+                temp_path = f.name
+            cloud_storage.upload_raw(temp_path, _cold_public_id(event_name))
+        finally:
+            if 'temp_path' in locals() and os.path.exists(temp_path):
+                os.unlink(temp_path)
+    logger.info(f"Saved cold copy of event '{event_name}' ({len(payload)} bytes compressed)")
+
+
+def _load_cold_event(event_name: str, prefix: str = None):
+    """Load one event's users from cold storage (another Cloudinary folder with prefix), or None if there is no cold copy"""
+    try:
+        if not USE_CLOUDINARY:
+            path = _local_cold_path(event_name)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'rb') as f:
+                payload = f.read()
+        else:
+            payload = storage_client.get(cloud_storage.raw_url(_cold_public_id(event_name, prefix), extension=""))
+            if payload is None:
+                logger.warning(f"Cold copy of event '{event_name}' not found")
+                return None
+        return json.loads(gzip.decompress(payload))["users"]
+    except (OSError, ValueError, KeyError, StorageUnavailable) as e:
+        logger.error(f"Error loading cold copy of event '{event_name}': {e}")
+        return None
+
+
+def _delete_cold_event(event_name: str):
+    if not USE_CLOUDINARY:
+        path = _local_cold_path(event_name)
+        if os.path.exists(path):
+            os.unlink(path)
+    else:
+        cloud_storage.delete_raw(_cold_public_id(event_name))
+    logger.info(f"Deleted cold copy of event '{event_name}'")
+
+
+def load_for_update(event_name: str):
+    """
+    Load the store for a write to event_name, promoting the event from cold storage first
+    so the write sees its existing users. Saving the result makes the event hot again.
+    Call inside store_write() and save before leaving it.
+    """
+    begin_write()
+    storage_data = _load_embeddings_from_cloudinary()
+    if event_name in storage_data:
+        return storage_data
+
+    if event_name in cold_event_names(_load_metadata()):
+        users = _load_cold_event(event_name)
+        if users is None:
+            raise RuntimeError(f"Cold copy of event '{event_name}' could not be loaded")
+        logger.info(f"Promoting event '{event_name}' from cold storage")
+        storage_data[event_name] = users
+    return storage_data
+
+
+def _load_metadata(snapshot: bool = False):
+    """
+    Load the metadata summary, or None if it has not been written yet.
+    snapshot serves the last good copy during an outage; only for read-only callers, since
+    writing a stale snapshot back would undo newer changes.
+    """
+    if not USE_CLOUDINARY:
+        return _read_local_json(LOCAL_METADATA_PATH)
+    return _download_json(cloud_storage.METADATA_PUBLIC_ID, snapshot=snapshot)
+
+
+def _save_metadata(metadata: dict):
+    _write_json(metadata, LOCAL_METADATA_PATH, cloud_storage.upload_metadata)
+    logger.info(f"Saved metadata summary v{metadata['version']} ({len(metadata['events'])} events)")
+
+
+def load_access_times() -> dict:
+    """
+    Last access time per event ({event: timestamp}). Kept apart from the metadata summary so
+    flushing access times never rewrites (and races) the summary that store writes maintain.
+    """
+    if not USE_CLOUDINARY:
+        return _read_local_json(LOCAL_ACCESS_PATH) or {}
+    return _download_json(cloud_storage.ACCESS_PUBLIC_ID) or {}
+
+
+def save_access_times(access: dict):
+    _write_json(access, LOCAL_ACCESS_PATH, cloud_storage.upload_access)
+
+
+def load_metadata():
+    """
+    Load the lightweight event summary used by listing endpoints.
+    Rebuilt from the full store when it does not exist yet or a write failed to save it
+    (timestamps and cold events are kept from the last summary). Serves the last good
+    snapshot while Cloudinary is unavailable.
+    """
+    global _unsaved_metadata
+    metadata = _load_metadata(snapshot=True)
+    if metadata is None or metadata.get("stale") or _unsaved_metadata is not None:
+        logger.info("Metadata summary missing or stale, rebuilding it from the embedding store")
+        candidates = [m for m in (metadata, _unsaved_metadata) if m is not None]
+        previous = max(candidates, key=lambda m: m.get("version", 0)) if candidates else None
+        metadata = _build_metadata(_load_embeddings_from_cloudinary(), [] if previous else None, previous)
+        _save_metadata(metadata)
+        _unsaved_metadata = None
+    return metadata
+
+
+def iter_raw_embeddings(chunk_size=64 * 1024):
+    """Yield the raw embeddings JSON document in chunks without parsing or buffering it"""
+    if not USE_CLOUDINARY:
+        if not os.path.exists(LOCAL_EMBEDDINGS_PATH):
+            yield b"{}"
+            return
+        with open(LOCAL_EMBEDDINGS_PATH, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+        return
+
+    chunks = storage_client.iter_bytes(cloud_storage.raw_url(cloud_storage.EMBEDDINGS_PUBLIC_ID), chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        logger.warning("Embeddings not available for streaming")
+        yield b"{}"
+        return
+    yield first
+    yield from chunks
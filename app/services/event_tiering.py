@@ -0,0 +1,177 @@
+"""
+Hot/cold event tiering.
+
+Verifications record per-event access times in memory; a maintenance thread periodically
+flushes them into a separate access document (never the metadata summary, which store writes
+rewrite) and moves events inactive for COLD_AFTER seconds
+out of the main store document into gzip-compressed per-event cold copies. Cold events stay
+listed in the metadata, are loaded into the embedding index lazily on first verify, and are
+promoted back into the main document by the next write to them.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from app.core import config
+from app.services import embedding_store
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = os.path.join(config.INDEX_DIR, "tiering.lock")
+ACCESS_LOCK_FILE = os.path.join(config.INDEX_DIR, "access.lock")
+
+_pending_access = {}
+_access_lock = threading.Lock()
+_maintenance_thread = None
+_stop = threading.Event()
+
+
+def record_access(event_name: str):
+    """Remember that an event was used; flushed to the metadata summary periodically."""
+    with _access_lock:
+        _pending_access[event_name] = time.time()
+
+
+@contextmanager
+def _access_file_lock():
+    """Serialise access document updates across the worker processes of this host."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(config.INDEX_DIR, exist_ok=True)
+    with open(ACCESS_LOCK_FILE, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def flush_access():
+    """Merge pending access times into the access document (newest time wins)."""
+    with _access_lock:
+        pending = dict(_pending_access)
+        _pending_access.clear()
+    if not pending:
+        return 0
+
+    try:
+        with _access_file_lock():
+            access = embedding_store.load_access_times()
+            updated = 0
+            for event_name, accessed in pending.items():
+                if accessed > access.get(event_name, 0):
+                    access[event_name] = accessed
+                    updated += 1
+            if updated:
+                # Drop deleted events; the summary is only read here
+                metadata = embedding_store._load_metadata()
+                if metadata is not None:
+                    access = {name: t for name, t in access.items() if name in metadata["events"]}
+                embedding_store.save_access_times(access)
+    except Exception:
+        # Keep the times for the next flush
+        with _access_lock:
+            for event_name, accessed in pending.items():
+                _pending_access[event_name] = max(accessed, _pending_access.get(event_name, 0))
+        raise
+    logger.info(f"Flushed access times for {updated} events")
+    return updated
+
+
+def demote_inactive_events(now=None):
+    """Move hot events not accessed for COLD_AFTER seconds to cold storage."""
+    if not config.COLD_AFTER:
+        return []
+    now = now or time.time()
+    metadata = embedding_store._load_metadata()
+    if metadata is None:
+        return []
+    access = embedding_store.load_access_times()
+
+    due = [
+        name for name, entry in metadata["events"].items()
+        if entry.get("tier", "hot") == "hot"
+        and now - max(access.get(name, 0), entry.get("last_access", 0), entry.get("last_modified", 0)) > config.COLD_AFTER
+    ]
+    # Skip events accessed since the last flush
+    with _access_lock:
+        due = [name for name in due if now - _pending_access.get(name, 0) > config.COLD_AFTER]
+    if not due:
+        return []
+
+    with embedding_store.store_write():
+        embedding_store.begin_write()
+        storage_data = embedding_store._load_embeddings_from_cloudinary()
+        due = [name for name in due if name in storage_data]
+        if not due:
+            return []
+
+        # Write every cold copy before removing anything from the main document
+        for event_name in due:
+            embedding_store._save_cold_event(event_name, storage_data[event_name])
+        for event_name in due:
+            del storage_data[event_name]
+        embedding_store._save_embeddings_to_cloudinary(storage_data, changed_events=due, demoted_events=due)
+
+    logger.info(f"Moved {len(due)} inactive events to cold storage: {due}")
+    return due
+
+
+def _try_lock():
+    """Non-blocking cross-process lock so only one worker per host runs maintenance at a time."""
+    if fcntl is None:
+        return True, None
+    os.makedirs(config.INDEX_DIR, exist_ok=True)
+    lock = open(LOCK_FILE, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True, lock
+    except OSError:
+        lock.close()
+        return False, None
+
+
+def run_maintenance():
+    """Flush access times and demote inactive events."""
+    flush_access()
+    acquired, lock = _try_lock()
+    if not acquired:
+        return []
+    try:
+        return demote_inactive_events()
+    finally:
+        if lock is not None:
+            lock.close()
+
+
+def _maintenance_loop():
+    while not _stop.wait(config.TIERING_INTERVAL):
+        try:
+            run_maintenance()
+        except Exception as e:
+            logger.error(f"Event tiering maintenance failed: {e}")
+
+
+def start():
+    """Start the background maintenance thread (no-op when TIERING_INTERVAL is 0)."""
+    global _maintenance_thread
+    if config.TIERING_INTERVAL and _maintenance_thread is None:
+        _stop.clear()
+        _maintenance_thread = threading.Thread(target=_maintenance_loop, name="event-tiering", daemon=True)
+        _maintenance_thread.start()
+        logger.info(f"Event tiering started (interval: {config.TIERING_INTERVAL}s, cold after: {config.COLD_AFTER}s)")
+
+
+def stop():
+    global _maintenance_thread
+    if _maintenance_thread is not None:
+        _stop.set()
+        _maintenance_thread = None
+        flush_access()
@@ -0,0 +1,186 @@
+"""
+Streaming export and import of a single event.
+
+Formats:
+- ndjson: one {"username": ..., "embeddings": [[...], ...]} record per line
+- npz: a zip of numbered chunks, ``embeddings_NNNNNN`` (float32, rows x dim) and
+  ``usernames_NNNNNN`` (one username per row), readable with numpy.load
+
+Exports read rows from the memory-mapped embedding index and emit them chunk by chunk,
+so memory use does not depend on event size. Imports are collected as float32 arrays and applied
+to the store in one bulk commit; the store is a single JSON document rewritten in memory, so an
+import holds the whole store plus the imported rows and is capped at IMPORT_MAX_EMBEDDINGS.
+"""
+import io
+import json
+import logging
+import zipfile
+import numpy as np
+from app.core import config
+from app.services import embedding_index
+from app.services.embedding_store import _save_embeddings_to_cloudinary, load_for_update, store_write
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "npz")
+NPZ_CHUNK_ROWS = 10000
+
+
+def _iter_user_rows(event_index):
+    """Yield (username, start, end) row ranges; rows of one user are contiguous in the index."""
+    labels = event_index.labels
+    start = 0
+    for i in range(1, len(labels) + 1):
+        if i == len(labels) or labels[i] != labels[start]:
+            yield str(labels[start]), start, i
+            start = i
+
+
+def _raw_rows(event_index, start: int, end: int) -> np.ndarray:
+    """Undo the index normalisation to recover the stored embeddings."""
+    return np.asarray(event_index.matrix[start:end]) * np.asarray(event_index.norms[start:end])[:, np.newaxis]
+
+
+def get_export_index(event_name: str):
+    """Return the event's index, or None if the event has no stored embeddings."""
+    return embedding_index.get_event_index(event_name)
+
+
+def iter_export_ndjson(event_index):
+    """Yield one NDJSON line (bytes) per user."""
+    for username, start, end in _iter_user_rows(event_index):
+        record = {"username": username, "embeddings": _raw_rows(event_index, start, end).tolist()}
+        yield (json.dumps(record) + "\n").encode("utf-8")
+
+
+class _StreamSink(io.RawIOBase):
+    """Unseekable file object collecting zip output until the generator drains it."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_export_npz(event_index, chunk_rows=NPZ_CHUNK_ROWS):
+    """Yield a chunked .npz archive (bytes) built incrementally."""
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for chunk, start in enumerate(range(0, len(event_index), chunk_rows)):
+            end = min(start + chunk_rows, len(event_index))
+            arrays = {
+                f"embeddings_{chunk:06d}": _raw_rows(event_index, start, end).astype(np.float32),
+                f"usernames_{chunk:06d}": np.asarray(event_index.labels[start:end])
+            }
+            for name, array in arrays.items():
+                with zf.open(f"{name}.npy", mode="w", force_zip64=True) as member:
+                    np.lib.format.write_array(member, array, allow_pickle=False)
+                yield sink.drain()
+    yield sink.drain()
+
+
+def iter_import_ndjson(lines):
+    """Yield (username, embeddings) records from NDJSON lines (str or bytes)."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield record["username"], record["embeddings"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid NDJSON record on line {line_number}: {e}")
+
+
+def iter_import_npz(fileobj):
+    """Yield (username, [embedding]) records from a chunked .npz archive, one chunk in memory at a time."""
+    with np.load(fileobj, allow_pickle=False) as archive:
+        chunks = sorted(name[len("embeddings_"):] for name in archive.files if name.startswith("embeddings_"))
+        for chunk in chunks:
+            embeddings = archive[f"embeddings_{chunk}"]
+            usernames = archive[f"usernames_{chunk}"]
+            if len(embeddings) != len(usernames):
+                raise ValueError(f"Chunk {chunk} has {len(embeddings)} embeddings but {len(usernames)} usernames")
+            for username, embedding in zip(usernames, embeddings):
+                yield str(username), [embedding.tolist()]
+
+
+def import_event(event_name: str, records, mode: str = "merge"):
+    """
+    Apply imported (username, embeddings) records to an event in one bulk commit.
+    mode "merge" appends to existing users, skipping embeddings they already have; "replace"
+    discards the event's current data.
+    Imports with more than IMPORT_MAX_EMBEDDINGS embeddings are rejected while reading.
+    """
+    if not event_name or not event_name.strip():
+        return {"status": "error", "message": "Event name is required"}
+    if mode not in ("merge", "replace"):
+        return {"status": "error", "message": f"Unsupported import mode '{mode}'"}
+
+    imported_users = {}
+    embedding_count = 0
+    dim = None
+    try:
+        for username, embeddings in records:
+            if not isinstance(username, str) or not username.strip():
+                raise ValueError("Every record needs a non-empty username")
+            for embedding in embeddings:
+                if config.IMPORT_MAX_EMBEDDINGS and embedding_count >= config.IMPORT_MAX_EMBEDDINGS:
+                    raise ValueError(f"Import exceeds the limit of {config.IMPORT_MAX_EMBEDDINGS} embeddings (IMPORT_MAX_EMBEDDINGS)")
+                vector = np.asarray(embedding, dtype=np.float32)
+                if vector.ndim != 1:
+                    raise ValueError(f"Embedding of user '{username}' must be a flat list of numbers")
+                if dim is None:
+                    dim = len(vector)
+                if len(vector) != dim:
+                    raise ValueError(f"Embedding of user '{username}' has dimension {len(vector)}, expected {dim}")
+                imported_users.setdefault(username, []).append(vector)
+                embedding_count += 1
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Rejected import into event '{event_name}': {e}")
+        return {"status": "error", "message": str(e)}
+
+    if not imported_users:
+        return {"status": "error", "message": "No records to import"}
+
+    try:
+        logger.info(f"Importing {len(imported_users)} users ({embedding_count} embeddings) into event '{event_name}' ({mode})")
+        with store_write():
+            storage_data = load_for_update(event_name)
+            if mode == "replace" or event_name not in storage_data:
+                storage_data[event_name] = {}
+            event_users = storage_data[event_name]
+            duplicate_count = 0
+            for username, embeddings in imported_users.items():
+                existing = event_users.setdefault(username, [])
+                stored = np.asarray(existing, dtype=np.float32).reshape(len(existing), -1) if existing else np.empty((0, 0), dtype=np.float32)
+                for vector in embeddings:
+                    # Merging the same rows twice (e.g. a retried rebalance push) must not duplicate them
+                    if len(stored) and stored.shape[1] == len(vector) and np.isclose(stored, vector, atol=1e-5).all(axis=1).any():
+                        duplicate_count += 1
+                        continue
+                    existing.append(vector.tolist())
+                    stored = np.vstack([stored, vector]) if len(stored) else vector[np.newaxis]
+
+            _save_embeddings_to_cloudinary(storage_data, changed_events=[event_name])
+
+        logger.info(f"Successfully imported into event '{event_name}'")
+        return {
+            "status": "success",
+            "message": f"Imported {len(imported_users)} users into event '{event_name}'",
+            "user_count": len(imported_users),
+            "embedding_count": embedding_count - duplicate_count,
+            "duplicate_count": duplicate_count
+        }
+    except Exception as e:
+        logger.error(f"Error importing into event '{event_name}': {e}")
+        return {"status": "error", "message": "Failed to import event"}
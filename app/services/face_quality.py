@@ -0,0 +1,100 @@
+import logging
+import math
+import numpy as np
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+CROP_SIZE = 112
+
+
+def estimate_pose(kps: np.ndarray):
+    """
+    Approximate (yaw, pitch, roll) in degrees from the 5 InsightFace landmarks
+    (left eye, right eye, nose, left mouth corner, right mouth corner).
+    """
+    left_eye, right_eye, nose, left_mouth, right_mouth = np.asarray(kps, dtype=np.float64)[:5]
+    eye_vec = right_eye - left_eye
+    eye_dist = float(np.linalg.norm(eye_vec)) or 1.0
+    roll = math.degrees(math.atan2(eye_vec[1], eye_vec[0]))
+
+    # Express the nose in a roll-corrected frame centred between the eyes
+    cos_r, sin_r = eye_vec / eye_dist
+    eye_mid = (left_eye + right_eye) / 2
+    mouth_mid = (left_mouth + right_mouth) / 2
+
+    def rotate(p):
+        d = p - eye_mid
+        return np.array([d[0] * cos_r + d[1] * sin_r, -d[0] * sin_r + d[1] * cos_r])
+
+    nose_r, mouth_r = rotate(nose), rotate(mouth_mid)
+
+    # Frontal faces have the nose centred between the eyes; at ~90 degrees it reaches an eye
+    yaw = math.degrees(math.asin(float(np.clip(2 * nose_r[0] / eye_dist, -1, 1))))
+    # Frontal faces have the nose roughly half way down from the eye line to the mouth
+    ratio = nose_r[1] / mouth_r[1] if mouth_r[1] > 0 else 0.5
+    pitch = math.degrees(math.asin(float(np.clip((ratio - 0.5) * 2.5, -1, 1))))
+    return yaw, pitch, roll
+
+
+def sharpness(image_bgr: np.ndarray, bbox) -> float:
+    """Variance of the Laplacian of the face crop, resized so the score does not depend on face size."""
+    import cv2
+
+    h, w = image_bgr.shape[:2]
+    x1, y1, x2, y2 = [int(round(v)) for v in bbox[:4]]
+    crop = image_bgr[max(y1, 0):min(y2, h), max(x1, 0):min(x2, w)]
+    if crop.size == 0:
+        return 0.0
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    crop = cv2.resize(crop, (CROP_SIZE, CROP_SIZE), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(crop, cv2.CV_64F).var())
+
+
+def _reject(code: str, message: str, value: float, threshold: float):
+    return {"code": code, "message": message, "value": round(value, 2), "threshold": threshold}
+
+
+def assess_face(image_bgr: np.ndarray, face):
+    """
+    Check a detected face before recognition runs.
+    Returns (metrics, rejection) where rejection is None for usable faces; checks run
+    cheapest first and stop at the first failure.
+    """
+    metrics = {}
+    det_score = float(face.det_score)
+    metrics["det_score"] = round(det_score, 3)
+    if det_score < config.QUALITY_MIN_DET_SCORE:
+        return metrics, _reject("low_detection_score", "Face detection confidence too low", det_score, config.QUALITY_MIN_DET_SCORE)
+
+    x1, y1, x2, y2 = [float(v) for v in face.bbox[:4]]
+    face_size = min(x2 - x1, y2 - y1)
+    metrics["face_size"] = round(face_size, 1)
+    if face_size < config.QUALITY_MIN_FACE_SIZE:
+        return metrics, _reject("face_too_small", "Face too small, move closer to the camera", face_size, config.QUALITY_MIN_FACE_SIZE)
+
+    if face.kps is not None:
+        yaw, pitch, roll = estimate_pose(face.kps)
+        metrics.update(yaw=round(yaw, 1), pitch=round(pitch, 1), roll=round(roll, 1))
+        if abs(yaw) > config.QUALITY_MAX_YAW:
+            return metrics, _reject("pose_yaw", "Face turned too far sideways, look at the camera", abs(yaw), config.QUALITY_MAX_YAW)
+        if abs(pitch) > config.QUALITY_MAX_PITCH:
+            return metrics, _reject("pose_pitch", "Face tilted too far up or down, look at the camera", abs(pitch), config.QUALITY_MAX_PITCH)
+
+    blur = sharpness(image_bgr, face.bbox)
+    metrics["sharpness"] = round(blur, 1)
+    if blur < config.QUALITY_MIN_SHARPNESS:
+        return metrics, _reject("blurry", "Face image too blurry", blur, config.QUALITY_MIN_SHARPNESS)
+
+    return metrics, None
+
+
+def assess_crop(image_bgr: np.ndarray):
+    """Check a client-supplied aligned face crop; only sharpness applies without a detection."""
+    h, w = image_bgr.shape[:2]
+    blur = sharpness(image_bgr, (0, 0, w, h))
+    metrics = {"sharpness": round(blur, 1)}
+    if blur < config.QUALITY_MIN_SHARPNESS:
+        return metrics, _reject("blurry", "Face image too blurry", blur, config.QUALITY_MIN_SHARPNESS)
+    return metrics, None
@@ -1,25 +1,23 @@
 import numpy as np
-import json
-import requests
 import logging
-import tempfile
 import os
 import time
-import cv2 #type: ignore
-import insightface #type: ignore
-from app.services import cloud_storage
-from app.core import config
+from app.core import config, thread_budget
+from app.core.utils import resolve_model_dir
+from app.services import embedding_index, event_tiering, face_quality
+from app.services.embedding_store import _save_embeddings_to_cloudinary, load_for_update, store_write
+from app.services.storage_client import StorageUnavailable
 
-# Check if using Cloudinary or local storage
-USE_CLOUDINARY = os.getenv("USE_CLOUDINARY", "true").lower() == "true"
-LOCAL_EMBEDDINGS_PATH = "data/embeddings.json"
-MODEL_ROOT = os.path.join(os.path.dirname(__file__), "models")  # e.g., ./models/buffalo_l
+MODEL_ROOT = config.MODEL_DIR or os.path.join(os.path.dirname(__file__), "models")  # e.g., ./models/buffalo_l (see FACE_MODEL_PACK)
 
 logger = logging.getLogger(__name__)
 
 # Threshold for face verification similarity (60% confidence)
 THRESHOLD = 0.4
 
+# Side of the aligned face crop expected by the recognition model
+CROP_SIZE = 112
+
 # Initialize InsightFace model (lazy loading)
 _face_app = None
 
@@ -27,117 +25,298 @@ def get_face_app():
     """Get or initialize InsightFace app with persistent local models."""
     global _face_app
     if _face_app is None:
-        logger.info(f"Loading InsightFace model from local folder: {MODEL_ROOT}")
-        os.makedirs(MODEL_ROOT, exist_ok=True)
+        import insightface  # type: ignore  # deferred: heavy import only needed by face endpoints
+        logger.info(f"Loading InsightFace model pack {config.FACE_MODEL_PACK} from local folder: {MODEL_ROOT}")
+        resolve_model_dir(MODEL_ROOT, os.path.join(os.path.dirname(__file__), "models"))
+        start = time.perf_counter()
 
-        # Specify the model name you want (buffalo_l, for example)
-        _face_app = insightface.app.FaceAnalysis(
-            name="buffalo_l",
+        # Only the configured modules are loaded; the service needs detection and recognition
+        app = insightface.app.FaceAnalysis(
+            name=config.FACE_MODEL_PACK,
             root=MODEL_ROOT,
+            allowed_modules=config.FACE_MODULES or None,
             providers=["CPUExecutionProvider"]
         )
-        _face_app.prepare(ctx_id=0, det_size=(640, 640))
-        logger.info("InsightFace model ready")
+        _apply_session_options(app)
+        # Prepared at the largest size; adaptive detection passes smaller sizes per call
+        app.prepare(ctx_id=0, det_size=(config.DETECTION_SIZES[-1],) * 2)
+        # Published only once prepared, so a failed load is retried instead of half-initialised
+        _face_app = app
+        logger.info(f"InsightFace model ready in {time.perf_counter() - start:.2f}s (modules: {sorted(_face_app.models)})")
     return _face_app
 
-def _load_embeddings_from_cloudinary(retry_count=3):
-    """Load embeddings from Cloudinary or local file based on USE_CLOUDINARY flag"""
-    if not USE_CLOUDINARY:
-        # Load from local file
-        try:
-            if os.path.exists(LOCAL_EMBEDDINGS_PATH):
-                with open(LOCAL_EMBEDDINGS_PATH, 'r') as f:
-                    logger.info(f"Loading embeddings from local file: {LOCAL_EMBEDDINGS_PATH}")
-                    return json.load(f)
-            else:
-                logger.info(f"Local embeddings file not found: {LOCAL_EMBEDDINGS_PATH}")
-                return {}
-        except Exception as e:
-            logger.error(f"Error loading local embeddings: {e}")
-            return {}
-    
-    # Load from Cloudinary (original code)
-    cache_buster = int(time.time())
-    url = f"https://res.cloudinary.com/{config.CLOUD_NAME}/raw/upload/face_recognition/embeddings.json?cb={cache_buster}"
-    
-    for attempt in range(retry_count):
-        try:
-            logger.info(f"Loading embeddings from Cloudinary (attempt {attempt + 1})")
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                logger.info("Successfully loaded embeddings from Cloudinary")
-                return response.json()
-            
-            if attempt < retry_count - 1:
-                logger.info(f"Retrying in 2 seconds... (attempt {attempt + 1}/{retry_count})")
-                time.sleep(2)
-            else:
-                logger.warning(f"No embeddings found after {retry_count} attempts, status: {response.status_code}")
-                
-        except requests.RequestException as e:
-            if attempt < retry_count - 1:
-                logger.warning(f"Request failed, retrying: {e}")
-                time.sleep(2)
-            else:
-                logger.error(f"Failed to load embeddings after {retry_count} attempts: {e}")
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in embeddings: {e}")
-            break
-    
-    return {}
-
-def _save_embeddings_to_cloudinary(data):
-    """Save embeddings to Cloudinary or local file based on USE_CLOUDINARY flag"""
-    if not USE_CLOUDINARY:
-        # Save to local file
-        try:
-            os.makedirs(os.path.dirname(LOCAL_EMBEDDINGS_PATH), exist_ok=True)
-            with open(LOCAL_EMBEDDINGS_PATH, 'w') as f:
-                json.dump(data, f, indent=2)
-            logger.info(f"Successfully saved embeddings to local file: {LOCAL_EMBEDDINGS_PATH}")
-            return
-        except Exception as e:
-            logger.error(f"Failed to save local embeddings: {e}")
-            raise
-    
-    # Save to Cloudinary (original code)
+def _apply_session_options(app):
+    """
+    Recreate the model sessions with the thread budget's SessionOptions.
+    FaceAnalysis only forwards providers to onnxruntime, so the options cannot be passed in.
+    """
+    options = thread_budget.session_options()
+    if options is None:
+        return
+    for model in app.models.values():
+        # InferenceSession keeps its path private; InsightFace models record the file they loaded
+        session = model.session
+        model.session = type(session)(model.model_file, sess_options=options, providers=session.get_providers())
+
+def extract_face_embedding(image_array: np.ndarray):
+    """Extract face embedding from an image array (None when no face was found or extraction failed)."""
     try:
-        logger.info("Saving embeddings to Cloudinary")
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(data, f)
-            temp_path = f.name
-        
-        cloud_storage.upload_embeddings(temp_path)
-        logger.info("Successfully saved embeddings to Cloudinary")
+        details = extract_face_details(image_array)
     except Exception as e:
-        logger.error(f"Failed to save embeddings: {e}")
-        raise
-    finally:
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
+        logger.error(f"Error extracting embedding: {e}")
+        return None
+    if details is None:
+        return None
+    return details["embedding"]
+
+def _face_type():
+    """InsightFace's Face container (a dict with attribute access)."""
+    from insightface.app.common import Face  # type: ignore
+    return Face
+
+def _detect_faces(app, image_bgr: np.ndarray, trace: list = None, all_faces: bool = False):
+    """
+    Run only the detection model; faces are sorted by detection score.
+    DETECTION_SIZES are tried smallest first and a larger input size runs only when no face,
+    or only a tiny one (the best face, or any face with all_faces), was found. Each attempt
+    is appended to trace as {"size", "faces", "ms"}.
+    """
+    Face = _face_type()
+    height, width = image_bgr.shape[:2]
+    faces = []
+    for size in config.DETECTION_SIZES:
+        start = time.perf_counter()
+        bboxes, kpss = app.det_model.detect(image_bgr, input_size=(size, size), max_num=0, metric="default")
+        found = [
+            Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+            for i in range(bboxes.shape[0])
+        ]
+        if trace is not None:
+            trace.append({"size": size, "faces": len(found), "ms": round((time.perf_counter() - start) * 1000, 2)})
+        if found:
+            faces = found
+        else:
+            continue
+
+        # Side of the face in detector input pixels (the image is resized to fit size x size)
+        scale = size / max(height, width)
+        checked = faces if all_faces else faces[:1]
+        if min(min(f.bbox[2] - f.bbox[0], f.bbox[3] - f.bbox[1]) for f in checked) * scale >= config.DETECTION_MIN_FACE_PX:
+            break
+    return faces
+
+def _align_face(image_bgr: np.ndarray, kps: np.ndarray):
+    """Five-point ArcFace alignment to a CROP_SIZE x CROP_SIZE crop."""
+    from insightface.utils import face_align  # type: ignore
+    return face_align.norm_crop(image_bgr, landmark=kps, image_size=CROP_SIZE)
+
+def _embed_face(app, image_bgr: np.ndarray, face):
+    """Run the recognition model on an already detected face."""
+    app.models["recognition"].get(image_bgr, face)
+    return face.embedding
+
+def extract_face_details(image_array: np.ndarray, trace: list = None):
+    """
+    Extract the embedding and bounding box of the first detected face.
+    The quality gate runs between detection and recognition; rejected faces are returned
+    with embedding None and a structured "rejected" reason, without running recognition.
+    Detection attempts are appended to trace (see _detect_faces).
+    Returns None when no face was found; model errors are raised.
+    """
+    import cv2  # type: ignore
+    # Convert RGB -> BGR if needed
+    if len(image_array.shape) == 3 and image_array.shape[2] == 3:
+        image_bgr = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+    else:
+        image_bgr = image_array
+
+    app = get_face_app()
+    faces = _detect_faces(app, image_bgr, trace)
+
+    if len(faces) == 0:
+        logger.warning("No face detected")
+        return None
+    elif len(faces) > 1:
+        logger.warning(f"Multiple faces detected ({len(faces)}), using first one")
+
+    face = faces[0]
+    bbox = [round(float(v), 1) for v in face.bbox]
+    quality = None
+    if config.QUALITY_GATE:
+        quality, rejection = face_quality.assess_face(image_bgr, face)
+        if rejection is not None:
+            logger.warning(f"Face rejected by quality gate: {rejection['code']} ({quality})")
+            return {"embedding": None, "bbox": bbox, "quality": quality, "rejected": rejection}
+
+    return {
+        "embedding": _embed_face(app, image_bgr, face).tolist(),
+        "bbox": bbox,
+        "quality": quality,
+        "rejected": None
+    }
+
+def extract_group_details(image_array: np.ndarray, max_faces: int = None, trace: list = None):
+    """
+    Extract embeddings for every detected face (largest detection scores first).
+    Faces passing the quality gate are aligned and embedded in a single batched recognition call.
+    Detection escalates to a larger input size while any face is tiny. Model errors are raised.
+    """
+    import cv2  # type: ignore
+    if len(image_array.shape) == 3 and image_array.shape[2] == 3:
+        image_bgr = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+    else:
+        image_bgr = image_array
+
+    app = get_face_app()
+    faces = _detect_faces(app, image_bgr, trace, all_faces=True)[:max_faces or config.GROUP_MAX_FACES]
+    logger.info(f"Group frame: {len(faces)} faces detected")
+
+    results, crops = [], []
+    for face in faces:
+        result = {"embedding": None, "bbox": [round(float(v), 1) for v in face.bbox], "quality": None, "rejected": None}
+        if config.QUALITY_GATE:
+            result["quality"], result["rejected"] = face_quality.assess_face(image_bgr, face)
+        if result["rejected"] is None:
+            crops.append((result, _align_face(image_bgr, face.kps)))
+        results.append(result)
+
+    if crops:
+        embeddings = app.models["recognition"].get_feat([crop for _, crop in crops])
+        for (result, _), embedding in zip(crops, embeddings):
+            result["embedding"] = embedding.tolist()
+    return results
+
+def extract_crop_details(image_array: np.ndarray):
+    """
+    Extract the embedding of a client-side aligned face crop (CROP_SIZE x CROP_SIZE).
+    Detection and alignment are skipped; only the recognition model runs. Model errors are raised.
+    """
+    import cv2  # type: ignore
+    if len(image_array.shape) == 3 and image_array.shape[2] == 3:
+        image_bgr = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+    else:
+        image_bgr = image_array
+
+    quality = None
+    if config.QUALITY_GATE:
+        quality, rejection = face_quality.assess_crop(image_bgr)
+        if rejection is not None:
+            logger.warning(f"Face crop rejected by quality gate: {rejection['code']} ({quality})")
+            return {"embedding": None, "bbox": None, "quality": quality, "rejected": rejection}
+
+    app = get_face_app()
+    embedding = app.models["recognition"].get_feat(image_bgr).flatten()
+    return {"embedding": embedding.tolist(), "bbox": None, "quality": quality, "rejected": None}
+
+def verify_group(event_name: str, faces: list, one_to_one: bool = True):
+    """
+    Match every embedded face of a group frame against an event.
+    With one_to_one, pairs are assigned greedily by similarity so a user is claimed by at most one face.
+    """
+    results = [{"flag": False, "username": None, "confidence": 0.0} for _ in faces]
+    embedded = [i for i, face in enumerate(faces) if face.get("embedding") is not None]
+    if not embedded:
+        return {"status": "success", "faces": results, "matched": 0}
 
-def extract_face_embedding(image_array: np.ndarray):
-    """Extract face embedding from an image array."""
     try:
-        # Convert RGB -> BGR if needed
-        if len(image_array.shape) == 3 and image_array.shape[2] == 3:
-            image_bgr = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+        event_tiering.record_access(event_name)
+        event_index = embedding_index.get_event_index(event_name)
+        if event_index is None:
+            logger.info(f"Event '{event_name}' not found or has no users")
+            return {"status": "error", "message": f"Event '{event_name}' not found or has no registered users"}
+
+        usernames, scores = event_index.user_scores([faces[i]["embedding"] for i in embedded])
+        for row, i in enumerate(embedded):
+            best = int(np.argmax(scores[row]))
+            results[i]["confidence"] = round(float(scores[row, best]) * 100, 2)
+
+        if one_to_one:
+            # Candidate (face, user) pairs under the threshold, best similarity first
+            rows, cols = np.nonzero(1 - scores < THRESHOLD)
+            order = np.argsort(-scores[rows, cols], kind="stable")
+            taken_faces, taken_users = set(), set()
+            for row, col in zip(rows[order], cols[order]):
+                if row in taken_faces or col in taken_users:
+                    continue
+                taken_faces.add(row)
+                taken_users.add(col)
+                results[embedded[row]].update(flag=True, username=str(usernames[col]), confidence=round(float(scores[row, col]) * 100, 2))
         else:
-            image_bgr = image_array
+            for row, i in enumerate(embedded):
+                best = int(np.argmax(scores[row]))
+                if 1 - scores[row, best] < THRESHOLD:
+                    results[i].update(flag=True, username=str(usernames[best]))
 
-        app = get_face_app()
-        faces = app.get(image_bgr)
+        matched = sum(1 for r in results if r["flag"])
+        logger.info(f"Group verification in event '{event_name}': {matched}/{len(faces)} faces matched")
+        return {"status": "success", "faces": results, "matched": matched}
+    except StorageUnavailable:
+        # Surfaced as 503 so clients retry instead of treating it as a miss
+        raise
+    except Exception as e:
+        logger.error(f"Error verifying group in event '{event_name}': {e}")
+        return {"status": "error", "message": "Failed to verify group"}
 
-        if len(faces) == 0:
-            logger.warning("No face detected")
-            return None
-        elif len(faces) > 1:
-            logger.warning(f"Multiple faces detected ({len(faces)}), using first one")
+def identify_face(embedding: list, top_k: int = 5, events: list = None):
+    """
+    Find which events a face is registered in with one search over the global index, or event
+    by event while the global index is not available (see embedding_index.get_global_index).
+    Returns the top_k (event, user) hits, optionally restricted to the given events.
+    Cold events are only searched when named in events.
+    """
+    try:
+        global_index = embedding_index.get_global_index()
+        candidates = global_index.search(embedding, top_k, events) if global_index is not None else []
+        searched = len(global_index.events) if global_index is not None and events is None else 0
+        if events is not None:
+            names = events
+        else:
+            cold = set(embedding_index.cold_events())
+            names = [] if global_index is not None else [name for name in embedding_index.indexed_events() if name not in cold]
+        for event_name in names:
+            if global_index is not None and event_name in global_index:
+                searched += 1
+                continue
+            # Cold or not yet indexed: searched on its own (loads a cold event into the index)
+            event_index = embedding_index.get_event_index(event_name)
+            if event_index is None or event_index.matrix.shape[1] != len(embedding):
+                continue
+            searched += 1
+            usernames, scores = event_index.user_scores([embedding])
+            candidates.extend((event_name, str(username), float(score)) for username, score in zip(usernames, scores[0]))
 
-        return faces[0].embedding.tolist()
+        candidates.sort(key=lambda hit: -hit[2])
+        matches = [
+            {"event_name": event_name, "username": username, "confidence": round(score * 100, 2), "flag": bool(1 - score < THRESHOLD)}
+            for event_name, username, score in candidates[:top_k]
+        ]
+        skipped_cold = len(embedding_index.cold_events()) if events is None else 0
+        logger.info(f"Identification over {searched} events: {sum(m['flag'] for m in matches)} matches above threshold")
+        return {"status": "success", "matches": matches, "searched_events": searched, "skipped_cold_events": skipped_cold}
+    except StorageUnavailable:
+        raise
     except Exception as e:
-        logger.error(f"Error extracting embedding: {e}")
-        return None
+        logger.error(f"Error identifying face across events: {e}")
+        return {"status": "error", "message": "Failed to identify face"}
+
+def check_embedding(embedding, model_version: str):
+    """
+    Validate a precomputed embedding against the configured model.
+    Returns an error message, or None when the embedding can be matched.
+    """
+    if model_version != config.FACE_MODEL_PACK:
+        return f"Embedding model '{model_version}' does not match the server model '{config.FACE_MODEL_PACK}'"
+    if not isinstance(embedding, list) or len(embedding) != config.EMBEDDING_DIM:
+        return f"Embedding must be a list of {config.EMBEDDING_DIM} numbers"
+    try:
+        vector = np.asarray(embedding, dtype=np.float32)
+    except (TypeError, ValueError):
+        return f"Embedding must be a list of {config.EMBEDDING_DIM} numbers"
+    if vector.ndim != 1:
+        return f"Embedding must be a flat list of {config.EMBEDDING_DIM} numbers"
+    if not np.all(np.isfinite(vector)) or not np.any(vector):
+        return "Embedding must be a finite, non-zero vector"
+    return None
 
 def add_user_face(event_name: str, username: str, embedding: list):
     """Add a new user embedding to the specified event."""
@@ -155,22 +334,26 @@ def add_user_face(event_name: str, username: str, embedding: list):
 
     try:
         logger.info(f"Adding user '{username}' to event '{event_name}'")
-        storage_data = _load_embeddings_from_cloudinary()
+        with store_write():
+            storage_data = load_for_update(event_name)
 
-        if event_name not in storage_data:
-            storage_data[event_name] = {}
-            logger.info(f"Created new event: {event_name}")
+            if event_name not in storage_data:
+                storage_data[event_name] = {}
+                logger.info(f"Created new event: {event_name}")
 
-        if username not in storage_data[event_name]:
-            storage_data[event_name][username] = []
-            logger.info(f"Created new user: {username}")
+            if username not in storage_data[event_name]:
+                storage_data[event_name][username] = []
+                logger.info(f"Created new user: {username}")
 
-        storage_data[event_name][username].append(embedding)
+            storage_data[event_name][username].append(embedding)
         
-        logger.info(f"Data structure before saving: {list(storage_data.keys())}")
-        logger.info(f"Event '{event_name}' has users: {list(storage_data[event_name].keys())}")
+            logger.info(f"Data structure before saving: {list(storage_data.keys())}")
+            logger.info(f"Event '{event_name}' has users: {list(storage_data[event_name].keys())}")
         
-        _save_embeddings_to_cloudinary(storage_data)
+            _save_embeddings_to_cloudinary(
+                storage_data, changed_events=[event_name],
+                changes=[{"op": "add", "event_name": event_name, "username": username, "embedding": embedding}]
+            )
 
         embedding_count = len(storage_data[event_name][username])
         logger.info(f"Successfully added user '{username}' to '{event_name}' (total embeddings: {embedding_count})")
@@ -179,6 +362,8 @@ def add_user_face(event_name: str, username: str, embedding: list):
             "message": f"User '{username}' successfully added to event '{event_name}'",
             "embedding_count": embedding_count
         }
+    except StorageUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error adding user '{username}' to event '{event_name}': {e}")
         return {"status": "error", "message": "Failed to add user to event"}
@@ -207,10 +392,10 @@ def verify_face(event_name: str, embedding: list):
 
     try:
         logger.info(f"Verifying face against event '{event_name}'")
-        storage_data = _load_embeddings_from_cloudinary()
-        event_users = storage_data.get(event_name, {})
+        event_tiering.record_access(event_name)
+        event_index = embedding_index.get_event_index(event_name)
 
-        if not event_users:
+        if event_index is None:
             logger.info(f"Event '{event_name}' not found or has no users")
             return {
                 "flag": False, 
@@ -220,67 +405,36 @@ def verify_face(event_name: str, embedding: list):
                 "face_detected": True
             }
 
-        logger.info(f"Checking against {len(event_users)} users in event '{event_name}'")
+        logger.info(f"Checking against {event_index.user_count} users in event '{event_name}'")
         
-        best_match = None
-        best_distance = float('inf')
-        best_username = None
-        
-        for username, embeddings in event_users.items():
-            for i, saved_emb in enumerate(embeddings):
-                try:
-                    # Calculate cosine similarity for InsightFace embeddings
-                    emb1 = np.array(embedding)
-                    emb2 = np.array(saved_emb)
-                    
-                    # Normalize vectors
-                    emb1_norm = emb1 / np.linalg.norm(emb1)
-                    emb2_norm = emb2 / np.linalg.norm(emb2)
-                    
-                    # Calculate cosine similarity
-                    cosine_sim = np.dot(emb1_norm, emb2_norm)
-                    dist = 1 - cosine_sim  # Convert to distance
-                    
-                    # Track best match
-                    if dist < best_distance:
-                        best_distance = dist
-                        best_username = username
-                        best_match = round((1 - dist) * 100, 2)
-                    
-                    if dist < THRESHOLD:
-                        logger.info(f"Match found: user '{username}' in event '{event_name}' (distance: {dist:.4f}, confidence: {round((1 - dist) * 100, 2)}%)")
-                        return {
-                            "flag": True, 
-                            "username": username, 
-                            "message": f"Face verified successfully for user '{username}' in event '{event_name}'",
-                            "confidence": round((1 - dist) * 100, 2),
-                            "user_in_system": True,
-                            "face_detected": True
-                        }
-                except Exception as e:
-                    logger.warning(f"Error comparing embedding {i} for user '{username}': {e}")
-                    continue
+        # Cosine similarity against every stored embedding in one matrix-vector product
+        username, cosine_sim = event_index.best_match(embedding)
+        dist = 1 - cosine_sim  # Convert to distance
+        confidence = round((1 - dist) * 100, 2)
 
-        # Log most similar face even if not verified
-        if best_username:
-            logger.info(f"Most similar: '{best_username}' with {best_match}% confidence - Below threshold")
+        if dist < THRESHOLD:
+            logger.info(f"Match found: user '{username}' in event '{event_name}' (distance: {dist:.4f}, confidence: {confidence}%)")
             return {
-                "flag": False, 
-                "username": None, 
-                "message": "No matching face found in event",
-                "confidence": best_match,
-                "user_in_system": False,
+                "flag": True, 
+                "username": username, 
+                "message": f"Face verified successfully for user '{username}' in event '{event_name}'",
+                "confidence": confidence,
+                "user_in_system": True,
                 "face_detected": True
             }
-        
-        logger.info(f"No match found in event '{event_name}'")
+
+        # Log most similar face even if not verified
+        logger.info(f"Most similar: '{username}' with {confidence}% confidence - Below threshold")
         return {
             "flag": False, 
             "username": None, 
-            "message": f"No matching face found in event '{event_name}'",
+            "message": "No matching face found in event",
+            "confidence": confidence,
             "user_in_system": False,
             "face_detected": True
         }
+    except StorageUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error verifying face in event '{event_name}': {e}")
         return {
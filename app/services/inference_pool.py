@@ -0,0 +1,86 @@
+"""
+Multi-process inference workers.
+
+Each worker process loads the face and spoofing models once and serves analysis jobs from
+the executor's request queue. Decoded frames are handed over through a
+multiprocessing.shared_memory block instead of being pickled: the API process copies the
+frame into the block once, the worker maps it as an ndarray view, and only the small result
+(embedding, box, spoofing verdict) travels back through the queue.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _worker_init():
+    """Load all models once per worker process."""
+    from app.core.logging_config import setup_logging
+    from app.services.face_service_insightface import get_face_app
+    from app.services.spoofing_detection import load_model
+
+    setup_logging(config.LOG_DIR)
+    get_face_app()
+    load_model()
+    logging.getLogger(__name__).info(f"Inference worker {multiprocessing.current_process().name} ready")
+
+
+def _worker_analyze(shm_name: str, shape: tuple, dtype: str, kind: str = "face"):
+    """Analyze a frame living in a shared-memory block (runs in a worker process)."""
+    from app.services.analysis import analyze_crop_image, analyze_group_image, analyze_image
+
+    analyzers = {"face": analyze_image, "group": analyze_group_image, "crop": analyze_crop_image}
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        return analyzers[kind](image)
+    finally:
+        shm.close()
+
+
+def enabled() -> bool:
+    return config.INFERENCE_WORKERS > 0
+
+
+def start():
+    """Start the worker pool (no-op when INFERENCE_WORKERS is 0)."""
+    global _executor
+    if _executor is None and enabled():
+        logger.info(f"Starting {config.INFERENCE_WORKERS} inference worker processes")
+        _executor = ProcessPoolExecutor(
+            max_workers=config.INFERENCE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        logger.info("Stopping inference worker processes")
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def analyze_async(image: np.ndarray, kind: str = "face"):
+    """
+    Run analysis for a decoded frame on the worker pool without blocking the event loop.
+    kind is "face" (single face), "group" (every face) or "crop" (aligned face crop).
+    """
+    image = np.ascontiguousarray(image)
+    shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+    try:
+        np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+        future = start().submit(_worker_analyze, shm.name, image.shape, image.dtype.str, kind)
+        return await asyncio.wrap_future(future)
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,80 @@
+"""
+In-process counters exposed by GET /metrics (JSON, or Prometheus text format).
+
+Values are per process: with several uvicorn workers each worker reports its own counters.
+Analysis results carry their detection trace back from inference workers, so model work done
+in the inference pool is still counted by the API process that served the request.
+"""
+import threading
+from collections import defaultdict
+
+_counters = defaultdict(float)
+_lock = threading.Lock()
+
+
+def increment(name: str, value: float = 1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
+
+
+def record_detection(trace):
+    """
+    Record one frame's detection attempts [{"size", "faces", "ms"}, ...]. The frame is a hit at
+    the last size that found faces: a larger size that finds nothing keeps the earlier faces.
+    """
+    if not trace:
+        return
+    for attempt in trace:
+        size = str(attempt["size"])
+        increment("detection_attempts_total", size=size)
+        increment("detection_ms_total", attempt["ms"], size=size)
+    found = [attempt for attempt in trace if attempt["faces"]]
+    if found:
+        increment("detection_hits_total", size=str(found[-1]["size"]))
+    else:
+        increment("detection_misses_total")
+    increment("detection_frames_total")
+    if len(trace) > 1:
+        increment("detection_escalations_total", len(trace) - 1)
+
+
+def detection_summary():
+    """Per input size: attempts, frames resolved there, hit rate and mean cost."""
+    counters = snapshot()
+    frames = counters.get(("detection_frames_total", ()), 0)
+    sizes = {}
+    for (name, labels), value in counters.items():
+        labels = dict(labels)
+        if "size" in labels and name.startswith("detection_"):
+            sizes.setdefault(labels["size"], {})[name] = value
+
+    summary = {}
+    for size, values in sorted(sizes.items(), key=lambda item: int(item[0])):
+        attempts = values.get("detection_attempts_total", 0)
+        hits = values.get("detection_hits_total", 0)
+        summary[size] = {
+            "attempts": int(attempts),
+            "hits": int(hits),
+            "hit_rate": round(hits / frames, 4) if frames else None,
+            "mean_ms": round(values.get("detection_ms_total", 0) / attempts, 2) if attempts else None
+        }
+    return {
+        "frames": int(frames),
+        "misses": int(counters.get(("detection_misses_total", ()), 0)),
+        "escalations": int(counters.get(("detection_escalations_total", ()), 0)),
+        "sizes": summary
+    }
+
+
+def prometheus_text():
+    lines = []
+    for (name, labels), value in sorted(snapshot().items()):
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"face_recognition_{name}{{{label_text}}} {value:g}" if label_text else f"face_recognition_{name} {value:g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,65 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(data: bytes) -> str:
+    """Return the cache key for a raw upload (SHA-256 of its bytes)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by entry count and time-to-live."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        """Return the cached value for key, or None if missing or expired."""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value):
+        """Store value under key, evicting the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared cache of per-image analysis results (embedding, face box, spoofing verdict)
+analysis_cache = ResultCache(config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+logger.info(f"Result cache configured (size: {config.RESULT_CACHE_SIZE}, ttl: {config.RESULT_CACHE_TTL}s)")
@@ -0,0 +1,304 @@
+"""
+Event sharding across nodes with a consistent-hash ring.
+
+Every node is configured with the same SHARD_NODES ("name=url" pairs) and its own SHARD_SELF.
+Event names are hashed onto a ring holding SHARD_VNODES points per node; the first point
+clockwise owns the event. Each node keeps only its own events in its store (a per-node
+Cloudinary folder or local file) and index, so adding nodes adds capacity. When a node joins or
+leaves, only the events on the ring arcs next to its points change owner.
+
+/verify and /addUser requests for an event owned by another node are answered with a 307
+redirect to the owner (clients resend the same form). /verify/identify spans events, so the
+receiving node searches its own events and fans the embedding out to the nodes owning the rest
+(identify()). rebalance() moves events a node holds
+but no longer owns to their owners through the event export/import endpoints.
+"""
+import bisect
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from app.core import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process locking unavailable, fall back to in-process lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    """Stable across processes and hosts (unlike hash())."""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring over node names."""
+
+    def __init__(self, nodes, vnodes: int = 64):
+        self.nodes = sorted(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str):
+        """Node owning key, or None for an empty ring."""
+        if not self._hashes:
+            return None
+        i = bisect.bisect_right(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[i]
+
+
+_ring = None
+_rebalance_lock = threading.Lock()
+REBALANCE_LOCK_FILE = os.path.join(config.INDEX_DIR, "rebalance.lock")
+
+
+def enabled() -> bool:
+    return bool(config.SHARD_NODES)
+
+
+def ring() -> HashRing:
+    global _ring
+    if _ring is None:
+        _ring = HashRing(config.SHARD_NODES, config.SHARD_VNODES)
+    return _ring
+
+
+def owner(event_name: str):
+    """Name of the node owning event_name (None when sharding is disabled)."""
+    return ring().owner(event_name) if enabled() else None
+
+
+def is_local(event_name: str) -> bool:
+    return not enabled() or owner(event_name) == config.SHARD_SELF
+
+
+def owner_url(event_name: str):
+    return config.SHARD_NODES.get(owner(event_name))
+
+
+def status():
+    return {
+        "enabled": enabled(),
+        "self": config.SHARD_SELF or None,
+        "nodes": config.SHARD_NODES,
+        "vnodes": config.SHARD_VNODES
+    }
+
+
+def import_unsharded():
+    """
+    One-time move to sharding: a shard node stores its events under its own Cloudinary folder,
+    so data written before sharding (face_recognition/) would be invisible to it. On the node's
+    first start (its folder has no store and no metadata summary yet) the events it owns, cold
+    ones included, are copied from the unsharded folder. The summary written by that save marks
+    the import as done, even when the node owns none of the events. The unsharded folder is
+    left untouched: every node takes its own share and it stays as a backup.
+    Returns the imported event names.
+    """
+    from app.services import cloud_storage, embedding_store
+
+    if not config.SHARD_SELF or config.REPLICA_OF or not embedding_store.USE_CLOUDINARY:
+        return []
+    with embedding_store.store_write():
+        embedding_store.begin_write()
+        if embedding_store._load_metadata() is not None or embedding_store._load_embeddings_from_cloudinary():
+            return []
+        folder = cloud_storage.UNSHARDED_FOLDER
+        unsharded = embedding_store._download_json(f"{folder}/embeddings") or {}
+        cold = embedding_store.cold_event_names(embedding_store._download_json(f"{folder}/metadata"))
+        if not unsharded and not cold:
+            return []
+
+        storage_data = {}
+        for event_name in sorted(set(unsharded) | set(cold)):
+            if not is_local(event_name):
+                continue
+            users = unsharded.get(event_name)
+            if users is None:
+                users = embedding_store._load_cold_event(event_name, prefix=f"{folder}/cold/")
+                if users is None:
+                    raise RuntimeError(f"Cold copy of event '{event_name}' could not be loaded from {folder}/")
+            storage_data[event_name] = users
+        logger.info(f"Importing {len(storage_data)} of {len(set(unsharded) | set(cold))} events from the unsharded folder {folder}/")
+        embedding_store._save_embeddings_to_cloudinary(storage_data)
+    return sorted(storage_data)
+
+
+def _identify_on(client, node: str, embedding: list, top_k: int, events):
+    response = client.post(
+        f"{config.SHARD_NODES[node]}/api/shards/identify",
+        data={"embedding": json.dumps(embedding), "top_k": top_k, "events": ",".join(events or [])}
+    )
+    response.raise_for_status()
+    result = response.json()
+    if result.get("status") != "success":
+        raise RuntimeError(result.get("message"))
+    return result
+
+
+def identify(embedding: list, top_k: int = 5, events: list = None):
+    """
+    identify_face over the whole cluster: this node's events are searched locally, the others
+    on their owners (in parallel), and the hits merged into one top_k list. Nodes that do not
+    answer are listed in unreachable_nodes rather than failing the request.
+    """
+    import httpx
+    from app.services import face_service_insightface as face_service
+
+    if events is None:
+        local_events, peers = None, {node: None for node in config.SHARD_NODES if node != config.SHARD_SELF}
+    else:
+        local_events, peers = [], {}
+        for event_name in events:
+            node = owner(event_name)
+            if node == config.SHARD_SELF:
+                local_events.append(event_name)
+            else:
+                peers.setdefault(node, []).append(event_name)
+
+    results, unreachable = [], []
+    if local_events is None or local_events:
+        local = face_service.identify_face(embedding, top_k=top_k, events=local_events)
+        if local["status"] != "success":
+            return local
+        results.append(local)
+    if peers:
+        with httpx.Client(timeout=config.STORAGE_DEADLINE * 10) as client, ThreadPoolExecutor(max_workers=len(peers)) as pool:
+            futures = {node: pool.submit(_identify_on, client, node, embedding, top_k, node_events) for node, node_events in peers.items()}
+            for node, future in futures.items():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"Identification on node '{node}' failed: {e}")
+                    unreachable.append(node)
+
+    # A misplaced event awaiting rebalance can be answered by two nodes: keep the best hit
+    best = {}
+    for result in results:
+        for match in result["matches"]:
+            key = (match["event_name"], match["username"])
+            if key not in best or match["confidence"] > best[key]["confidence"]:
+                best[key] = match
+    return {
+        "status": "success",
+        "matches": sorted(best.values(), key=lambda match: -match["confidence"])[:top_k],
+        "searched_events": sum(result["searched_events"] for result in results),
+        "skipped_cold_events": sum(result["skipped_cold_events"] for result in results),
+        "unreachable_nodes": unreachable
+    }
+
+
+def _push_event(client, event_name: str, target_url: str):
+    """
+    Export an event from this node and import it on target_url; returns the import result.
+    Merge imports skip rows the owner already has, so a retried push does not duplicate them.
+    """
+    from app.services import event_transfer
+
+    event_index = event_transfer.get_export_index(event_name)
+    if event_index is None:
+        return {"status": "error", "message": f"Event '{event_name}' not found"}
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as archive:
+        for chunk in event_transfer.iter_export_npz(event_index):
+            archive.write(chunk)
+        archive.seek(0)
+        response = client.post(
+            f"{target_url}/api/events/{event_name}/import",
+            files={"file": (f"{event_name}.npz", archive, "application/octet-stream")},
+            data={"format": "npz", "mode": "merge"}
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+@contextmanager
+def _exclusive_rebalance():
+    """Yield True if no other thread or worker process of this node is rebalancing."""
+    if not _rebalance_lock.acquire(blocking=False):
+        yield False
+        return
+    try:
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(config.INDEX_DIR, exist_ok=True)
+        with open(REBALANCE_LOCK_FILE, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    finally:
+        _rebalance_lock.release()
+
+
+def rebalance():
+    """
+    Move every event stored on this node but owned by another node to its owner:
+    export, import on the owner, then delete the local copy. Returns {"moved", "failed"}.
+    """
+    if not enabled():
+        return {"status": "error", "message": "Sharding is not enabled"}
+    with _exclusive_rebalance() as acquired:
+        if not acquired:
+            return {"status": "error", "message": "A rebalance is already running"}
+        return _rebalance_locked()
+
+
+def _rebalance_locked():
+    import httpx
+    from app.services import event_service
+    from app.services.embedding_store import load_metadata
+
+    moved, failed = [], []
+    misplaced = [name for name in sorted(load_metadata()["events"]) if not is_local(name)]
+    logger.info(f"Rebalance: {len(misplaced)} events to move off node '{config.SHARD_SELF}'")
+    with httpx.Client(timeout=config.STORAGE_DEADLINE * 10) as client:
+        for event_name in misplaced:
+            target = owner(event_name)
+            try:
+                result = _push_event(client, event_name, config.SHARD_NODES[target])
+                if result.get("status") != "success":
+                    raise RuntimeError(result.get("message"))
+                # Only drop the local copy once the owner has committed it
+                deleted = event_service.delete_event(event_name)
+                if deleted.get("status") != "success":
+                    raise RuntimeError(deleted.get("message"))
+                moved.append({"event_name": event_name, "node": target})
+                logger.info(f"Rebalance: moved event '{event_name}' to node '{target}'")
+            except Exception as e:
+                logger.error(f"Rebalance: failed to move event '{event_name}' to node '{target}': {e}")
+                failed.append({"event_name": event_name, "node": target, "message": str(e)})
+    return {"status": "success", "moved": moved, "failed": failed}
+
+
+def start_rebalance(attempts: int = 5, delay: float = 10):
+    """
+    Run rebalance() in a background thread (startup). Nodes usually restart together after a
+    membership change, so failed moves are retried while the owners come up.
+    """
+    def run():
+        for attempt in range(attempts):
+            try:
+                result = rebalance()
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            if result.get("status") == "success" and not result["failed"]:
+                logger.info(f"Startup rebalance finished: {len(result['moved'])} events moved")
+                return
+            logger.warning(f"Startup rebalance incomplete (attempt {attempt + 1}/{attempts}): {result.get('failed') or result.get('message')}")
+            time.sleep(delay)
+
+    threading.Thread(target=run, name="shard-rebalance", daemon=True).start()
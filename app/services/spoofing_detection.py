@@ -1,12 +1,111 @@
 import logging
-from ultralytics import YOLO
 import numpy as np
-import cv2
+from app.core import config, thread_budget
+from app.core.utils import resolve_model_file
 
 logger = logging.getLogger(__name__)
 
-# Load YOLO model once at module level
-model = YOLO('app/models/yolov8n.pt')
+BUNDLED_MODEL_DIR = "app/models"
+YOLO_WEIGHTS = "yolov8n.pt"
+
+# Initialize YOLO model (lazy loading)
+model = None
+
+def get_yolo_model():
+    """Get or initialize the YOLO model used for spoofing detection."""
+    global model
+    if model is None:
+        from ultralytics import YOLO  # deferred: pulls in torch
+        thread_budget.configure_torch()
+        weights_path = resolve_model_file(YOLO_WEIGHTS, config.MODEL_DIR, BUNDLED_MODEL_DIR)
+        logger.info(f"Loading YOLO model from: {weights_path}")
+        model = YOLO(weights_path)
+        logger.info("YOLO model ready")
+    return model
+
+# Initialize ONNX Runtime session (lazy loading)
+_onnx_session = None
+
+def get_onnx_session():
+    """Get or initialize the onnxruntime session for the exported YOLO model."""
+    global _onnx_session
+    if _onnx_session is None:
+        import onnxruntime as ort
+        model_path = resolve_model_file(config.SPOOFING_ONNX_MODEL, config.MODEL_DIR, BUNDLED_MODEL_DIR)
+        logger.info(f"Loading ONNX YOLO model from: {model_path}")
+        _onnx_session = ort.InferenceSession(model_path, sess_options=thread_budget.session_options(), providers=["CPUExecutionProvider"])
+        logger.info(f"ONNX YOLO model ready (input size: {config.SPOOFING_IMGSZ})")
+    return _onnx_session
+
+def load_model():
+    """Load the model of the configured spoofing engine."""
+    if config.SPOOFING_ENGINE == "onnx":
+        return get_onnx_session()
+    return get_yolo_model()
+
+def _letterbox(image: np.ndarray, size: int):
+    """Resize keeping aspect ratio and pad to a square input, returning the tensor, scale and padding."""
+    import cv2
+
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    tensor = canvas.transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+    return tensor, scale, pad_x, pad_y
+
+def _largest_person_box_onnx(image: np.ndarray):
+    """Run the ONNX YOLO model and return the largest person box (x1, y1, x2, y2) or None."""
+    session = get_onnx_session()
+    tensor, scale, pad_x, pad_y = _letterbox(image, config.SPOOFING_IMGSZ)
+    preds = session.run(None, {session.get_inputs()[0].name: tensor})[0][0]  # (4 + classes, anchors)
+
+    # Person class only: row 4 holds the person scores; other class rows are never read
+    keep = preds[4] >= config.SPOOFING_CONF
+    if not np.any(keep):
+        return None
+
+    cx, cy, bw, bh = preds[:4, keep]
+    best = int(np.argmax(bw * bh))
+
+    h, w = image.shape[:2]
+    x1 = int(np.clip((cx[best] - bw[best] / 2 - pad_x) / scale, 0, w))
+    y1 = int(np.clip((cy[best] - bh[best] / 2 - pad_y) / scale, 0, h))
+    x2 = int(np.clip((cx[best] + bw[best] / 2 - pad_x) / scale, 0, w))
+    y2 = int(np.clip((cy[best] + bh[best] / 2 - pad_y) / scale, 0, h))
+    return x1, y1, x2, y2
+
+def _detect_spoofing_onnx(image: np.ndarray) -> bool:
+    """ONNX engine: brightness analysis on the largest person ROI only."""
+    import cv2
+
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    elif image.shape[2] == 4:
+        image = image[:, :, :3]
+
+    box = _largest_person_box_onnx(image)
+    if box is None:
+        return False
+
+    x1, y1, x2, y2 = box
+    # Same conversion as the ultralytics engine so both share the thresholds below
+    person_roi = cv2.cvtColor(np.ascontiguousarray(image[y1:y2, x1:x2]), cv2.COLOR_BGR2GRAY)
+    if person_roi.size == 0:
+        return False
+
+    brightness_std = float(person_roi.std())
+    avg_brightness = float(person_roi.mean())
+    logger.info(f"Person area: {(x2-x1) * (y2-y1):.0f}, Brightness std: {brightness_std:.1f}, Avg brightness: {avg_brightness:.1f}")
+
+    if brightness_std < 60 or avg_brightness > 160:
+        logger.warning("SPOOFING DETECTED - Phone screen characteristics!")
+        return True
+    return False
 
 def detect_spoofing(image: np.ndarray) -> bool:
     """
@@ -14,8 +113,13 @@ def detect_spoofing(image: np.ndarray) -> bool:
     Returns True if spoofing detected, False otherwise.
     """
     try:
+        if config.SPOOFING_ENGINE == "onnx":
+            return _detect_spoofing_onnx(image)
+
+        import cv2
+
         # Run YOLO detection
-        results = model(image, conf=0.3, verbose=False)
+        results = get_yolo_model()(image, conf=config.SPOOFING_CONF, verbose=False)
         
         # Get person detections
         persons = []
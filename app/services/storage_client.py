@@ -0,0 +1,211 @@
+"""
+Resilient HTTP client for reading raw resources from the Cloudinary CDN.
+
+Requests run on one httpx.AsyncClient (pooled keep-alive connections) owned by a background
+event loop thread, so the synchronous service code and the async routes share the pool.
+Each call has a deadline covering all of its attempts up to the response headers; bodies are
+then read with a per-read stall timeout, so a large store document is not cut off by the
+deadline. Failed attempts are retried with full-jitter exponential backoff. A circuit breaker opens after consecutive failures and
+fails calls immediately until a trial call succeeds, so callers can fall back to the last
+good data instead of stalling on a dead upstream.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; anything else (besides 200/404) is treated as a hard failure
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class StorageUnavailable(Exception):
+    """Raised when the storage backend cannot be reached (retries exhausted or breaker open)."""
+
+
+class CircuitBreaker:
+    """Closed -> open after failure_threshold consecutive failures -> half-open after reset_timeout."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream; in half-open state only one trial call at a time."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Storage circuit breaker closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Storage circuit breaker opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(config.STORAGE_BREAKER_FAILURES, config.STORAGE_BREAKER_RESET)
+
+_loop = None
+_client = None
+_transport = None
+_loop_lock = threading.Lock()
+
+
+def configure(transport=None):
+    """Use a custom httpx transport (e.g. httpx.MockTransport); closes the current client."""
+    global _transport
+    close()
+    _transport = transport
+
+
+def _get_loop():
+    """Start the background event loop thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="storage-client", daemon=True).start()
+        return _loop
+
+
+def _get_client():
+    """The shared AsyncClient; created on the background loop."""
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.AsyncClient(
+            transport=_transport,
+            limits=httpx.Limits(max_connections=config.STORAGE_MAX_CONNECTIONS, max_keepalive_connections=config.STORAGE_MAX_CONNECTIONS),
+            follow_redirects=True
+        )
+    return _client
+
+
+def _run(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def close():
+    """Close pooled connections (the loop thread stays for later calls)."""
+    global _client
+    if _client is not None and _loop is not None:
+        client, _client = _client, None
+        asyncio.run_coroutine_threadsafe(client.aclose(), _loop).result()
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2^attempt))."""
+    return random.uniform(0, min(config.STORAGE_BACKOFF_MAX, config.STORAGE_BACKOFF_BASE * 2 ** attempt))
+
+
+async def _send(url: str, deadline: float, stream: bool = False):
+    """
+    GET url with retries until deadline (monotonic). Returns the response, or None for 404.
+    The deadline covers connecting and the response headers; without stream the body is read
+    too, failing only when a read stalls for STORAGE_DEADLINE.
+    Raises StorageUnavailable when the breaker is open or every attempt failed.
+    """
+    import httpx
+
+    if not breaker.allow():
+        raise StorageUnavailable("storage circuit breaker is open")
+
+    client = _get_client()
+    last_error = None
+    for attempt in range(config.STORAGE_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        response = None
+        try:
+            timeout = httpx.Timeout(config.STORAGE_DEADLINE, connect=remaining, pool=remaining)
+            request = client.build_request("GET", url, timeout=timeout)
+            response = await asyncio.wait_for(client.send(request, stream=True), remaining)
+            if response.status_code == 200:
+                if not stream:
+                    await response.aread()
+                breaker.record_success()
+                return response
+            await response.aclose()
+            if response.status_code == 404:
+                # The store answered; the resource simply does not exist
+                breaker.record_success()
+                return None
+            last_error = f"status {response.status_code}"
+            if response.status_code not in RETRY_STATUSES:
+                break
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            if response is not None:
+                await response.aclose()
+            last_error = f"{type(e).__name__}: {e}"
+
+        delay = _backoff(attempt)
+        if attempt == config.STORAGE_RETRIES or time.monotonic() + delay >= deadline:
+            break
+        logger.warning(f"Storage request failed ({last_error}), retrying in {delay:.2f}s (attempt {attempt + 1})")
+        await asyncio.sleep(delay)
+
+    breaker.record_failure()
+    raise StorageUnavailable(f"storage request failed: {last_error or 'deadline exceeded'}")
+
+
+def get(url: str, timeout: float = None):
+    """GET url and return the response body, or None if not found."""
+    deadline = time.monotonic() + (timeout or config.STORAGE_DEADLINE)
+    response = _run(_send(url, deadline))
+    return None if response is None else response.content
+
+
+def iter_bytes(url: str, chunk_size: int = 64 * 1024, timeout: float = None):
+    """
+    Stream the body of url in chunks, or yield nothing if not found. The deadline covers
+    establishing the response; chunks are then read without a total time limit.
+    """
+    deadline = time.monotonic() + (timeout or config.STORAGE_DEADLINE)
+    response = _run(_send(url, deadline, stream=True))
+    if response is None:
+        return
+    chunks = response.aiter_bytes(chunk_size)
+    try:
+        while True:
+            try:
+                yield _run(chunks.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        _run(response.aclose())
+
+
+def status():
+    return {"breaker": breaker.state, "consecutive_failures": breaker.failures}
@@ -0,0 +1 @@
+# Scripts package
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Startup time, resident memory and latency per InsightFace configuration.
+
+Each configuration (model pack x module set) is measured in a fresh interpreter, so the
+numbers include the import and model load the API process pays on its first face request:
+
+- startup: ``get_face_app()`` wall time (imports, ONNX session creation, prepare)
+- rss: resident set size after loading, and its peak
+- latency: ``extract_face_details`` (the service path: detection, quality gate, recognition)
+  and ``FaceAnalysis.get`` (every loaded module) on the same image
+
+Usage:
+    python -m scripts.bench_face_models --image samples/face.jpg
+    python -m scripts.bench_face_models --packs buffalo_s,buffalo_l --modules "detection,recognition;" --iterations 50
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# "" loads every module in the pack
+DEFAULT_MODULE_SETS = ["detection,recognition", ""]
+
+
+def _memory_mb():
+    """Current and peak resident memory of this process in MB."""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, value = line.split(":")
+                values[key] = int(value.split()[0]) / 1024
+    return values.get("VmRSS", 0.0), values.get("VmHWM", 0.0)
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def _latency(fn, iterations: int, warmup: int = 2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"mean_ms": round(sum(samples) / len(samples), 2), "p50_ms": round(_percentile(samples, 50), 2), "p95_ms": round(_percentile(samples, 95), 2)}
+
+
+def run_child(image_path: str, iterations: int):
+    """Measure the configuration given by FACE_MODEL_PACK / FACE_MODULES in this process."""
+    import numpy as np
+    from PIL import Image
+
+    baseline_rss, _ = _memory_mb()
+    start = time.perf_counter()
+    from app.services import face_service_insightface as face_service
+    app = face_service.get_face_app()
+    startup_s = time.perf_counter() - start
+    rss, _ = _memory_mb()
+
+    if image_path:
+        image = np.array(Image.open(image_path).convert("RGB"))
+    else:
+        image = np.random.default_rng(0).integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+    image_bgr = np.ascontiguousarray(image[:, :, ::-1])
+
+    details = face_service.extract_face_details(image)
+    report = {
+        "pack": face_service.config.FACE_MODEL_PACK,
+        "modules": sorted(app.models),
+        "startup_s": round(startup_s, 2),
+        "rss_mb": round(rss, 1),
+        "model_rss_mb": round(rss - baseline_rss, 1),
+        "face_found": bool(details and details.get("embedding") is not None),
+        "service": _latency(lambda: face_service.extract_face_details(image), iterations),
+        "app_get": _latency(lambda: app.get(image_bgr), iterations)
+    }
+    report["peak_rss_mb"] = round(_memory_mb()[1], 1)
+    print(json.dumps(report))
+
+
+def measure(pack: str, modules: str, image_path: str, iterations: int):
+    env = dict(os.environ, FACE_MODEL_PACK=pack, FACE_MODULES=modules, PRELOAD_MODELS="false", LOG_DIR="")
+    cmd = [sys.executable, "-m", "scripts.bench_face_models", "--child", "--iterations", str(iterations)]
+    if image_path:
+        cmd += ["--image", image_path]
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"pack": pack, "modules": modules or "all", "error": result.stderr.strip().splitlines()[-1:]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark InsightFace model packs and module sets")
+    parser.add_argument("--packs", default="buffalo_l,buffalo_s", help="Comma separated model packs")
+    parser.add_argument("--modules", default=";".join(DEFAULT_MODULE_SETS),
+                        help="Semicolon separated module sets; an empty set loads every module")
+    parser.add_argument("--image", help="Image containing a face (default: random noise, detection only)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--json", dest="json_path", help="Optional path to write the results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.image, args.iterations)
+        return
+
+    if not args.image:
+        print("No --image given: latencies cover detection only (no face to recognize)")
+
+    results = []
+    for pack in [p.strip() for p in args.packs.split(",") if p.strip()]:
+        for modules in args.modules.split(";"):
+            print(f"Measuring {pack} [{modules or 'all modules'}] ...", flush=True)
+            results.append(measure(pack, modules.strip(), args.image, args.iterations))
+
+    print(f"\n{'pack':<10} {'modules':<48} {'startup s':>9} {'rss MB':>8} {'service p50':>12} {'app.get p50':>12}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['pack']:<10} {r['modules']:<48} failed: {r['error']}")
+            continue
+        print(f"{r['pack']:<10} {','.join(r['modules']):<48} {r['startup_s']:>9.2f} {r['rss_mb']:>8.1f} "
+              f"{r['service']['p50_ms']:>10.1f}ms {r['app_get']['p50_ms']:>10.1f}ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Throughput and tail latency of the load test across thread budgets.
+
+Each budget gets a fresh load-test server (scripts.loadtest) started with THREAD_BUDGET set
+to that value; "0" keeps every runtime at its default thread pool (one thread per core in
+each process) and "auto" splits the CPUs across the server processes. Verify latencies and
+throughput are compared per budget.
+
+The fake models only respond to thread counts through --blas-work (multi-threaded matrix
+products per model call); sleeps and spins do not. For real models, start the server with
+each THREAD_BUDGET yourself and point ``scripts.loadtest run --url`` at it.
+
+Usage:
+    python -m scripts.bench_thread_budget --server-workers 4 --blas-work 20 --budgets 0,auto,1,2
+"""
+import argparse
+import json
+import tempfile
+from scripts import loadtest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare load-test results across thread budgets")
+    loadtest._add_server_args(parser)
+    loadtest._add_run_args(parser)
+    parser.add_argument("--budgets", default="0,auto,1,2", help="Comma separated THREAD_BUDGET values")
+    args = parser.parse_args()
+    args.url = None
+
+    reports = []
+    for budget in [b.strip() for b in args.budgets.split(",") if b.strip()]:
+        print(f"THREAD_BUDGET={budget} ...", flush=True)
+        args.storage_dir = tempfile.mkdtemp(prefix="face_thread_budget_")
+        args.server_env = {"THREAD_BUDGET": budget}
+        reports.append((budget, loadtest.run(args)))
+        args.url = None
+
+    print(f"\n{'budget':<8} {'rps':>9} {'errors':>8} {'verify p50':>11} {'verify p99':>11} {'req/cpu-s':>10}")
+    for budget, report in reports:
+        total = report["results"].get("all", {})
+        verify = report["results"].get("verify", {})
+        print(f"{budget:<8} {total.get('throughput_rps', 0):>9} {total.get('error_rate', 0):>8.2%} "
+              f"{verify.get('p50_ms', '-'):>9}ms {verify.get('p99_ms', '-'):>9}ms {report.get('requests_per_cpu_second') or '-':>10}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({budget: report for budget, report in reports}, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
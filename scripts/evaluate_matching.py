@@ -0,0 +1,356 @@
+"""
+Offline accuracy-versus-speed evaluation of matching engines.
+
+Embeddings come from a directory of labelled face images (``<dir>/<identity>/*.jpg``, embedded
+with the configured FACE_MODEL_PACK through the service's own extraction path), from event
+exports (``scripts.event_transfer export`` NDJSON or NPZ, one file per model pack to compare
+packs), or from a synthetic generator for a quick sanity run.
+
+Per identity, the first --gallery-size embeddings are enrolled and the rest are probes;
+--unknown-fraction of the identities are not enrolled at all and only probe (open set).
+Every engine scores all probes against the gallery and reports, side by side:
+
+- TAR@FAR at the requested false accept rates (genuine vs impostor per-user scores)
+- TAR / FAR at the service threshold (similarity >= 1 - THRESHOLD), and the rate at which
+  unknown identities are accepted as someone
+- top-1 identification accuracy of enrolled probes
+- single-query latency (p50 / p95) and gallery memory
+
+Usage:
+    python -m scripts.evaluate_matching --images data/lfw_subset --save logs/lfw_buffalo_l.npz
+    python -m scripts.evaluate_matching --embeddings logs/lfw_buffalo_l.npz logs/lfw_buffalo_s.npz
+    python -m scripts.evaluate_matching --synthetic 1000x5 --gallery-size 2 --engines matrix,fp16,int8,centroid
+
+centroid only differs from matrix with --gallery-size above 1.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_FARS = (1e-1, 1e-2, 1e-3, 1e-4)
+# Synthetic captures: genuine pairs straddle the service threshold and the score tails overlap,
+# so quantised engines and centroids measurably differ from exact float32 matching
+SYNTHETIC_NOISE = 0.8
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+# --- embedding sources -------------------------------------------------------------------
+
+def load_images(image_dir: str):
+    """Embed <image_dir>/<identity>/<image> with the service's extraction path."""
+    from PIL import Image
+    from app.services import face_service_insightface as face_service
+
+    identities = OrderedDict()
+    skipped = 0
+    for identity in sorted(os.listdir(image_dir)):
+        folder = os.path.join(image_dir, identity)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = np.array(Image.open(os.path.join(folder, name)).convert("RGB"))
+            details = face_service.extract_face_details(image)
+            if not details or details.get("embedding") is None:
+                skipped += 1
+                continue
+            identities.setdefault(identity, []).append(details["embedding"])
+    print(f"Embedded {sum(len(v) for v in identities.values())} images of {len(identities)} identities "
+          f"({skipped} without a usable face)", file=sys.stderr)
+    return identities
+
+
+def load_embeddings(path: str):
+    """Load an event export (NDJSON or NPZ) as {identity: [embedding, ...]}."""
+    from app.services import event_transfer
+
+    identities = OrderedDict()
+    with open(path, "rb") as f:
+        records = event_transfer.iter_import_npz(f) if path.endswith(".npz") else event_transfer.iter_import_ndjson(f)
+        for username, embeddings in records:
+            identities.setdefault(username, []).extend(embeddings)
+    return identities
+
+
+def save_embeddings(identities: dict, path: str):
+    """Write identities in the event export NPZ format, so the cache can also be imported as an event."""
+    from app.services import event_transfer
+    from app.services.embedding_index import EventIndex, _build_event_arrays
+
+    labels, matrix, norms = _build_event_arrays(identities)
+    with open(path, "wb") as f:
+        for chunk in event_transfer.iter_export_npz(EventIndex("evaluation", labels, matrix, norms)):
+            f.write(chunk)
+    print(f"Saved {len(labels)} embeddings to {path}", file=sys.stderr)
+
+
+def synthetic(spec: str, dim: int = 512, noise: float = SYNTHETIC_NOISE, seed: int = 0):
+    """
+    <identities>x<samples> noisy captures of random identities. Identities share a low-rank
+    component, so impostor similarities spread like real faces instead of sitting at 0, and
+    capture quality varies (log-normal noise scale), so a few genuine pairs score low.
+    """
+    count, samples = (int(v) for v in spec.lower().split("x"))
+    rng = np.random.default_rng(seed)
+    shared = rng.normal(size=(count, 16)) @ rng.normal(size=(16, dim)) / 2
+    centers = shared + rng.normal(size=(count, dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    identities = OrderedDict()
+    for i, center in enumerate(centers):
+        scale = noise * rng.lognormal(0, 0.5, size=(samples, 1))
+        vectors = center + rng.normal(size=(samples, dim)) * scale / np.sqrt(dim)
+        identities[f"id_{i:05d}"] = vectors.astype(np.float32).tolist()
+    return identities
+
+
+def split(identities: dict, gallery_size: int, unknown_fraction: float, seed: int = 0):
+    """Return (gallery {identity: embeddings}, probe embeddings, probe identities, probe enrolled mask)."""
+    names = list(identities)
+    rng = np.random.default_rng(seed)
+    unknown = set(rng.choice(names, size=int(len(names) * unknown_fraction), replace=False)) if unknown_fraction else set()
+
+    gallery, probes, probe_labels = OrderedDict(), [], []
+    for name in names:
+        embeddings = identities[name]
+        if name in unknown:
+            probe_embeddings = embeddings
+        else:
+            gallery[name] = embeddings[:gallery_size]
+            probe_embeddings = embeddings[gallery_size:]
+        probes.extend(probe_embeddings)
+        probe_labels.extend([name] * len(probe_embeddings))
+
+    probe_labels = np.asarray(probe_labels)
+    enrolled = np.isin(probe_labels, list(gallery))
+    return gallery, np.asarray(probes, dtype=np.float32), probe_labels, enrolled
+
+
+# --- engines -----------------------------------------------------------------------------
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+class LoopEngine:
+    """The original exhaustive per-embedding cosine loop of verify_face."""
+    name = "loop"
+
+    def __init__(self, gallery: dict):
+        self.gallery = {user: [np.asarray(e, dtype=np.float64) for e in embs] for user, embs in gallery.items()}
+        self.users = np.asarray(list(gallery))
+        self.nbytes = sum(e.nbytes for embs in self.gallery.values() for e in embs)
+
+    def scores(self, queries):
+        out = np.empty((len(queries), len(self.users)), dtype=np.float32)
+        for q, query in enumerate(np.asarray(queries, dtype=np.float64)):
+            query_norm = np.linalg.norm(query)
+            for u, user in enumerate(self.users):
+                out[q, u] = max(np.dot(query, e) / (query_norm * np.linalg.norm(e)) for e in self.gallery[user])
+        return out
+
+
+class MatrixEngine:
+    """The service's engine: normalised float32 matrix, per-user max (EventIndex.user_scores)."""
+    name = "matrix"
+
+    def __init__(self, gallery: dict):
+        from app.services.embedding_index import EventIndex, _build_event_arrays
+        self.index = EventIndex("evaluation", *_build_event_arrays(gallery))
+        self.users = np.asarray(list(gallery))
+        self.nbytes = self.index.nbytes
+
+    def scores(self, queries):
+        users, scores = self.index.user_scores(queries)
+        assert np.array_equal(users, self.users), "gallery users must keep their order"
+        return scores
+
+
+class _GroupedEngine:
+    """Matrix engines with rows grouped by user; subclasses choose the storage type."""
+
+    def __init__(self, gallery: dict):
+        rows, labels = [], []
+        for u, embeddings in enumerate(gallery.values()):
+            rows.extend(embeddings)
+            labels.extend([u] * len(embeddings))
+        self.users = np.asarray(list(gallery))
+        self.starts = np.flatnonzero(np.r_[True, np.diff(labels) != 0])
+        self.matrix = self.encode(_normalize(rows))
+        self.nbytes = self.matrix.nbytes
+
+    def scores(self, queries):
+        return np.maximum.reduceat(self.similarities(_normalize(queries)), self.starts, axis=1)
+
+
+class Float16Engine(_GroupedEngine):
+    name = "fp16"
+
+    def encode(self, matrix):
+        return matrix.astype(np.float16)
+
+    def similarities(self, queries):
+        return (queries.astype(np.float16) @ self.matrix.T).astype(np.float32)
+
+
+class Int8Engine(_GroupedEngine):
+    """Symmetric int8 quantisation of unit vectors, one scale per row, int32 accumulation."""
+    name = "int8"
+
+    def encode(self, matrix):
+        self.scales = np.abs(matrix).max(axis=1) / 127
+        return np.round(matrix / self.scales[:, None]).astype(np.int8)
+
+    def similarities(self, queries):
+        query_scales = np.abs(queries).max(axis=1) / 127
+        quantized = np.round(queries / query_scales[:, None]).astype(np.int8)
+        dots = quantized.astype(np.int32) @ self.matrix.T.astype(np.int32)
+        return dots * query_scales[:, None] * self.scales[None, :]
+
+
+class CentroidEngine(_GroupedEngine):
+    """One template per user: the normalised mean of the user's embeddings."""
+    name = "centroid"
+
+    def __init__(self, gallery: dict):
+        centroids = OrderedDict((user, [_normalize(embs).mean(axis=0)]) for user, embs in gallery.items())
+        super().__init__(centroids)
+
+    def encode(self, matrix):
+        return matrix
+
+    def similarities(self, queries):
+        return queries @ self.matrix.T
+
+
+ENGINES = OrderedDict((engine.name, engine) for engine in (LoopEngine, MatrixEngine, Float16Engine, Int8Engine, CentroidEngine))
+
+
+# --- metrics -----------------------------------------------------------------------------
+
+def evaluate(engine, probes, probe_labels, enrolled, threshold: float, fars, latency_queries: int):
+    scores = engine.scores(probes)
+    user_pos = {user: i for i, user in enumerate(engine.users)}
+
+    genuine_mask = np.zeros_like(scores, dtype=bool)
+    rows = np.flatnonzero(enrolled)
+    genuine_mask[rows, [user_pos[label] for label in probe_labels[rows]]] = True
+    genuine, impostor = scores[genuine_mask], scores[~genuine_mask]
+
+    min_similarity = 1 - threshold
+    top = scores.max(axis=1)
+    predicted = engine.users[scores.argmax(axis=1)]
+    result = {
+        "engine": engine.name,
+        "tar_at_far": {},
+        "top1_accuracy": round(float(np.mean(predicted[enrolled] == probe_labels[enrolled])), 4) if enrolled.any() else None,
+        "tar_at_threshold": round(float(np.mean(genuine >= min_similarity)), 4) if len(genuine) else None,
+        "far_at_threshold": round(float(np.mean(impostor >= min_similarity)), 6) if len(impostor) else None,
+        "unknown_accept_rate": round(float(np.mean(top[~enrolled] >= min_similarity)), 4) if (~enrolled).any() else None,
+        "gallery_mb": round(engine.nbytes / 1024 / 1024, 3)
+    }
+    for far in fars:
+        if len(impostor) * far < 1:
+            result["tar_at_far"][str(far)] = None  # not enough impostor pairs to resolve this FAR
+            continue
+        cut = np.quantile(impostor, 1 - far)
+        result["tar_at_far"][str(far)] = round(float(np.mean(genuine > cut)), 4)
+
+    # Production matches one query at a time
+    samples = []
+    for query in probes[:latency_queries]:
+        start = time.perf_counter()
+        engine.scores(query[None, :])
+        samples.append((time.perf_counter() - start) * 1000)
+    if samples:
+        result["p50_ms"] = round(float(np.percentile(samples, 50)), 3)
+        result["p95_ms"] = round(float(np.percentile(samples, 95)), 3)
+    return result
+
+
+def run_source(name: str, identities: dict, args, fars):
+    gallery, probes, probe_labels, enrolled = split(identities, args.gallery_size, args.unknown_fraction, args.seed)
+    print(f"[{name}] {len(gallery)} enrolled identities ({sum(len(v) for v in gallery.values())} embeddings), "
+          f"{len(probes)} probes ({int((~enrolled).sum())} from unknown identities)", file=sys.stderr)
+    if not len(probes):
+        sys.exit("No probes: every identity needs more than --gallery-size embeddings")
+
+    results = []
+    for engine_name in args.engines.split(","):
+        engine_cls = ENGINES[engine_name.strip()]
+        build_start = time.perf_counter()
+        engine = engine_cls(gallery)
+        build_s = time.perf_counter() - build_start
+        result = evaluate(engine, probes, probe_labels, enrolled, args.threshold, fars, args.latency_queries)
+        result.update(source=name, build_s=round(build_s, 3))
+        results.append(result)
+        print(f"[{name}] {engine_name} done", file=sys.stderr)
+    return results
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.4f}" if isinstance(value, float) else str(value)
+
+
+def print_table(results, fars):
+    far_columns = [f"TAR@{far:g}" for far in fars]
+    header = ["source", "engine", *far_columns, "top1", "TAR@thr", "FAR@thr", "unk@thr", "p50 ms", "p95 ms", "MB"]
+    rows = [[
+        r["source"], r["engine"], *[_fmt(r["tar_at_far"][str(far)]) for far in fars], _fmt(r["top1_accuracy"]),
+        _fmt(r["tar_at_threshold"]), _fmt(r["far_at_threshold"]), _fmt(r["unknown_accept_rate"]),
+        _fmt(r.get("p50_ms")), _fmt(r.get("p95_ms")), _fmt(r["gallery_mb"])
+    ] for r in results]
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(str(cell).rjust(width) for cell, width in zip(row, widths)))
+
+
+def main():
+    from app.services.face_service_insightface import THRESHOLD
+
+    parser = argparse.ArgumentParser(description="Compare matching engines on labelled faces or cached embeddings")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--images", help="Directory of <identity>/<image> files")
+    source.add_argument("--embeddings", nargs="+", help="Event exports (.ndjson/.npz), one per model pack to compare")
+    source.add_argument("--synthetic", help="<identities>x<samples>, e.g. 1000x4")
+    parser.add_argument("--synthetic-noise", type=float, default=SYNTHETIC_NOISE, help="Capture noise of synthetic identities (higher is harder)")
+    parser.add_argument("--save", help="With --images: cache the embeddings as an NPZ export")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"Comma separated, from {list(ENGINES)}")
+    parser.add_argument("--gallery-size", type=int, default=1, help="Enrolled embeddings per identity")
+    parser.add_argument("--unknown-fraction", type=float, default=0.1, help="Identities kept out of the gallery")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Distance threshold (match when 1 - cosine < threshold)")
+    parser.add_argument("--far", default=",".join(str(f) for f in DEFAULT_FARS), help="Comma separated false accept rates")
+    parser.add_argument("--latency-queries", type=int, default=200, help="Single queries timed per engine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+    fars = [float(f) for f in args.far.split(",")]
+
+    if args.images:
+        identities = load_images(args.images)
+        if args.save:
+            save_embeddings(identities, args.save)
+        sources = [(os.path.basename(os.path.normpath(args.images)), identities)]
+    elif args.embeddings:
+        sources = [(os.path.splitext(os.path.basename(path))[0], load_embeddings(path)) for path in args.embeddings]
+    else:
+        sources = [(f"synthetic-{args.synthetic}", synthetic(args.synthetic, noise=args.synthetic_noise, seed=args.seed))]
+
+    results = []
+    for name, identities in sources:
+        results.extend(run_source(name, identities, args, fars))
+
+    print_table(results, fars)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"threshold": args.threshold, "results": results}, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
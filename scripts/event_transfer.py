@@ -0,0 +1,60 @@
+"""
+Export or import a single event against the configured store.
+
+Usage:
+    python -m scripts.event_transfer export conference_2024 --format npz --out conference_2024.npz
+    python -m scripts.event_transfer import conference_2024 --file conference_2024.npz --format npz --mode replace
+"""
+import argparse
+import sys
+from app.services import event_transfer
+
+
+def export_event(args):
+    event_index = event_transfer.get_export_index(args.event)
+    if event_index is None:
+        sys.exit(f"Event '{args.event}' not found")
+
+    chunks = event_transfer.iter_export_npz(event_index) if args.format == "npz" else event_transfer.iter_export_ndjson(event_index)
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.out:
+            out.close()
+    print(f"Exported {len(event_index)} embeddings from event '{args.event}'", file=sys.stderr)
+
+
+def import_event(args):
+    with open(args.file, "rb") as f:
+        records = event_transfer.iter_import_npz(f) if args.format == "npz" else event_transfer.iter_import_ndjson(f)
+        result = event_transfer.import_event(args.event, records, args.mode)
+    print(result["message"], file=sys.stderr)
+    if result["status"] != "success":
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a single event in or out of the embedding store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="Export an event")
+    export_parser.add_argument("event")
+    export_parser.add_argument("--format", choices=event_transfer.FORMATS, default="ndjson")
+    export_parser.add_argument("--out", help="Output file (default: stdout)")
+    export_parser.set_defaults(func=export_event)
+
+    import_parser = sub.add_parser("import", help="Import an event in one bulk commit")
+    import_parser.add_argument("event")
+    import_parser.add_argument("--file", required=True)
+    import_parser.add_argument("--format", choices=event_transfer.FORMATS, default="ndjson")
+    import_parser.add_argument("--mode", choices=("merge", "replace"), default="merge")
+    import_parser.set_defaults(func=import_event)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Export the spoofing YOLO model to ONNX for the onnxruntime engine.
+
+Usage:
+    python -m scripts.export_yolo_onnx --imgsz 320
+    SPOOFING_ENGINE=onnx SPOOFING_IMGSZ=320 uvicorn app.main:app
+"""
+import argparse
+import os
+import shutil
+from app.core import config
+from app.core.utils import resolve_model_file
+from app.services.spoofing_detection import BUNDLED_MODEL_DIR, YOLO_WEIGHTS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLO weights to ONNX")
+    parser.add_argument("--weights", default=resolve_model_file(YOLO_WEIGHTS, config.MODEL_DIR, BUNDLED_MODEL_DIR))
+    parser.add_argument("--imgsz", type=int, default=config.SPOOFING_IMGSZ, help="Square input size baked into the graph")
+    parser.add_argument("--out", default=resolve_model_file(config.SPOOFING_ONNX_MODEL, config.MODEL_DIR, BUNDLED_MODEL_DIR))
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    # Static shape and simplified graph: fastest option for CPU onnxruntime
+    exported = YOLO(args.weights).export(format="onnx", imgsz=args.imgsz, dynamic=False, simplify=True)
+    if os.path.abspath(exported) != os.path.abspath(args.out):
+        shutil.move(exported, args.out)
+    print(f"Exported {args.weights} -> {args.out} (imgsz={args.imgsz})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Deterministic stand-ins for the model and storage backends.
+
+Used by the load-test and benchmark scripts to exercise the real FastAPI routes and service
+code without InsightFace, YOLO weights or a Cloudinary account:
+
+- FakeFaceApp replaces get_face_app(): the identity is encoded in the top-left pixels of the
+  image (see make_image), and the embedding is a fixed per-identity vector plus small noise
+  derived from the image bytes, so repeated captures of one identity match each other.
+  Like FaceAnalysis it exposes det_model.detect and models["recognition"].get, and the face
+  latency is split evenly between the two stages. Group frames (make_group_image) are
+  make_image tiles side by side, one detected face per tile.
+- FakeYolo replaces the YOLO model and reports no person (no spoofing).
+- FakeCloudinary keeps raw resources in a local directory behind the SDK uploader and the
+  storage client's HTTP transport, optionally failing a fraction of calls.
+
+Latencies are configurable and can either sleep (I/O-like) or spin (CPU-like). Model calls can
+also do a fixed amount of multi-threaded BLAS work (blas_work), which, unlike the latencies,
+responds to the thread budget.
+"""
+import hashlib
+import io
+import os
+import random
+import shutil
+import threading
+import time
+from urllib.parse import quote, unquote
+import numpy as np
+from PIL import Image
+
+EMBEDDING_DIM = 512
+
+# 512 x 512 float32 matrix products per simulated model call (set by install)
+BLAS_WORK = 0
+_blas_matrix = None
+
+
+def simulate(latency_ms: float, cpu_bound: bool = False):
+    """Sleep or busy-wait for latency_ms milliseconds, after BLAS_WORK matrix products."""
+    global _blas_matrix
+    if BLAS_WORK:
+        if _blas_matrix is None:
+            _blas_matrix = np.random.default_rng(0).normal(size=(512, 512)).astype(np.float32) / 512
+        for _ in range(BLAS_WORK):
+            _blas_matrix @ _blas_matrix
+    if latency_ms <= 0:
+        return
+    if not cpu_bound:
+        time.sleep(latency_ms / 1000)
+        return
+    deadline = time.perf_counter() + latency_ms / 1000
+    while time.perf_counter() < deadline:
+        pass
+
+
+def identity_embedding(identity: int) -> np.ndarray:
+    """Fixed unit vector for an identity."""
+    vector = np.random.default_rng(identity).normal(size=EMBEDDING_DIM)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def make_image(identity: int, variant: int = 0, size=(320, 240)) -> bytes:
+    """PNG whose top-left pixels encode the identity; variant changes the bytes (and the noise)."""
+    pixels = np.full((size[1], size[0], 3), 127, dtype=np.uint8)
+    # Textured face region so the quality gate's sharpness check passes
+    h, w = pixels.shape[:2]
+    face = np.random.default_rng(variant).integers(0, 256, size=(int(h * 0.6), w // 2, 1), dtype=np.uint8)
+    pixels[int(h * 0.2):int(h * 0.2) + face.shape[0], w // 4:w // 4 + face.shape[1]] = face
+    pixels[0, 0] = [identity & 0xFF, (identity >> 8) & 0xFF, (identity >> 16) & 0xFF]
+    pixels[0, 1] = [variant & 0xFF, (variant >> 8) & 0xFF, (variant >> 16) & 0xFF]
+    pixels[0, 2] = [255, 0, 255]  # marker: a face is present
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_group_image(identities, variant: int = 0) -> bytes:
+    """PNG with one make_image tile per identity, side by side."""
+    tiles = [np.array(Image.open(io.BytesIO(make_image(identity, variant)))) for identity in identities]
+    buffer = io.BytesIO()
+    Image.fromarray(np.concatenate(tiles, axis=1)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_crop(identity: int, variant: int = 0) -> bytes:
+    """Aligned 112x112 face crop PNG for the /crop endpoints."""
+    return make_image(identity, variant, size=(112, 112))
+
+
+def no_face_image(size=(320, 240)) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.zeros((size[1], size[0], 3), dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeFace(dict):
+    """Mimics insightface.app.common.Face (dict with attribute access)."""
+    __getattr__ = dict.get
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+# Group images are tiles of this width placed side by side, one identity per tile
+TILE_WIDTH = 320
+
+
+def _decode_identity(image_bgr: np.ndarray):
+    """Identity encoded by make_image, or None when the marker pixel is missing."""
+    # Images arrive as BGR: marker pixel [255, 0, 255] is symmetric, identity bytes are reversed
+    if not (image_bgr.ndim == 3 and image_bgr.shape[1] > 2 and list(image_bgr[0, 2]) == [255, 0, 255]):
+        return None
+    b, g, r = (int(v) for v in image_bgr[0, 0])
+    return r | (g << 8) | (b << 16)
+
+
+def _tile(image_bgr: np.ndarray, x: int):
+    return image_bgr[:, x:x + TILE_WIDTH]
+
+
+class _FakeDetector:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def detect(self, image_bgr: np.ndarray, max_num=0, metric="default", input_size=None):
+        # Detector cost grows with the input area; 640 x 640 costs half of latency_ms
+        side = (input_size or (640, 640))[0]
+        simulate(self.owner.latency_ms / 2 * (side / 640) ** 2, self.owner.cpu_bound)
+        h, w = image_bgr.shape[:2]
+        bboxes, kpss = [], []
+        for x in range(0, w, TILE_WIDTH):
+            if _decode_identity(_tile(image_bgr, x)) is None:
+                continue
+            tw = min(TILE_WIDTH, w - x)
+            bboxes.append([x + tw * 0.25, h * 0.2, x + tw * 0.75, h * 0.8, 0.9])
+            kpss.append([[x + tw * 0.4, h * 0.4], [x + tw * 0.6, h * 0.4], [x + tw * 0.5, h * 0.5], [x + tw * 0.42, h * 0.65], [x + tw * 0.58, h * 0.65]])
+        return np.array(bboxes, dtype=np.float32).reshape(-1, 5), np.array(kpss, dtype=np.float32).reshape(-1, 5, 2)
+
+
+def fake_align(image_bgr: np.ndarray, kps: np.ndarray):
+    """Stand-in for face alignment: the tile holding the face, which keeps its identity pixels."""
+    return _tile(image_bgr, int(kps[0][0]) // TILE_WIDTH * TILE_WIDTH)
+
+
+class _FakeRecognizer:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def get_feat(self, images):
+        """Embeddings of aligned crops (the identity pixels are read from each crop itself)."""
+        images = images if isinstance(images, list) else [images]
+        simulate(self.owner.latency_ms / 2, self.owner.cpu_bound)
+        embeddings = []
+        for image_bgr in images:
+            identity = _decode_identity(image_bgr) or 0
+            seed = int.from_bytes(hashlib.sha1(np.ascontiguousarray(image_bgr).tobytes()).digest()[:8], "little")
+            embedding = identity_embedding(identity) + np.random.default_rng(seed).normal(size=EMBEDDING_DIM) * self.owner.noise / np.sqrt(EMBEDDING_DIM)
+            embeddings.append(embedding.astype(np.float32))
+        return np.stack(embeddings)
+
+    def get(self, image_bgr: np.ndarray, face):
+        face.embedding = self.get_feat(fake_align(image_bgr, face.kps))[0]
+        return face.embedding
+
+
+class FakeFaceApp:
+    def __init__(self, latency_ms: float = 0, cpu_bound: bool = False, noise: float = 0.05):
+        self.latency_ms = latency_ms
+        self.cpu_bound = cpu_bound
+        self.noise = noise
+        self.det_model = _FakeDetector(self)
+        self.models = {"detection": self.det_model, "recognition": _FakeRecognizer(self)}
+
+    def get(self, image_bgr: np.ndarray):
+        bboxes, kpss = self.det_model.detect(image_bgr)
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = FakeFace(bbox=bboxes[i, 0:4], kps=kpss[i], det_score=bboxes[i, 4])
+            self.models["recognition"].get(image_bgr, face)
+            faces.append(face)
+        return faces
+
+
+class _FakeYoloResult:
+    boxes = None
+
+
+class FakeYolo:
+    def __init__(self, latency_ms: float = 0, cpu_bound: bool = False):
+        self.latency_ms = latency_ms
+        self.cpu_bound = cpu_bound
+
+    def __call__(self, image, conf=0.3, verbose=False):
+        simulate(self.latency_ms, self.cpu_bound)
+        return [_FakeYoloResult()]
+
+
+class FakeCloudinary:
+    """
+    Raw resource storage in a local directory with simulated network latency.
+    Directory-backed so every uvicorn worker process sees the same resources.
+    Reads are served through an httpx.MockTransport plugged into the storage client and
+    writes stand in for the SDK uploader, so both go through the retry and circuit breaker
+    code. error_rate makes that fraction of reads (503) and writes (exception) fail.
+    """
+
+    def __init__(self, root_dir: str, latency_ms: float = 0, error_rate: float = 0):
+        self.root_dir = root_dir
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self._rng = random.Random()
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _path(self, public_id: str) -> str:
+        return os.path.join(self.root_dir, quote(public_id, safe=""))
+
+    def _fails(self) -> bool:
+        return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def raw_url(self, public_id: str, extension: str = ".json") -> str:
+        return f"http://fake-cloudinary/{quote(public_id + extension, safe='/')}"
+
+    def upload(self, file_path: str, public_id: str, **kwargs):
+        """cloudinary.uploader.upload stand-in."""
+        simulate(self.latency_ms)
+        if self._fails():
+            raise RuntimeError("Simulated Cloudinary upload failure")
+        tmp_path = self._path(public_id) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(file_path, tmp_path)
+        os.replace(tmp_path, self._path(public_id))
+        return {"public_id": public_id}
+
+    def destroy(self, public_id: str, **kwargs):
+        """cloudinary.uploader.destroy stand-in."""
+        simulate(self.latency_ms)
+        if self._fails():
+            raise RuntimeError("Simulated Cloudinary delete failure")
+        if os.path.exists(self._path(public_id)):
+            os.unlink(self._path(public_id))
+        return {"result": "ok"}
+
+    def read(self, path: str):
+        """Content of a delivery path ("<public_id>[.json]"), or None."""
+        for public_id in (path, path[:-len(".json")] if path.endswith(".json") else None):
+            if public_id and os.path.exists(self._path(public_id)):
+                with open(self._path(public_id), "rb") as f:
+                    return f.read()
+        return None
+
+    async def handle(self, request):
+        """httpx.MockTransport handler for CDN reads."""
+        import asyncio
+        import httpx
+
+        await asyncio.sleep(self.latency_ms / 1000)
+        if self._fails():
+            return httpx.Response(503)
+        content = self.read(unquote(request.url.path.lstrip("/")))
+        return httpx.Response(404) if content is None else httpx.Response(200, content=content)
+
+
+def install(storage_dir: str, face_latency_ms=0, spoof_latency_ms=0, storage_latency_ms=0, cpu_bound=False, storage_error_rate=0, blas_work=0):
+    """Patch the service modules to use the fake backends; returns the fakes."""
+    global BLAS_WORK
+    import httpx
+    from app.services import cloud_storage, embedding_store, face_service_insightface, spoofing_detection, storage_client
+
+    BLAS_WORK = blas_work
+    face_app = FakeFaceApp(face_latency_ms, cpu_bound)
+    yolo = FakeYolo(spoof_latency_ms, cpu_bound)
+    cloud = FakeCloudinary(storage_dir, storage_latency_ms, storage_error_rate)
+
+    face_service_insightface.get_face_app = lambda: face_app
+    face_service_insightface._face_type = lambda: FakeFace
+    face_service_insightface._align_face = fake_align
+    spoofing_detection.model = yolo
+    cloud_storage.raw_url = cloud.raw_url
+    cloud_storage._get_uploader = lambda: cloud
+    storage_client.configure(httpx.MockTransport(cloud.handle))
+    embedding_store.USE_CLOUDINARY = True
+    return face_app, yolo, cloud
+
+
+def seed_store(events: int, users_per_event: int):
+    """Enroll users_per_event identities into each event in a single store write."""
+    from app.services.embedding_store import _save_embeddings_to_cloudinary
+
+    data = {}
+    identity = 0
+    for e in range(events):
+        users = {}
+        for _ in range(users_per_event):
+            users[f"user_{identity}"] = [identity_embedding(identity).tolist()]
+            identity += 1
+        data[f"event_{e}"] = users
+    _save_embeddings_to_cloudinary(data)
+    return data
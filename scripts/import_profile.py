@@ -0,0 +1,63 @@
+"""
+Import-time profile of the application.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter and reports
+the modules with the highest cumulative import time, so startup regressions can be tracked.
+
+Usage:
+    python -m scripts.import_profile
+    python -m scripts.import_profile --module app.main --top 30 --json logs/import_profile.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+
+def profile_imports(module: str):
+    """Import module in a subprocess and return per-module timings in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us)
+        })
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time per module")
+    parser.add_argument("--module", default="app.main", help="Module to import (default: app.main)")
+    parser.add_argument("--top", type=int, default=25, help="Number of modules to show")
+    parser.add_argument("--json", dest="json_path", help="Optional path to write the full report as JSON")
+    args = parser.parse_args()
+
+    timings = profile_imports(args.module)
+    total_us = next((t["cumulative_us"] for t in timings if t["module"] == args.module), 0)
+
+    print(f"Total import time for {args.module}: {total_us / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    for t in sorted(timings, key=lambda t: t["cumulative_us"], reverse=True)[:args.top]:
+        print(f"{t['cumulative_us'] / 1000:>14.1f} {t['self_us'] / 1000:>10.1f}  {t['module']}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"module": args.module, "total_us": total_us, "modules": timings}, f, indent=2)
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
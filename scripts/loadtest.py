@@ -0,0 +1,318 @@
+"""
+End-to-end HTTP load test with stub model and storage backends.
+
+``serve`` starts the real FastAPI app under uvicorn with the fakes from scripts.fake_backends
+(deterministic embeddings, configurable artificial latencies) and a seeded store.
+``run`` starts such a server in a subprocess (or targets --url), drives concurrent async
+traffic with a weighted mix of verifies, enrollments and listings, and reports throughput,
+latency percentiles, error rates and server CPU time per request.
+
+Usage:
+    python -m scripts.loadtest run --concurrency 32 --duration 30 --mix verify=80,enroll=10,list=10
+    python -m scripts.loadtest run --server-workers 4 --face-ms 40 --spoof-ms 25 --cpu-bound --json logs/loadtest.json
+    python -m scripts.loadtest serve --port 8100 --events 20 --users 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+KINDS = ("verify", "enroll", "list")
+
+
+def _apply_env(args):
+    """Configure the app for an isolated run; must happen before app modules are imported."""
+    os.environ["LOADTEST_STORAGE_DIR"] = args.storage_dir
+    os.environ["LOADTEST_FACE_MS"] = str(args.face_ms)
+    os.environ["LOADTEST_SPOOF_MS"] = str(args.spoof_ms)
+    os.environ["LOADTEST_STORAGE_MS"] = str(args.storage_ms)
+    os.environ["LOADTEST_STORAGE_ERROR_RATE"] = str(args.storage_error_rate)
+    os.environ["LOADTEST_CPU_BOUND"] = "true" if args.cpu_bound else "false"
+    os.environ["LOADTEST_BLAS_WORK"] = str(args.blas_work)
+    os.environ["INDEX_DIR"] = os.path.join(args.storage_dir, "index")
+    os.environ.setdefault("TIERING_INTERVAL", "0")
+    os.environ.setdefault("LOG_DIR", "")
+    os.environ["WEB_CONCURRENCY"] = str(args.server_workers)
+
+
+def _install_from_env():
+    from scripts import fake_backends
+    return fake_backends.install(
+        os.environ["LOADTEST_STORAGE_DIR"],
+        face_latency_ms=float(os.environ["LOADTEST_FACE_MS"]),
+        spoof_latency_ms=float(os.environ["LOADTEST_SPOOF_MS"]),
+        storage_latency_ms=float(os.environ["LOADTEST_STORAGE_MS"]),
+        cpu_bound=os.environ["LOADTEST_CPU_BOUND"] == "true",
+        storage_error_rate=float(os.environ.get("LOADTEST_STORAGE_ERROR_RATE", "0")),
+        blas_work=int(os.environ.get("LOADTEST_BLAS_WORK", "0"))
+    )
+
+
+def create_app():
+    """uvicorn factory: install the fakes in each worker process, then return the app."""
+    import logging
+    _install_from_env()
+    from app.main import app
+    logging.getLogger().setLevel(os.getenv("LOADTEST_LOG_LEVEL", "WARNING"))
+    return app
+
+
+def serve(args):
+    import uvicorn
+    _apply_env(args)
+    # numpy is not imported yet: export the thread budget first, uvicorn workers inherit it
+    from app.core import thread_budget
+    thread_budget.apply_env()
+    from scripts import fake_backends
+
+    _install_from_env()
+    fake_backends.seed_store(args.events, args.users)
+    print(f"Seeded {args.events} events x {args.users} users; serving on {args.host}:{args.port}", flush=True)
+    uvicorn.run(
+        "scripts.loadtest:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.server_workers,
+        log_level="warning"
+    )
+
+
+def _process_tree_cpu(pid: int):
+    """CPU seconds (user + system) of a process and its descendants, Linux only."""
+    if not os.path.isdir("/proc"):
+        return None
+    tick = os.sysconf("SC_CLK_TCK")
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            stats[int(entry)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / tick)
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        for child, (ppid, _) in stats.items():
+            if ppid == parent and child not in tree:
+                tree.add(child)
+                frontier.append(child)
+    return sum(stats[p][1] for p in tree if p in stats)
+
+
+def _parse_mix(mix: str):
+    weights = {kind: 0.0 for kind in KINDS}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in weights:
+            raise ValueError(f"Unknown request kind '{kind}' (expected one of {KINDS})")
+        weights[kind.strip()] = float(weight)
+    return weights
+
+
+async def _drive(args):
+    import httpx
+    from scripts.fake_backends import make_image
+
+    weights = _parse_mix(args.mix)
+    kinds, kind_weights = list(weights), list(weights.values())
+    seeded = args.events * args.users
+    results = []
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(worker_id: int, client):
+        rng = random.Random(args.seed + worker_id)
+        recent = []
+        sent = 0
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, kind_weights)[0]
+            sent += 1
+            correct = None
+            start = time.perf_counter()
+            try:
+                if kind == "verify":
+                    if recent and rng.random() < args.repeat_ratio:
+                        identity, image = rng.choice(recent)
+                    else:
+                        identity = rng.randrange(seeded)
+                        image = make_image(identity, variant=worker_id * 1_000_000 + sent)
+                        recent = (recent + [(identity, image)])[-32:]
+                    event = f"event_{identity // args.users}"
+                    response = await client.post("/verify/", data={"event_name": event}, files={"file": ("face.png", image, "image/png")})
+                    if response.status_code == 200:
+                        correct = response.json().get("username") == f"user_{identity}"
+                elif kind == "enroll":
+                    identity = seeded + worker_id * 1_000_000 + sent
+                    event = f"event_{rng.randrange(args.events)}"
+                    response = await client.post(
+                        "/addUser/",
+                        data={"event_name": event, "username": f"user_{identity}"},
+                        files={"file": ("face.png", make_image(identity), "image/png")}
+                    )
+                elif rng.random() < 0.5:
+                    response = await client.get("/api/events", params={"limit": 100})
+                else:
+                    response = await client.get("/api/all_user", params={"event_name": f"event_{rng.randrange(args.events)}", "limit": 100})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            results.append((kind, time.perf_counter() - start, ok, correct))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i, client) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def _summarize(results, elapsed):
+    import numpy as np
+    summary = {}
+    for kind in KINDS + ("all",):
+        rows = [r for r in results if kind == "all" or r[0] == kind]
+        if not rows:
+            continue
+        latencies = np.array([r[1] for r in rows]) * 1000
+        errors = sum(1 for r in rows if not r[2])
+        checked = [r[3] for r in rows if r[3] is not None]
+        summary[kind] = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 2),
+            "error_rate": round(errors / len(rows), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p90_ms": round(float(np.percentile(latencies, 90)), 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "max_ms": round(float(latencies.max()), 2)
+        }
+        if checked:
+            summary[kind]["identification_accuracy"] = round(sum(checked) / len(checked), 4)
+    return summary
+
+
+def _wait_ready(url: str, process, timeout: float = 120):
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("Load-test server exited during startup")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+def run(args):
+    server = None
+    if not args.url:
+        args.url = f"http://127.0.0.1:{args.port}"
+        command = [
+            sys.executable, "-m", "scripts.loadtest", "serve",
+            "--port", str(args.port), "--server-workers", str(args.server_workers),
+            "--events", str(args.events), "--users", str(args.users),
+            "--face-ms", str(args.face_ms), "--spoof-ms", str(args.spoof_ms), "--storage-ms", str(args.storage_ms),
+            "--storage-error-rate", str(args.storage_error_rate), "--blas-work", str(args.blas_work),
+            "--storage-dir", args.storage_dir
+        ] + (["--cpu-bound"] if args.cpu_bound else [])
+        server = subprocess.Popen(command, env=dict(os.environ, **args.server_env))
+    try:
+        _wait_ready(args.url, server)
+        cpu_before = _process_tree_cpu(server.pid) if server else None
+        results, elapsed = asyncio.run(_drive(args))
+        cpu_after = _process_tree_cpu(server.pid) if server else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "config": {
+            "concurrency": args.concurrency, "duration_s": args.duration, "mix": args.mix,
+            "server_workers": args.server_workers, "events": args.events, "users_per_event": args.users,
+            "face_ms": args.face_ms, "spoof_ms": args.spoof_ms, "storage_ms": args.storage_ms,
+            "storage_error_rate": args.storage_error_rate, "blas_work": args.blas_work,
+            "cpu_bound": args.cpu_bound, "repeat_ratio": args.repeat_ratio, "server_env": args.server_env
+        },
+        "elapsed_s": round(elapsed, 2),
+        "results": _summarize(results, elapsed)
+    }
+    if cpu_before is not None and cpu_after is not None:
+        cpu = cpu_after - cpu_before
+        report["server_cpu_s"] = round(cpu, 2)
+        report["requests_per_cpu_second"] = round(len(results) / cpu, 2) if cpu > 0 else None
+    return report
+
+
+def _print_report(report):
+    print(f"Elapsed: {report['elapsed_s']}s  config: {report['config']}")
+    print(f"{'kind':<8} {'requests':>9} {'rps':>9} {'errors':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, r in report["results"].items():
+        print(f"{kind:<8} {r['requests']:>9} {r['throughput_rps']:>9} {r['error_rate']:>8.2%} {r['p50_ms']:>9} {r['p90_ms']:>9} {r['p99_ms']:>9} {r['max_ms']:>9}")
+    if "requests_per_cpu_second" in report:
+        print(f"Server CPU: {report['server_cpu_s']}s -> {report['requests_per_cpu_second']} requests per CPU-second (per core)")
+
+
+def _add_server_args(parser):
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--events", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200, help="Seeded users per event")
+    parser.add_argument("--face-ms", type=float, default=30, help="Fake detection+recognition latency")
+    parser.add_argument("--spoof-ms", type=float, default=20, help="Fake YOLO latency")
+    parser.add_argument("--storage-ms", type=float, default=50, help="Fake Cloudinary round-trip latency")
+    parser.add_argument("--storage-error-rate", type=float, default=0, help="Fraction of fake Cloudinary calls that fail")
+    parser.add_argument("--cpu-bound", action="store_true", help="Spin instead of sleeping for model latencies")
+    parser.add_argument("--blas-work", type=int, default=0, help="512x512 matrix products per fake model call (multi-threaded BLAS)")
+    parser.add_argument("--storage-dir", default=None, help="Fake Cloudinary/index directory (default: temp dir)")
+
+
+def _add_run_args(parser):
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of traffic")
+    parser.add_argument("--mix", default="verify=80,enroll=10,list=10")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="Fraction of verifies resending a previous image")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Write the report as JSON")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test with stub backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Serve the app with fake backends")
+    _add_server_args(serve_parser)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+
+    run_parser = sub.add_parser("run", help="Drive traffic and report")
+    _add_server_args(run_parser)
+    _add_run_args(run_parser)
+    run_parser.add_argument("--url", help="Target an already running server instead of starting one")
+
+    args = parser.parse_args()
+    args.storage_dir = args.storage_dir or tempfile.mkdtemp(prefix="face_loadtest_")
+    if args.command == "serve":
+        serve(args)
+        return
+
+    args.server_env = {}
+    report = run(args)
+    _print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
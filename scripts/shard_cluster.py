@@ -0,0 +1,213 @@
+"""
+Run a sharded deployment as several local processes, one per node.
+
+Every node gets the same SHARD_NODES, its own SHARD_SELF and its own store and index
+directory under --dir. With --fake the nodes use the stub backends of scripts.fake_backends
+(no models or Cloudinary account needed); otherwise they run app.main:app with local storage.
+
+Commands:
+- serve: start the nodes and keep them running until Ctrl-C
+- rebalance: ask every node of a running cluster to push events it no longer owns to their owners
+- demo: enroll users through one node (redirects reach the owners), add a node, rebalance
+  and check that every event ends up on its owner and still verifies
+
+Usage:
+    python -m scripts.shard_cluster serve --nodes a,b,c --base-port 8300 --fake
+    python -m scripts.shard_cluster rebalance --urls http://127.0.0.1:8300,http://127.0.0.1:8301
+    python -m scripts.shard_cluster demo --events 12 --users 4
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _nodes_config(names, base_port):
+    return {name: f"http://127.0.0.1:{base_port + i}" for i, name in enumerate(names)}
+
+
+def start_node(name: str, nodes: dict, root: str, fake: bool, rebalance_on_start: bool = True):
+    node_dir = os.path.join(root, name)
+    port = nodes[name].rsplit(":", 1)[1]
+    env = dict(
+        os.environ,
+        SHARD_NODES=",".join(f"{n}={url}" for n, url in nodes.items()),
+        SHARD_SELF=name,
+        SHARD_REBALANCE_ON_START="true" if rebalance_on_start else "false",
+        INDEX_DIR=os.path.join(node_dir, "index"),
+        LOCAL_EMBEDDINGS_PATH=os.path.join(node_dir, "data", "embeddings.json"),
+        USE_CLOUDINARY="false",
+        TIERING_INTERVAL="0",
+        LOG_DIR=""
+    )
+    if fake:
+        env.update(
+            LOADTEST_STORAGE_DIR=os.path.join(node_dir, "store"), LOADTEST_FACE_MS="0", LOADTEST_SPOOF_MS="0",
+            LOADTEST_STORAGE_MS="0", LOADTEST_CPU_BOUND="false"
+        )
+        app = ["scripts.loadtest:create_app", "--factory"]
+    else:
+        app = ["app.main:app"]
+    command = [sys.executable, "-m", "uvicorn", *app, "--host", "127.0.0.1", "--port", port, "--log-level", "warning"]
+    return subprocess.Popen(command, env=env)
+
+
+def start_cluster(nodes: dict, root: str, fake: bool, rebalance_on_start: bool = True):
+    processes = {name: start_node(name, nodes, root, fake, rebalance_on_start) for name in nodes}
+    for name, url in nodes.items():
+        _wait_ready(url, processes[name])
+    return processes
+
+
+def stop_cluster(processes: dict):
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        process.wait(timeout=30)
+
+
+def _wait_ready(url: str, process, timeout: float = 120):
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Node at {url} exited during startup")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Node at {url} did not become ready")
+
+
+def rebalance(urls):
+    import httpx
+    results = {}
+    for url in urls:
+        results[url] = httpx.post(url + "/api/shards/rebalance", timeout=600).json()
+        moved = results[url].get("moved", [])
+        print(f"{url}: moved {len(moved)} events, failed {len(results[url].get('failed', []))}")
+    return results
+
+
+def _local_events(url: str):
+    import httpx
+    return [e["event_name"] for e in httpx.get(url + "/api/events", timeout=30).json()["events"]]
+
+
+def _check(client, nodes: dict, expected: dict):
+    """Print the event distribution and verify every enrolled identity through a random node."""
+    from app.services.sharding import HashRing
+    from app.core import config
+    from scripts import fake_backends
+
+    ring = HashRing(nodes, config.SHARD_VNODES)
+    misplaced = 0
+    for name, url in nodes.items():
+        events = _local_events(url)
+        misplaced += sum(1 for e in events if ring.owner(e) != name)
+        print(f"  node {name}: {len(events)} events")
+    failures = 0
+    for event_name, identities in expected.items():
+        for identity in identities:
+            url = random.choice(list(nodes.values()))
+            response = client.post(url + "/verify/", data={"event_name": event_name},
+                                   files={"file": ("face.png", fake_backends.make_image(identity, 7), "image/png")})
+            body = response.json()
+            if not body.get("flag") or body.get("username") != f"user_{identity}":
+                failures += 1
+    print(f"  misplaced events: {misplaced}, failed verifications: {failures} of {sum(len(v) for v in expected.values())}")
+    return misplaced == 0 and failures == 0
+
+
+def demo(args):
+    import httpx
+    from scripts import fake_backends
+
+    root = args.dir or tempfile.mkdtemp(prefix="face_shards_")
+    names = [n.strip() for n in args.nodes.split(",") if n.strip()]
+    nodes = _nodes_config(names, args.base_port)
+    print(f"Starting {len(nodes)} nodes in {root}")
+    processes = start_cluster(nodes, root, fake=True, rebalance_on_start=False)
+    ok = False
+    try:
+        entry = nodes[names[0]]
+        expected = {}
+        identity = 0
+        with httpx.Client(follow_redirects=True, timeout=60) as client:
+            for e in range(args.events):
+                event_name = f"event_{e}"
+                expected[event_name] = []
+                for _ in range(args.users):
+                    response = client.post(entry + "/addUser/", data={"event_name": event_name, "username": f"user_{identity}"},
+                                           files={"file": ("face.png", fake_backends.make_image(identity, 0), "image/png")})
+                    if response.json().get("status") != "success":
+                        raise RuntimeError(f"Enrollment failed: {response.text}")
+                    expected[event_name].append(identity)
+                    identity += 1
+            print(f"Enrolled {identity} users into {args.events} events through node {names[0]}")
+            ok = _check(client, nodes, expected)
+
+            # Membership change: every node restarts with the new ring, then pushes misplaced events
+            stop_cluster(processes)
+            names.append(args.add_node)
+            nodes = _nodes_config(names, args.base_port)
+            print(f"Restarting with node {args.add_node} added")
+            processes = start_cluster(nodes, root, fake=True, rebalance_on_start=False)
+            rebalance(nodes.values())
+            ok = _check(client, nodes, expected) and ok
+    finally:
+        stop_cluster(processes)
+    print("Demo passed" if ok else "Demo FAILED")
+    if not ok:
+        sys.exit(1)
+
+
+def serve(args):
+    root = args.dir or tempfile.mkdtemp(prefix="face_shards_")
+    nodes = _nodes_config([n.strip() for n in args.nodes.split(",") if n.strip()], args.base_port)
+    processes = start_cluster(nodes, root, args.fake)
+    print(f"Serving {len(nodes)} nodes from {root}: {nodes}", flush=True)
+    try:
+        while all(p.poll() is None for p in processes.values()):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_cluster(processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local sharded cluster")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Start the nodes")
+    serve_parser.add_argument("--nodes", default="a,b,c", help="Comma separated node names")
+    serve_parser.add_argument("--base-port", type=int, default=8300)
+    serve_parser.add_argument("--dir", help="Directory for the nodes' stores and indexes (default: temp dir)")
+    serve_parser.add_argument("--fake", action="store_true", help="Use the stub model and storage backends")
+    serve_parser.set_defaults(func=serve)
+
+    rebalance_parser = sub.add_parser("rebalance", help="Rebalance a running cluster")
+    rebalance_parser.add_argument("--urls", required=True, help="Comma separated node URLs")
+    rebalance_parser.set_defaults(func=lambda args: rebalance([u.strip() for u in args.urls.split(",") if u.strip()]))
+
+    demo_parser = sub.add_parser("demo", help="Enroll, add a node, rebalance and verify (stub backends)")
+    demo_parser.add_argument("--nodes", default="a,b,c")
+    demo_parser.add_argument("--add-node", default="d")
+    demo_parser.add_argument("--base-port", type=int, default=8300)
+    demo_parser.add_argument("--events", type=int, default=12)
+    demo_parser.add_argument("--users", type=int, default=3)
+    demo_parser.add_argument("--dir")
+    demo_parser.set_defaults(func=demo)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Shared fixtures: the app runs against scripts.fake_backends (stub models, file-backed fake
+Cloudinary) with its store and index in a temporary directory.
+"""
+import os
+import tempfile
+
+# Read by app.core.config at import time, so set before any app module is imported
+_ROOT = tempfile.mkdtemp(prefix="face-recognition-tests-")
+os.environ.update(
+    USE_CLOUDINARY="false",
+    INDEX_DIR=os.path.join(_ROOT, "index"),
+    LOCAL_EMBEDDINGS_PATH=os.path.join(_ROOT, "data", "embeddings.json"),
+    LOG_DIR="",
+    TIERING_INTERVAL="0"
+)
+
+import pytest  # noqa: E402
+from scripts import fake_backends  # noqa: E402
+
+fake_backends.install(os.path.join(_ROOT, "store"))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def event_name(request):
+    """An event name unique to the test (the fake store is shared by the session)."""
+    return request.node.name.replace("[", "_").replace("]", "")
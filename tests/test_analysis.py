@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from app.services import analysis
+from app.services import face_service_insightface as face_service
+from scripts import fake_backends
+
+
+@pytest.fixture
+def slow_models(monkeypatch):
+    monkeypatch.setattr(face_service.get_face_app(), "latency_ms", 200)
+
+
+def _loop_ticks_during(coroutine):
+    """Run coroutine and count how often a 10 ms ticker got to run on the same event loop."""
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        result = await coroutine
+        task.cancel()
+        return result, ticks
+
+    return asyncio.run(run())
+
+
+def test_upload_analysis_does_not_block_the_event_loop(slow_models):
+    result, ticks = _loop_ticks_during(analysis.analyze_upload_async(fake_backends.make_image(301, 0)))
+
+    assert result["embedding"] is not None
+    assert ticks >= 5
+
+
+def test_group_analysis_does_not_block_the_event_loop(slow_models):
+    result, ticks = _loop_ticks_during(analysis.analyze_group_upload_async(fake_backends.make_group_image([302, 303])))
+
+    assert len(result["faces"]) == 2
+    assert ticks >= 5
+
+
+def test_crop_analysis_does_not_block_the_event_loop(slow_models):
+    result, ticks = _loop_ticks_during(analysis.analyze_crop_upload_async(fake_backends.make_crop(304, 0)))
+
+    assert result["embedding"] is not None
+    assert ticks >= 5
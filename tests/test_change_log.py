@@ -0,0 +1,48 @@
+import threading
+import time
+from app.services import embedding_store
+from app.services import face_service_insightface as face_service
+from scripts import fake_backends
+
+
+def test_concurrent_writes_keep_every_add(monkeypatch, event_name):
+    writers = 4
+    before = embedding_store.load_change_log(max_age=0)["version"]
+    load = embedding_store._load_embeddings_from_cloudinary
+
+    def slow_load():
+        # Widen the read-modify-write window so unserialised writers would overwrite each other
+        data = load()
+        time.sleep(0.05)
+        return data
+
+    monkeypatch.setattr(embedding_store, "_load_embeddings_from_cloudinary", slow_load)
+    results = [None] * writers
+
+    def add(i):
+        results[i] = face_service.add_user_face(event_name, f"user_{i}", fake_backends.identity_embedding(i).tolist())
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [result["status"] for result in results] == ["success"] * writers
+    assert sorted(load()[event_name]) == [f"user_{i}" for i in range(writers)]
+
+    log = embedding_store.load_change_log(max_age=0)
+    changes = [change for change in log["changes"] if change["version"] > before]
+    assert [change["version"] for change in changes] == list(range(before + 1, before + writers + 1))
+    assert [change["op"] for change in changes] == ["add"] * writers
+    assert sorted(change["username"] for change in changes) == [f"user_{i}" for i in range(writers)]
+
+
+def test_write_racing_another_host_is_logged_as_reset(event_name):
+    # Another host logged a write after this one read the store: it may have been overwritten
+    embedding_store.begin_write()
+    embedding_store._write_base.version -= 1
+
+    embedding_store._record_changes([{"op": "add", "event_name": event_name, "username": "late", "embedding": [1.0]}])
+
+    assert embedding_store.load_change_log(max_age=0)["changes"][-1]["op"] == "reset"
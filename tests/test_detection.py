@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from app.core import config
+from app.services import metrics
+from app.services import face_service_insightface as face_service
+
+# 640 x 480 frame: detector input sizes scale it by size / 640
+IMAGE = np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+class _ScriptedDetector:
+    """Returns the face sides (in image pixels) scripted for each input size, best first."""
+
+    def __init__(self, sides_by_size):
+        self.sides_by_size = sides_by_size
+        self.sizes = []
+
+    def detect(self, image_bgr, input_size=None, max_num=0, metric="default"):
+        size = input_size[0]
+        self.sizes.append(size)
+        sides = self.sides_by_size.get(size, [])
+        bboxes = np.array([[10, 10, 10 + side, 10 + side, 0.9 - 0.1 * i] for i, side in enumerate(sides)], dtype=np.float32)
+        return bboxes.reshape(-1, 5), None
+
+
+class _App:
+    def __init__(self, sides_by_size):
+        self.det_model = _ScriptedDetector(sides_by_size)
+
+
+@pytest.fixture(autouse=True)
+def detection_config(monkeypatch):
+    monkeypatch.setattr(config, "DETECTION_SIZES", [320, 480, 640])
+    monkeypatch.setattr(config, "DETECTION_MIN_FACE_PX", 24)
+
+
+def _detect(sides_by_size, all_faces=False):
+    app, trace = _App(sides_by_size), []
+    faces = face_service._detect_faces(app, IMAGE, trace, all_faces=all_faces)
+    return faces, trace, app.det_model.sizes
+
+
+def test_large_face_stops_at_the_smallest_size():
+    # 60 px in the image = 30 px at 320
+    faces, trace, sizes = _detect({320: [60], 480: [60], 640: [60]})
+
+    assert sizes == [320]
+    assert len(faces) == 1
+    assert [(attempt["size"], attempt["faces"]) for attempt in trace] == [(320, 1)]
+
+
+def test_tiny_face_escalates_until_it_is_large_enough():
+    # 40 px in the image = 20 px at 320, 30 px at 480
+    _, trace, sizes = _detect({320: [40], 480: [40], 640: [40]})
+
+    assert sizes == [320, 480]
+    assert [attempt["size"] for attempt in trace] == [320, 480]
+
+
+def test_missed_face_escalates_to_a_larger_size():
+    faces, _, sizes = _detect({480: [100]})
+
+    assert sizes == [320, 480]
+    assert len(faces) == 1
+
+
+def test_faces_found_at_a_smaller_size_are_kept():
+    faces, trace, sizes = _detect({320: [30]})
+
+    assert sizes == [320, 480, 640]
+    assert len(faces) == 1
+    assert [attempt["faces"] for attempt in trace] == [1, 0, 0]
+
+
+def test_group_frames_escalate_for_any_tiny_face():
+    sides = {320: [100, 40], 480: [100, 40], 640: [100, 40]}
+
+    assert _detect(sides)[2] == [320]
+    assert _detect(sides, all_faces=True)[2] == [320, 480]
+
+
+def test_single_size_is_fixed_detection(monkeypatch):
+    monkeypatch.setattr(config, "DETECTION_SIZES", [640])
+
+    assert _detect({})[2] == [640]
+
+
+def test_hit_is_counted_at_the_size_that_produced_the_faces():
+    before = metrics.detection_summary()
+    _, trace, _ = _detect({320: [30]})
+
+    metrics.record_detection(trace)
+    after = metrics.detection_summary()
+
+    def hits(summary, size):
+        return summary["sizes"].get(size, {}).get("hits", 0)
+
+    assert after["frames"] == before["frames"] + 1
+    assert after["escalations"] == before["escalations"] + 2
+    assert hits(after, "320") == hits(before, "320") + 1
+    assert hits(after, "640") == hits(before, "640")
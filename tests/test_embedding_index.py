@@ -0,0 +1,47 @@
+import time
+from app.core import config
+from app.services import embedding_index, embedding_store
+from app.services import face_service_insightface as face_service
+from scripts import fake_backends
+
+
+def _write_from_another_host(event_name, username, identity):
+    """Change the shared store and its summary without publishing this host's index."""
+    data = embedding_store._load_embeddings_from_cloudinary()
+    data.setdefault(event_name, {})[username] = [fake_backends.identity_embedding(identity).tolist()]
+    embedding_store._write_json(data, embedding_store.LOCAL_EMBEDDINGS_PATH, embedding_store.cloud_storage.upload_embeddings)
+    metadata = embedding_store._load_metadata()
+    embedding_store._save_metadata(dict(metadata, version=metadata["version"] + 1))
+
+
+def _age_index(monkeypatch):
+    monkeypatch.setattr(config, "INDEX_MAX_AGE", 0.05)
+    time.sleep(0.1)
+
+
+def _wait_for_check():
+    if embedding_index._rebuild_thread is not None:
+        embedding_index._rebuild_thread.join(timeout=10)
+
+
+def test_aged_index_is_kept_while_the_store_is_unchanged(monkeypatch, event_name):
+    face_service.add_user_face(event_name, "alice", fake_backends.identity_embedding(11).tolist())
+    version = embedding_index.current_version()
+    _age_index(monkeypatch)
+
+    embedding_index.get_event_index(event_name)
+    _wait_for_check()
+
+    assert embedding_index.current_version() == version
+
+
+def test_aged_index_picks_up_writes_from_another_host(monkeypatch, event_name):
+    face_service.add_user_face(event_name, "alice", fake_backends.identity_embedding(12).tolist())
+    _write_from_another_host(event_name, "bob", 13)
+    assert embedding_index.get_event_index(event_name).user_count == 1
+    _age_index(monkeypatch)
+
+    embedding_index.get_event_index(event_name)
+    _wait_for_check()
+
+    assert embedding_index.get_event_index(event_name).user_count == 2
@@ -0,0 +1,84 @@
+import json
+from app.core import config
+from app.services import embedding_store
+from scripts import fake_backends
+
+
+def _add(client, event_name, username, identity):
+    response = client.post("/addUser/embedding", data={
+        "event_name": event_name,
+        "username": username,
+        "embedding": json.dumps(fake_backends.identity_embedding(identity).tolist()),
+        "model_version": config.FACE_MODEL_PACK
+    }).json()
+    assert response["status"] == "success"
+
+
+def _pages(client, path, key, **params):
+    """Follow next_cursor until the listing is exhausted; returns the pages."""
+    pages, cursor = [], None
+    while True:
+        response = client.get(path, params=dict(params, cursor=cursor) if cursor else params).json()
+        pages.append(response[key])
+        cursor = response["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_users_are_paged_in_order(client, event_name):
+    for i, username in enumerate(["erin", "bob", "alice", "dave", "carol"]):
+        _add(client, event_name, username, 500 + i)
+
+    pages = _pages(client, "/api/all_user", "users", event_name=event_name, limit=2)
+
+    assert pages == [["alice", "bob"], ["carol", "dave"], ["erin"]]
+
+
+def test_cursor_is_stable_under_inserts(client, event_name):
+    for i, username in enumerate(["bob", "dave", "frank"]):
+        _add(client, event_name, username, 510 + i)
+    first = client.get("/api/all_user", params={"event_name": event_name, "limit": 2}).json()
+
+    # Inserted before the cursor: the next page neither repeats nor skips a user
+    _add(client, event_name, "alice", 513)
+    second = client.get("/api/all_user", params={"event_name": event_name, "limit": 2, "cursor": first["next_cursor"]}).json()
+
+    assert first["users"] == ["bob", "dave"]
+    assert second == {"users": ["frank"], "next_cursor": None}
+
+
+def test_events_are_paged_with_user_counts(client, event_name):
+    names = [f"{event_name}_{i}" for i in range(3)]
+    for i, name in enumerate(names):
+        for j in range(i + 1):
+            _add(client, name, f"user_{j}", 520 + j)
+
+    pages = _pages(client, "/api/events", "events", limit=2)
+    events = [event for page in pages for event in page]
+
+    assert all(len(page) <= 2 for page in pages)
+    assert [event["event_name"] for event in events] == sorted(event["event_name"] for event in events)
+    assert {event["event_name"]: event["user_count"] for event in events if event["event_name"] in names} == {
+        name: i + 1 for i, name in enumerate(names)
+    }
+
+
+def test_invalid_cursor_is_rejected(client, event_name):
+    response = client.get("/api/all_user", params={"event_name": event_name, "cursor": "not-a-cursor!"}).json()
+
+    assert response == {"status": "error", "message": "Invalid cursor"}
+
+
+def test_listing_recovers_from_a_failed_summary_save(client, event_name, monkeypatch):
+    _add(client, event_name, "alice", 530)
+    save = embedding_store._save_metadata
+
+    def failing(metadata):
+        raise OSError("upload failed")
+
+    monkeypatch.setattr(embedding_store, "_save_metadata", failing)
+    _add(client, event_name, "bob", 531)
+    monkeypatch.setattr(embedding_store, "_save_metadata", save)
+
+    assert client.get("/api/all_user", params={"event_name": event_name}).json()["users"] == ["alice", "bob"]
+    assert not embedding_store._load_metadata().get("stale")
@@ -0,0 +1,83 @@
+import json
+import numpy as np
+from app.core import config
+from app.services import embedding_store
+from scripts import fake_backends
+
+
+def _enroll(client, event_name, users):
+    for i in range(users):
+        response = client.post(
+            "/addUser/",
+            data={"event_name": event_name, "username": f"user_{i}"},
+            files={"file": ("face.png", fake_backends.make_image(i, 0), "image/png")}
+        ).json()
+        assert response["status"] == "success"
+
+
+def _import(client, event_name, archive, mode="merge", format="npz"):
+    return client.post(
+        f"/api/events/{event_name}/import",
+        files={"file": (f"{event_name}.{format}", archive, "application/octet-stream")},
+        data={"format": format, "mode": mode}
+    ).json()
+
+
+def test_repeated_merge_import_does_not_duplicate(client, event_name):
+    _enroll(client, event_name, 3)
+    archive = client.get(f"/api/events/{event_name}/export", params={"format": "npz"}).content
+
+    for _ in range(2):
+        result = _import(client, event_name, archive)
+        assert result["status"] == "success"
+        assert result["embedding_count"] == 0
+        assert result["duplicate_count"] == 3
+
+    stored = embedding_store._load_embeddings_from_cloudinary()[event_name]
+    assert {user: len(embeddings) for user, embeddings in stored.items()} == {f"user_{i}": 1 for i in range(3)}
+
+
+def test_merge_import_keeps_new_enrollments(client, event_name):
+    _enroll(client, event_name, 2)
+    archive = client.get(f"/api/events/{event_name}/export", params={"format": "npz"}).content
+    # Enrolled on the target after the export was taken, as during a rebalance
+    response = client.post(
+        "/addUser/",
+        data={"event_name": event_name, "username": "user_9"},
+        files={"file": ("face.png", fake_backends.make_image(9, 0), "image/png")}
+    ).json()
+    assert response["status"] == "success"
+
+    assert _import(client, event_name, archive)["status"] == "success"
+
+    stored = embedding_store._load_embeddings_from_cloudinary()[event_name]
+    assert sorted(stored) == ["user_0", "user_1", "user_9"]
+    assert all(len(embeddings) == 1 for embeddings in stored.values())
+
+
+def test_ndjson_export_round_trips_into_another_event(client, event_name):
+    _enroll(client, event_name, 3)
+    archive = client.get(f"/api/events/{event_name}/export").content
+    assert len(archive.splitlines()) == 3
+
+    copy = f"{event_name}_copy"
+    assert _import(client, copy, archive, mode="replace", format="ndjson")["status"] == "success"
+
+    stored = embedding_store._load_embeddings_from_cloudinary()
+    assert stored[copy].keys() == stored[event_name].keys()
+    for username, embeddings in stored[event_name].items():
+        assert np.allclose(stored[copy][username], embeddings, atol=1e-5)
+
+
+def test_import_over_the_embedding_limit_is_rejected(client, event_name, monkeypatch):
+    monkeypatch.setattr(config, "IMPORT_MAX_EMBEDDINGS", 2)
+    lines = "".join(
+        json.dumps({"username": f"user_{i}", "embeddings": [fake_backends.identity_embedding(i).tolist()]}) + "\n"
+        for i in range(3)
+    )
+
+    result = _import(client, event_name, lines.encode("utf-8"), mode="replace", format="ndjson")
+
+    assert result["status"] == "error"
+    assert "IMPORT_MAX_EMBEDDINGS" in result["message"]
+    assert event_name not in embedding_store._load_embeddings_from_cloudinary()
@@ -0,0 +1,26 @@
+import json
+from app.core import config
+from app.services import face_service_insightface as face_service
+from scripts import fake_backends
+
+
+def test_check_embedding_rejects_nested_lists():
+    nested = [[1.0]] * config.EMBEDDING_DIM
+
+    assert face_service.check_embedding(nested, config.FACE_MODEL_PACK) is not None
+    assert face_service.check_embedding(fake_backends.identity_embedding(1).tolist(), config.FACE_MODEL_PACK) is None
+
+
+def test_verify_embedding_endpoint_rejects_nested_lists(client, event_name):
+    embedding = fake_backends.identity_embedding(2).tolist()
+    added = client.post("/addUser/embedding", data={
+        "event_name": event_name, "username": "alice", "embedding": json.dumps(embedding), "model_version": config.FACE_MODEL_PACK
+    }).json()
+    assert added["status"] == "success"
+
+    response = client.post("/verify/embedding", data={
+        "event_name": event_name, "embedding": json.dumps([[1.0]] * config.EMBEDDING_DIM), "model_version": config.FACE_MODEL_PACK
+    }).json()
+
+    assert response["verified"] is False
+    assert "flat list" in response["message"]
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from app.core import config
+from app.services import face_quality
+from app.services import face_service_insightface as face_service
+from scripts import fake_backends
+
+FRONTAL_KPS = [[128, 100], [192, 100], [160, 125], [135, 155], [185, 155]]
+
+
+def _image(textured=True):
+    if not textured:
+        return np.full((240, 320, 3), 127, dtype=np.uint8)
+    return np.random.default_rng(0).integers(0, 256, size=(240, 320, 3), dtype=np.uint8)
+
+
+def _face(bbox=(80, 48, 240, 192), kps=FRONTAL_KPS, det_score=0.9):
+    return fake_backends.FakeFace(bbox=np.array(bbox, dtype=np.float32), kps=np.array(kps, dtype=np.float32), det_score=det_score)
+
+
+# (code, face, image, threshold setting, whether the threshold is a minimum)
+REJECTIONS = [
+    ("low_detection_score", _face(det_score=0.4), _image(), "QUALITY_MIN_DET_SCORE", True),
+    ("face_too_small", _face(bbox=(100, 100, 140, 140)), _image(), "QUALITY_MIN_FACE_SIZE", True),
+    ("pose_yaw", _face(kps=[[128, 100], [192, 100], [185, 125], [135, 155], [185, 155]]), _image(), "QUALITY_MAX_YAW", False),
+    ("pose_pitch", _face(kps=[[128, 100], [192, 100], [160, 102], [135, 155], [185, 155]]), _image(), "QUALITY_MAX_PITCH", False),
+    ("blurry", _face(), _image(textured=False), "QUALITY_MIN_SHARPNESS", True),
+]
+
+
+def test_usable_face_passes():
+    metrics, rejection = face_quality.assess_face(_image(), _face())
+
+    assert rejection is None
+    assert set(metrics) == {"det_score", "face_size", "yaw", "pitch", "roll", "sharpness"}
+    assert abs(metrics["yaw"]) < 1 and abs(metrics["roll"]) < 1
+
+
+@pytest.mark.parametrize("code, face, image, setting, minimum", REJECTIONS, ids=[r[0] for r in REJECTIONS])
+def test_rejection_code_and_threshold(code, face, image, setting, minimum):
+    _, rejection = face_quality.assess_face(image, face)
+
+    assert rejection["code"] == code
+    assert rejection["threshold"] == getattr(config, setting)
+    assert rejection["value"] < rejection["threshold"] if minimum else rejection["value"] > rejection["threshold"]
+
+
+@pytest.mark.parametrize("code, face, image, setting, minimum", REJECTIONS, ids=[r[0] for r in REJECTIONS])
+def test_threshold_setting_decides_the_rejection(code, face, image, setting, minimum, monkeypatch):
+    _, rejection = face_quality.assess_face(image, face)
+
+    # Moving the threshold just past the measured value lets the face through that check
+    monkeypatch.setattr(config, setting, rejection["value"] - 0.01 if minimum else rejection["value"] + 0.01)
+    _, relaxed = face_quality.assess_face(image, face)
+
+    assert relaxed is None or relaxed["code"] != code
+
+
+def test_checks_stop_at_the_first_failure():
+    _, rejection = face_quality.assess_face(_image(textured=False), _face(bbox=(100, 100, 140, 140), det_score=0.4))
+
+    assert rejection["code"] == "low_detection_score"
+
+
+def test_gate_is_off_by_default():
+    assert config.QUALITY_GATE is False
+
+
+def test_verify_rejects_before_recognition_only_with_the_gate_on(client, event_name, monkeypatch):
+    enrolled = client.post(
+        "/addUser/",
+        data={"event_name": event_name, "username": "alice"},
+        files={"file": ("face.png", fake_backends.make_image(601, 0), "image/png")}
+    ).json()
+    assert enrolled["status"] == "success"
+    monkeypatch.setattr(config, "QUALITY_MIN_SHARPNESS", 1e9)
+
+    def verify(variant):
+        return client.post(
+            "/verify/",
+            data={"event_name": event_name},
+            files={"file": ("face.png", fake_backends.make_image(601, variant), "image/png")}
+        ).json()
+
+    assert verify(1)["flag"] is True
+
+    def no_recognition(images):
+        raise AssertionError("recognition ran on a rejected face")
+
+    monkeypatch.setattr(config, "QUALITY_GATE", True)
+    monkeypatch.setattr(face_service.get_face_app().models["recognition"], "get_feat", no_recognition)
+    response = verify(2)
+
+    assert response["verified"] is False
+    assert response["quality"]["code"] == "blurry"
+    assert response["quality"]["threshold"] == 1e9
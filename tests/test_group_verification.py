@@ -0,0 +1,75 @@
+import json
+import numpy as np
+from app.core import config
+from app.services import face_service_insightface as face_service
+from scripts import fake_backends
+
+
+def _add(client, event_name, username, embedding):
+    response = client.post("/addUser/embedding", data={
+        "event_name": event_name,
+        "username": username,
+        "embedding": json.dumps(np.asarray(embedding).tolist()),
+        "model_version": config.FACE_MODEL_PACK
+    }).json()
+    assert response["status"] == "success"
+
+
+def _orthonormal_pair(a, b):
+    a = fake_backends.identity_embedding(a).astype(np.float64)
+    b = fake_backends.identity_embedding(b).astype(np.float64)
+    b -= a * (a @ b)
+    return a, b / np.linalg.norm(b)
+
+
+def _verify_group(client, event_name, contents, one_to_one=True):
+    return client.post(
+        "/verify/group",
+        data={"event_name": event_name, "one_to_one": str(one_to_one).lower()},
+        files={"file": ("group.png", contents, "image/png")}
+    ).json()
+
+
+def test_group_frame_identifies_every_face(client, event_name):
+    _add(client, event_name, "alice", fake_backends.identity_embedding(701))
+    _add(client, event_name, "bob", fake_backends.identity_embedding(702))
+
+    response = _verify_group(client, event_name, fake_backends.make_group_image([702, 799, 701]))
+
+    assert response["status"] == "success"
+    assert (response["face_count"], response["matched"]) == (3, 2)
+    assert [face["username"] for face in response["faces"]] == ["bob", None, "alice"]
+    assert [int(face["bbox"][0]) // fake_backends.TILE_WIDTH for face in response["faces"]] == [0, 1, 2]
+
+
+def test_one_to_one_assigns_each_user_to_one_face(client, event_name):
+    alice, bob = _orthonormal_pair(711, 712)
+    _add(client, event_name, "alice", alice)
+    _add(client, event_name, "bob", bob)
+    # The second face is closest to alice but also within the threshold of bob
+    faces = [{"embedding": alice.tolist()}, {"embedding": (0.75 * alice + np.sqrt(1 - 0.75 ** 2) * bob).tolist()}]
+
+    greedy = face_service.verify_group(event_name, faces, one_to_one=True)
+    independent = face_service.verify_group(event_name, faces, one_to_one=False)
+
+    assert [face["username"] for face in greedy["faces"]] == ["alice", "bob"]
+    assert greedy["faces"][1]["confidence"] == round(np.sqrt(1 - 0.75 ** 2) * 100, 2)
+    assert [face["username"] for face in independent["faces"]] == ["alice", "alice"]
+    assert independent["faces"][1]["confidence"] == 75.0
+
+
+def test_one_to_one_leaves_a_duplicate_face_unmatched(client, event_name):
+    _add(client, event_name, "alice", fake_backends.identity_embedding(721))
+    contents = fake_backends.make_group_image([721, 721])
+
+    assert [face["username"] for face in _verify_group(client, event_name, contents)["faces"]].count("alice") == 1
+    assert [face["username"] for face in _verify_group(client, event_name, contents, one_to_one=False)["faces"]] == ["alice", "alice"]
+
+
+def test_faces_without_embeddings_are_not_matched(client, event_name):
+    _add(client, event_name, "alice", fake_backends.identity_embedding(731))
+
+    result = face_service.verify_group(event_name, [{"embedding": None}, {"embedding": fake_backends.identity_embedding(731).tolist()}])
+
+    assert result["matched"] == 1
+    assert result["faces"][0] == {"flag": False, "username": None, "confidence": 0.0}
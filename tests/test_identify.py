@@ -0,0 +1,106 @@
+import json
+import time
+import zlib
+import pytest
+from app.core import config
+from app.services import embedding_index
+from app.services import face_service_insightface as face_service
+from scripts import fake_backends
+
+
+def _add(client, event_name, username, identity):
+    response = client.post("/addUser/embedding", data={
+        "event_name": event_name,
+        "username": username,
+        "embedding": json.dumps(fake_backends.identity_embedding(identity).tolist()),
+        "model_version": config.FACE_MODEL_PACK
+    }).json()
+    assert response["status"] == "success"
+
+
+def _wait_for_global_index():
+    deadline = time.monotonic() + 5
+    while embedding_index.get_global_index() is None:
+        assert time.monotonic() < deadline, "global index was not built"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def identities(event_name):
+    """Identities unique to the test, so faces enrolled by other tests never match."""
+    base = zlib.crc32(event_name.encode("utf-8")) & 0xFFFF00
+    return {"alice": base, "bob": base + 1, "carol": base + 2}
+
+
+@pytest.fixture
+def enrolled(client, event_name, identities):
+    """alice is enrolled in two events, bob in a third."""
+    names = [f"{event_name}_{i}" for i in range(3)]
+    _add(client, names[0], "alice", identities["alice"])
+    _add(client, names[1], "alice", identities["alice"])
+    _add(client, names[2], "bob", identities["bob"])
+    return names
+
+
+@pytest.fixture(params=["global", "per_event"])
+def search_path(request, monkeypatch):
+    """Identification runs on the global index, or event by event while it is not available."""
+    if request.param == "global":
+        _wait_for_global_index()
+    else:
+        monkeypatch.setattr(embedding_index, "get_global_index", lambda: None)
+    return request.param
+
+
+def _hits(result):
+    return [(match["event_name"], match["username"]) for match in result["matches"] if match["flag"]]
+
+
+def test_identify_finds_every_event_of_a_user(enrolled, identities, search_path):
+    result = face_service.identify_face(fake_backends.identity_embedding(identities["alice"]).tolist(), top_k=5)
+
+    assert result["status"] == "success"
+    assert sorted(_hits(result)) == [(enrolled[0], "alice"), (enrolled[1], "alice")]
+    assert result["matches"][0]["confidence"] == 100.0
+    assert result["searched_events"] >= 3
+
+
+def test_events_filter_restricts_the_search(enrolled, identities, search_path):
+    result = face_service.identify_face(fake_backends.identity_embedding(identities["alice"]).tolist(), events=[enrolled[1], enrolled[2]])
+
+    assert _hits(result) == [(enrolled[1], "alice")]
+    assert {match["event_name"] for match in result["matches"]} <= {enrolled[1], enrolled[2]}
+    assert result["searched_events"] == 2
+
+
+def test_unknown_events_in_the_filter_are_ignored(enrolled, identities, search_path):
+    result = face_service.identify_face(fake_backends.identity_embedding(identities["bob"]).tolist(), events=[enrolled[2], "no_such_event"])
+
+    assert _hits(result) == [(enrolled[2], "bob")]
+    assert result["searched_events"] == 1
+
+
+def test_top_k_limits_the_matches(enrolled, identities, search_path):
+    result = face_service.identify_face(fake_backends.identity_embedding(identities["alice"]).tolist(), top_k=1)
+
+    assert len(result["matches"]) == 1
+    assert result["matches"][0]["username"] == "alice"
+
+
+def test_identify_endpoint(client, enrolled, identities):
+    def identify(**data):
+        return client.post(
+            "/verify/identify",
+            data=data,
+            files={"file": ("face.png", fake_backends.make_image(identities["carol"], 0), "image/png")}
+        ).json()
+
+    _add(client, enrolled[2], "carol", identities["carol"])
+    _add(client, enrolled[0], "carol", identities["carol"])
+
+    result = identify(events=f"{enrolled[2]}, {enrolled[1]}")
+    assert result["status"] == "success"
+    assert _hits(result) == [(enrolled[2], "carol")]
+    assert result["spoofing_detect"] is False
+
+    assert identify(top_k="0")["status"] == "error"
@@ -0,0 +1,87 @@
+import pytest
+from app.services import analysis, result_cache
+from app.services import face_service_insightface as face_service
+from app.services.result_cache import ResultCache
+from scripts import fake_backends
+
+
+@pytest.fixture
+def extractions(monkeypatch):
+    """Count the calls that reach face extraction (i.e. cache misses)."""
+    calls = []
+    extract = face_service.extract_face_details
+
+    def counting(image, trace=None):
+        calls.append(image.shape)
+        return extract(image, trace=trace)
+
+    monkeypatch.setattr(face_service, "extract_face_details", counting)
+    return calls
+
+
+def test_identical_upload_is_served_from_the_cache(extractions):
+    contents = fake_backends.make_image(401, 0)
+
+    first = analysis.analyze_upload(contents)
+    second = analysis.analyze_upload(contents)
+
+    assert first["cached"] is False and second["cached"] is True
+    assert second["embedding"] == first["embedding"]
+    assert len(extractions) == 1
+
+
+def test_different_upload_misses_the_cache(extractions):
+    analysis.analyze_upload(fake_backends.make_image(402, 0))
+    result = analysis.analyze_upload(fake_backends.make_image(402, 1))
+
+    assert result["cached"] is False
+    assert len(extractions) == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_size=4, ttl=60)
+    cache.put("key", {"embedding": [1.0]})
+
+    now[0] += 59
+    assert cache.get("key") == {"embedding": [1.0]}
+    now[0] += 2
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_failed_extraction_is_not_cached(monkeypatch):
+    contents = fake_backends.make_image(403, 0)
+    extract = face_service.extract_face_details
+
+    def failing(image, trace=None):
+        raise RuntimeError("model session lost")
+
+    monkeypatch.setattr(face_service, "extract_face_details", failing)
+    with pytest.raises(RuntimeError):
+        analysis.analyze_upload(contents)
+
+    monkeypatch.setattr(face_service, "extract_face_details", extract)
+    result = analysis.analyze_upload(contents)
+    assert result["cached"] is False
+    assert result["embedding"] is not None
+
+
+def test_frame_without_a_face_is_cached(extractions):
+    contents = fake_backends.no_face_image()
+
+    assert analysis.analyze_upload(contents)["embedding"] is None
+    assert analysis.analyze_upload(contents)["cached"] is True
+    assert len(extractions) == 1
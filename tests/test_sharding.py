@@ -0,0 +1,160 @@
+import gzip
+import json
+import os
+import tempfile
+import pytest
+from app.core import config
+from app.services import cloud_storage, embedding_store, sharding
+from scripts import fake_backends
+
+NODES = {"a": "http://node-a:8000", "b": "http://node-b:8000"}
+
+
+@pytest.fixture
+def node_a(monkeypatch):
+    """Run as node "a" of a two-node ring."""
+    monkeypatch.setattr(config, "SHARD_NODES", NODES)
+    monkeypatch.setattr(config, "SHARD_SELF", "a")
+    monkeypatch.setattr(sharding, "_ring", None)
+
+
+def _events_owned_by(prefix, nodes):
+    """One event name per node, in the order of nodes."""
+    names, i = {}, 0
+    while len(names) < len(nodes):
+        name, node = f"{prefix}_{i}", sharding.owner(f"{prefix}_{i}")
+        if node in nodes:
+            names.setdefault(node, name)
+        i += 1
+    return [names[node] for node in nodes]
+
+
+def _upload(public_id, payload: bytes):
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(payload)
+    try:
+        cloud_storage.upload_raw(f.name, public_id)
+    finally:
+        os.unlink(f.name)
+
+
+def _users(identity):
+    return {f"user_{identity}": [fake_backends.identity_embedding(identity).tolist()]}
+
+
+@pytest.fixture
+def folders(monkeypatch, event_name, node_a):
+    """Unsharded and shard folders unique to the test; saves go to the shard folder only."""
+    unsharded = f"unsharded_{event_name}"
+    monkeypatch.setattr(cloud_storage, "UNSHARDED_FOLDER", unsharded)
+    monkeypatch.setattr(cloud_storage, "EMBEDDINGS_PUBLIC_ID", f"{unsharded}/shards/a/embeddings")
+    monkeypatch.setattr(cloud_storage, "METADATA_PUBLIC_ID", f"{unsharded}/shards/a/metadata")
+    saved = []
+
+    def save(data, changed_events=None, **kwargs):
+        # The shared test index and change log stay untouched
+        saved.append(data)
+        embedding_store._write_json(data, "", cloud_storage.upload_embeddings)
+        embedding_store._save_metadata(embedding_store._build_metadata(data))
+
+    monkeypatch.setattr(embedding_store, "_save_embeddings_to_cloudinary", save)
+    return unsharded, saved
+
+
+def test_ring_assigns_each_event_to_one_node():
+    ring = sharding.HashRing(["a", "b", "c"])
+    owners = [ring.owner(f"event_{i}") for i in range(300)]
+
+    assert set(owners) == {"a", "b", "c"}
+    assert owners == [sharding.HashRing(["c", "a", "b"]).owner(f"event_{i}") for i in range(300)]
+    assert sharding.HashRing([]).owner("event_0") is None
+
+
+def test_adding_a_node_only_moves_events_to_it():
+    before, after = sharding.HashRing(["a", "b", "c"]), sharding.HashRing(["a", "b", "c", "d"])
+    moved = [i for i in range(1000) if before.owner(f"event_{i}") != after.owner(f"event_{i}")]
+
+    assert all(after.owner(f"event_{i}") == "d" for i in moved)
+    assert 100 < len(moved) < 400
+
+
+def test_requests_for_another_nodes_event_are_redirected(client, event_name, node_a):
+    mine, theirs = _events_owned_by(event_name, ["a", "b"])
+
+    response = client.post(
+        "/verify/?source=kiosk",
+        data={"event_name": theirs},
+        files={"file": ("face.png", fake_backends.make_image(901, 0), "image/png")},
+        follow_redirects=False
+    )
+    assert response.status_code == 307
+    assert response.headers["location"] == f"{NODES['b']}/verify/?source=kiosk"
+
+    response = client.post(
+        "/addUser/",
+        data={"event_name": mine, "username": "alice"},
+        files={"file": ("face.png", fake_backends.make_image(901, 0), "image/png")},
+        follow_redirects=False
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+
+
+def test_default_event_verify_is_routed_by_the_default_event(client, node_a):
+    response = client.post(
+        "/verify/",
+        files={"file": ("face.png", fake_backends.make_image(902, 0), "image/png")},
+        follow_redirects=False
+    )
+
+    assert sharding.owner("B") == "b"
+    assert response.status_code == 307
+    assert response.headers["location"] == f"{NODES['b']}/verify/"
+
+
+def test_first_start_imports_owned_events_from_the_unsharded_folder(folders, event_name):
+    unsharded, saved = folders
+    mine, theirs, my_cold, their_cold = _events_owned_by(event_name, ["a", "b"]) + _events_owned_by(f"{event_name}_cold", ["a", "b"])
+    _upload(f"{unsharded}/embeddings", json.dumps({mine: _users(1), theirs: _users(2)}).encode("utf-8"))
+    _upload(f"{unsharded}/metadata", json.dumps({"version": 1, "events": {
+        my_cold: {"tier": "cold", "user_count": 1, "users": ["user_3"]},
+        their_cold: {"tier": "cold", "user_count": 1, "users": ["user_4"]}
+    }}).encode("utf-8"))
+    _upload(
+        embedding_store._cold_public_id(my_cold, prefix=f"{unsharded}/cold/"),
+        gzip.compress(json.dumps({"event_name": my_cold, "users": _users(3)}).encode("utf-8"))
+    )
+
+    assert sharding.import_unsharded() == sorted([mine, my_cold])
+    assert saved == [{mine: _users(1), my_cold: _users(3)}]
+
+    # Later starts find the node's own summary and leave the store alone
+    assert sharding.import_unsharded() == []
+    assert len(saved) == 1
+
+
+def test_import_is_recorded_when_the_node_owns_no_events(folders, event_name):
+    unsharded, saved = folders
+    theirs, = _events_owned_by(event_name, ["b"])
+    _upload(f"{unsharded}/embeddings", json.dumps({theirs: _users(5)}).encode("utf-8"))
+
+    assert sharding.import_unsharded() == []
+    assert saved == [{}]
+    assert sharding.import_unsharded() == []
+    assert len(saved) == 1
+
+
+def test_nothing_is_written_without_unsharded_data(folders):
+    _, saved = folders
+
+    assert sharding.import_unsharded() == []
+    assert saved == []
+
+
+def test_unsharded_nodes_do_not_import(folders, monkeypatch):
+    unsharded, saved = folders
+    _upload(f"{unsharded}/embeddings", json.dumps({"event": _users(6)}).encode("utf-8"))
+    monkeypatch.setattr(config, "SHARD_SELF", "")
+
+    assert sharding.import_unsharded() == []
+    assert saved == []
@@ -0,0 +1,138 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.core import config
+from app.services import storage_client
+
+
+@pytest.fixture
+def transport():
+    """Swap in a test transport for one test; restores the fake Cloudinary afterwards."""
+    previous = storage_client._transport
+    handlers = {}
+    storage_client.configure(httpx.MockTransport(lambda request: handlers["handle"](request)))
+    yield handlers
+    storage_client.configure(previous)
+    storage_client.breaker.record_success()
+
+
+class _SlowBody(httpx.AsyncByteStream):
+    def __init__(self, chunks: int, delay: float):
+        self.chunks, self.delay = chunks, delay
+
+    async def __aiter__(self):
+        for _ in range(self.chunks):
+            await asyncio.sleep(self.delay)
+            yield b"x" * 1024
+
+
+def test_body_download_is_not_cut_off_by_the_deadline(transport, monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_DEADLINE", 0.2)
+    # 0.5 s in total, but never more than 0.05 s without data
+    transport["handle"] = lambda request: httpx.Response(200, stream=_SlowBody(10, 0.05))
+
+    assert storage_client.get("https://storage.test/store.json") == b"x" * 10 * 1024
+
+
+def test_slow_response_headers_exceed_the_deadline(transport, monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_DEADLINE", 0.2)
+    monkeypatch.setattr(config, "STORAGE_RETRIES", 0)
+
+    async def handle(request):
+        await asyncio.sleep(0.5)
+        return httpx.Response(200, content=b"late")
+
+    transport["handle"] = handle
+
+    with pytest.raises(storage_client.StorageUnavailable):
+        storage_client.get("https://storage.test/store.json")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(storage_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = storage_client.CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    breaker = storage_client.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+
+    clock[0] += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed trial reopens the breaker for another reset_timeout
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] += 30
+    assert breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_transient_errors_are_retried(transport, monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_BACKOFF_BASE", 0.001)
+    statuses = [503, 502, 200]
+    transport["handle"] = lambda request: httpx.Response(statuses.pop(0), content=b"ok")
+
+    assert storage_client.get("https://storage.test/store.json") == b"ok"
+    assert statuses == []
+    assert storage_client.breaker.failures == 0
+
+
+def test_missing_resource_is_not_a_failure(transport):
+    transport["handle"] = lambda request: httpx.Response(404)
+
+    assert storage_client.get("https://storage.test/missing.json") is None
+    assert storage_client.breaker.state == "closed"
+
+
+def test_open_breaker_fails_fast_without_a_request(transport, monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_RETRIES", 0)
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        return httpx.Response(500)
+
+    transport["handle"] = handle
+    for _ in range(config.STORAGE_BREAKER_FAILURES):
+        with pytest.raises(storage_client.StorageUnavailable):
+            storage_client.get("https://storage.test/store.json")
+    assert storage_client.status()["breaker"] == "open"
+
+    with pytest.raises(storage_client.StorageUnavailable, match="breaker is open"):
+        storage_client.get("https://storage.test/store.json")
+    assert len(requests) == config.STORAGE_BREAKER_FAILURES
+
+
+def test_retries_stop_at_the_deadline(transport, monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_DEADLINE", 0.3)
+    monkeypatch.setattr(config, "STORAGE_RETRIES", 100)
+    monkeypatch.setattr(config, "STORAGE_BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(config, "STORAGE_BACKOFF_MAX", 0.05)
+    transport["handle"] = lambda request: httpx.Response(503)
+
+    start = time.monotonic()
+    with pytest.raises(storage_client.StorageUnavailable):
+        storage_client.get("https://storage.test/store.json")
+
+    assert time.monotonic() - start < 0.5
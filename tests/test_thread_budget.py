@@ -0,0 +1,43 @@
+from app.services import face_service_insightface as face_service
+
+
+class _Session:
+    def __init__(self, path, sess_options=None, providers=None):
+        self.path, self.sess_options, self.providers = path, sess_options, providers
+
+    def get_providers(self):
+        return self.providers
+
+
+class _Model:
+    def __init__(self, model_file):
+        self.model_file = model_file
+        self.session = _Session(model_file, providers=["CPUExecutionProvider"])
+
+
+class _App:
+    def __init__(self):
+        self.models = {"detection": _Model("det_10g.onnx"), "recognition": _Model("w600k_r50.onnx")}
+
+
+def test_session_options_rebuild_sessions_from_model_file(monkeypatch):
+    options = object()
+    monkeypatch.setattr(face_service.thread_budget, "session_options", lambda: options)
+    app = _App()
+
+    face_service._apply_session_options(app)
+
+    for name, model in app.models.items():
+        assert model.session.path == model.model_file
+        assert model.session.sess_options is options
+        assert model.session.providers == ["CPUExecutionProvider"]
+
+
+def test_session_options_untouched_without_budget(monkeypatch):
+    monkeypatch.setattr(face_service.thread_budget, "session_options", lambda: None)
+    app = _App()
+    sessions = {name: model.session for name, model in app.models.items()}
+
+    face_service._apply_session_options(app)
+
+    assert {name: model.session for name, model in app.models.items()} == sessions